@@ -1,134 +1,306 @@
-import google.generativeai as genai
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Import the database creation function ---
 # Make sure create_database.py is in the same directory or your Python path
-from create_database import create_database_from_json
+from create_database import populate_database, RESPONSE_SCHEMA
+from response_cache import ResponseCache
+from llm_client import default_client
+from text_extraction import can_send_as_text, format_document_text
+from document_chunking import page_windows, remap_window_response, merge_responses, CHUNK_PAGES, CHUNK_OVERLAP
+from page_slicing import slice_pdf, format_page_ranges, PdfReader
+from response_schema import section_schema
+from response_salvage import salvage_response, missing_sections, build_followup_prompt, record_salvage
+import timing
 import config
 
-# --- Main Processing Function ---
-def process_pdf_to_db(pdf_filepath, db_filepath,GEMINI_PROMPT):
+# --- Internal Fixed Parameters ---
+filename_py = 'create_database.py' # Assumed location of the script for context/upload
+SAVE_RESPONSE_JSON = False # Also keep each parsed response on disk (for debugging/replay)
+SEND_DOCUMENT_TEXT = False # Send locally extracted text instead of uploading documents that are text-only
+CHUNK_THRESHOLD_PAGES = 30 # PDFs with more pages are processed in page windows; None disables chunking
+CHUNK_WORKERS = 4 # Windows of one document generated at the same time
+SALVAGE_FOLLOWUP = True # Ask only for the missing sections after salvaging a malformed response
+STRUCTURED_OUTPUT = True # Pass RESPONSE_SCHEMA to the model instead of sending create_database.py as context
+response_json_dir = 'responses' # Per-document JSON output directory when saving (also holds raw invalid responses)
+model_name = "gemini-2.5-flash-preview-04-17" # Model to use
+
+# Shared response cache: re-running a document with an unchanged prompt and
+# model skips the upload and generation entirely
+response_cache = ResponseCache()
+
+
+def response_raw_path(pdf_filepath, part=None):
+    """
+    Returns the per-document path an unparseable raw response is saved to.
+    part (e.g. a page window or 'followup') tells apart several requests
+    for the same document.
+    """
+    suffix = f".{part}" if part else ""
+    return os.path.join(response_json_dir, os.path.basename(pdf_filepath) + suffix + '.raw.txt')
+
+
+def _parse_response_text(raw_response_text, raw_filepath):
+    """
+    Cleans markdown fences from a raw Gemini response and parses it as JSON.
+    Saves the raw text to raw_filepath (see response_raw_path) if it cannot
+    be decoded.
+
+    Returns:
+        dict | None: The parsed response, or None if parsing failed.
+    """
+    try:
+        print("Attempting to clean and parse API response as JSON...")
+        cleaned_text = raw_response_text.strip()
+        # Remove ```json header if present
+        if cleaned_text.lower().startswith("```json"):
+            first_line_end = cleaned_text.find('\n')
+            if first_line_end != -1: cleaned_text = cleaned_text[first_line_end:].strip()
+            else: cleaned_text = cleaned_text[len("```json"):].strip()
+            print("Removed leading '```json' marker.")
+        # Remove ``` footer if present
+        if cleaned_text.endswith("```"):
+            cleaned_text = cleaned_text[:-len("```")].strip()
+            print("Removed trailing '```' marker.")
+
+        response_data = json.loads(cleaned_text)
+        print(f"Successfully parsed JSON.")
+        return response_data
+
+    except json.JSONDecodeError:
+        print("ERROR: Failed to decode API response as JSON even after cleaning.")
+        print(f"Saving original raw response text to fallback file: '{raw_filepath}'")
+        try:
+            os.makedirs(os.path.dirname(raw_filepath) or '.', exist_ok=True)
+            with open(raw_filepath, 'w', encoding='utf-8') as f:
+                f.write(raw_response_text)
+        except OSError as e:
+            print(f"Warning: Could not save the raw response: {e}")
+        return None
+    except Exception as e:
+        print(f"ERROR during JSON cleaning: {e}")
+        return None
+
+
+def _salvage_malformed_response(raw_response_text, pdf_filepath, GEMINI_PROMPT, contents, client,
+                                followup=SALVAGE_FOLLOWUP, response_schema=None, raw_part=None):
+    """
+    Recovers what it can from a response that is not valid JSON (see
+    response_salvage) and, with followup, sends one narrow request for the
+    sections that were cut off, reusing the already sent document parts
+    (and response_schema narrowed to those sections, if the first request
+    used one). raw_part is the first request's response_raw_path part,
+    extended for the follow-up.
+
+    Returns:
+        (response_data, complete): The recovered (and completed) response,
+        or None if nothing could be recovered; complete is True only when
+        every section was recovered in full, by the salvage or by the
+        follow-up (which may itself be salvaged only in part).
+    """
+    with timing.span('salvage', pipeline='ingest', file=pdf_filepath) as salvage_span:
+        data, report = salvage_response(raw_response_text)
+        recovered = sum(report['items'].values())
+        missing = missing_sections(report)
+        salvage_span.set(ok=data is not None, items=recovered, missing=missing)
+    if data is None:
+        print("Could not salvage anything from the malformed response.")
+        record_salvage(0)
+        return None, False
+    print(f"Salvaged {recovered} item(s) from the malformed response "
+          f"({', '.join(f'{k}: {v}' for k, v in report['items'].items())}); incomplete: {missing or 'none'}.")
+    if not missing:
+        record_salvage(recovered, completed=True)
+        return data, True
+    if not followup:
+        record_salvage(recovered)
+        return data, False
+
+    # --- Follow-up Request for the Missing Sections Only ---
+    print(f"Requesting the missing section(s) {missing} for '{pdf_filepath}'...")
+    followup_data = None
+    still_missing = list(missing)
+    try:
+        with timing.span('followup', pipeline='ingest', file=pdf_filepath, model=model_name, sections=missing) as followup_span:
+            response = client.generate_content(model_name,
+                                               contents=[build_followup_prompt(GEMINI_PROMPT, data, report)] + list(contents[1:]),
+                                               response_schema=section_schema(response_schema, missing)
+                                               if response_schema is not None else None)
+            followup_text = response.text
+            followup_data = _parse_response_text(followup_text, response_raw_path(
+                pdf_filepath, f"{raw_part}.followup" if raw_part else "followup"))
+            if followup_data is None:
+                # A malformed follow-up only completes the sections it returned in full
+                followup_data, followup_report = salvage_response(followup_text)
+                incomplete = set(missing_sections(followup_report))
+            else:
+                incomplete = set()
+            if isinstance(followup_data, dict):
+                still_missing = [section for section in missing
+                                 if section in incomplete or not isinstance(followup_data.get(section), list)]
+            followup_span.set(ok=isinstance(followup_data, dict), missing=still_missing)
+    except Exception as e:
+        print(f"Warning: Follow-up request failed: {e}")
+    if not isinstance(followup_data, dict):
+        print("Warning: Loading the salvaged part of the response only.")
+        record_salvage(recovered, followup=True)
+        return data, False
+
+    merged = merge_responses([data, {section: followup_data.get(section) if isinstance(followup_data.get(section), list) else []
+                                     for section in missing}],
+                             os.path.basename(pdf_filepath), pdf_filepath)
+    complete = not still_missing
+    if not complete:
+        print(f"Warning: The follow-up did not return {still_missing} in full; loading what was recovered without caching it.")
+    record_salvage(recovered, followup=True, followup_ok=True, completed=complete)
+    return merged, complete
+
+
+# --- Network Stage: Upload + Generate + Parse ---
+def generate_response_data(pdf_filepath, GEMINI_PROMPT, cache=response_cache, client=default_client,
+                           page_texts=None, send_text=SEND_DOCUMENT_TEXT, page_numbers=None,
+                           structured_output=STRUCTURED_OUTPUT):
     """
-    Analyzes a PDF using Gemini, saves the JSON response, and populates a database.
-    Requires the Google API key to be passed.
+    Uploads a document to Gemini, generates the analysis and parses it as JSON.
+    Does not touch the database, so it is safe to run for several files in
+    parallel threads.
+
+    With structured_output the model gets create_database.RESPONSE_SCHEMA
+    as its response schema; otherwise create_database.py is sent along so
+    the model can infer the JSON layout from it. GEMINI_PROMPT should refer
+    to whichever of the two is sent (see the ingest prompt in
+    combining_add_and_create.process_and_add_file).
+
+    With send_text and page_texts from text_extraction (for a document whose
+    text layer can stand in for the file), the extracted text (and the
+    schema script, without structured output) is sent inline instead of
+    being uploaded.
 
     Args:
         pdf_filepath (str): Path to the input PDF file.
-        db_filepath (str): Path to the SQLite database file to create/update.
-        api_key (str): Your Google API Key for Generative AI.
+        GEMINI_PROMPT (str): The full prompt to send with the document.
+        cache (ResponseCache | None): Response cache to consult before calling
+            the API and to record new responses in. None disables caching.
+        client (LLMClient): Rate-limited, retrying client used for all API calls.
+        page_texts (list[str] | None): The document's extracted page texts.
+        send_text (bool): Send page_texts instead of uploading when possible.
+        page_numbers (list[int] | None): In text mode, send only these pages.
+        structured_output (bool): Request JSON following RESPONSE_SCHEMA.
 
     Returns:
-        bool: True if processing and database update were successful, False otherwise.
+        dict | None: The parsed JSON response, or None if any step failed.
     """
+    text_mode = send_text and can_send_as_text(pdf_filepath, page_texts)
+    # Page windows in text mode share the document path; excerpt PDFs have their own
+    raw_part = f"pages-{page_numbers[0]}-{page_numbers[-1]}" if text_mode and page_numbers else None
+    raw_filepath = response_raw_path(pdf_filepath, raw_part)
+    response_schema = RESPONSE_SCHEMA if structured_output else None
+
+    # --- Check Response Cache ---
+    cache_key = None
+    if cache is not None:
+        mode = '+'.join(name for name, on in (('text', text_mode), ('structured', structured_output)) if on)
+        try:
+            cache_key = cache.make_key(pdf_filepath, GEMINI_PROMPT, client.cache_identity(model_name),
+                                       mode=mode or None)
+        except OSError as e:
+            print(f"ERROR: Input file not found - {e}. Please check the path: '{pdf_filepath}'")
+            return None
+        cached_text = cache.get(cache_key)
+        if cached_text is not None:
+            print(f"Response cache hit for '{pdf_filepath}', skipping upload and generation.")
+            with timing.span('parse', pipeline='ingest', file=pdf_filepath, cached=True) as parse_span:
+                response_data = _parse_response_text(cached_text, raw_filepath)
+                parse_span.set(ok=response_data is not None)
+            return response_data
+        if cache.replay_only:
+            print(f"ERROR: No recorded response for '{pdf_filepath}' and the cache is in replay-only mode.")
+            return None
+
     # --- Configure API within the function ---
-    api_key=config.api_key
-    if not api_key:
+    api_key=getattr(config, 'api_key', None)
+    if not api_key and client.requires_api_key:
         print("ERROR: Google API Key is required but was not provided.")
-        return False
+        return None
     try:
-        genai.configure(api_key=api_key)
-        print("Google GenAI configured successfully within function.")
+        client.configure(api_key=api_key)
+        print(f"Model backend '{client.backend.name}' configured successfully within function.")
     except Exception as e:
         print(f"ERROR configuring Google GenAI: {e}")
-        return False # Exit if configuration fails
-
-    # --- Internal Fixed Parameters ---
-    filename_py = 'create_database.py' # Assumed location of the script for context/upload
-    output_filename = 'response_output.json' # Intermediate JSON output path
-    fallback_filename = 'response_raw.txt' # Fallback path for invalid JSON
-    model_name = "gemini-2.5-flash-preview-04-17" # Model to use
-
-
+        return None # Exit if configuration fails
 
     # --- Function Logic ---
     file1 = None # PDF file object
     file2 = None # Python script file object
-    json_successfully_created = False # Flag to track JSON file readiness
 
     try:
         print("-" * 30)
         print(f"Starting processing for PDF: '{pdf_filepath}'")
-        print(f"Target database: '{db_filepath}'")
+
+        if text_mode:
+            # --- Inline Text Instead of Uploads ---
+            document_text = format_document_text(os.path.basename(pdf_filepath), page_texts, page_numbers)
+            print(f"Sending extracted text ({len(document_text)} characters) instead of uploading.")
+            contents = [GEMINI_PROMPT, document_text]
+            if not structured_output:
+                if not os.path.exists(filename_py):
+                    print(f"ERROR: Required Python script '{filename_py}' not found in the current directory.")
+                    return None
+                with open(filename_py, encoding='utf-8') as f:
+                    contents.append(f"===== Python script: {filename_py} =====\n" + f.read())
+        else:
+            contents = None
 
         # --- File Uploads ---
-        print(f"Uploading PDF: {pdf_filepath}...")
-        file1 = genai.upload_file(path=pdf_filepath) # Use parameter
-        print(f"Uploaded PDF file URI: {file1.uri}")
+        if contents is None:
+            print(f"Uploading PDF: {pdf_filepath}...")
+            with timing.span('upload', pipeline='ingest', file=pdf_filepath, upload=os.path.basename(pdf_filepath)):
+                file1 = client.upload_file(path=pdf_filepath) # Use parameter
+            print(f"Uploaded PDF file URI: {file1.uri}")
+            contents = [GEMINI_PROMPT, file1]
 
-        # Check if the python script file exists before trying to upload
-        if not os.path.exists(filename_py):
-             print(f"ERROR: Required Python script '{filename_py}' not found in the current directory.")
-             if file1: genai.delete_file(file1.name) # Clean up already uploaded file
-             return False # Cannot proceed without the script context
+        if file1 is not None and not structured_output:
+            # Check if the python script file exists before trying to upload
+            if not os.path.exists(filename_py):
+                 print(f"ERROR: Required Python script '{filename_py}' not found in the current directory.")
+                 return None # Cannot proceed without the script context (cleanup in finally)
 
-        print(f"Uploading Python script context: {filename_py}...")
-        file2 = genai.upload_file(path=filename_py)
-        print(f"Uploaded Python file URI: {file2.uri}")
+            print(f"Uploading Python script context: {filename_py}...")
+            with timing.span('upload', pipeline='ingest', file=pdf_filepath, upload=filename_py):
+                file2 = client.upload_file(path=filename_py)
+            print(f"Uploaded Python file URI: {file2.uri}")
+            contents.append(file2)
 
         # --- Call Gemini API ---
-        model = genai.GenerativeModel(model_name=model_name)
         print(f"Generating content using model '{model_name}'...")
-        response = model.generate_content(
-            contents=[GEMINI_PROMPT, file1, file2]
-        )
-        print("Response received from API.")
-        raw_response_text = response.text
-
-        # --- Clean/Parse/Save Response ---
-        try:
-            print("Attempting to clean and parse API response as JSON...")
-            cleaned_text = raw_response_text.strip()
-            # Remove ```json header if present
-            if cleaned_text.lower().startswith("```json"):
-                first_line_end = cleaned_text.find('\n')
-                if first_line_end != -1: cleaned_text = cleaned_text[first_line_end:].strip()
-                else: cleaned_text = cleaned_text[len("```json"):].strip()
-                print("Removed leading '```json' marker.")
-            # Remove ``` footer if present
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-len("```")].strip()
-                print("Removed trailing '```' marker.")
-
-            response_data = json.loads(cleaned_text)
-            print(f"Successfully parsed JSON.")
-
-            print(f"Saving valid JSON response to '{output_filename}'...")
-            with open(output_filename, 'w', encoding='utf-8') as f:
-                json.dump(response_data, f, indent=4, ensure_ascii=False)
-            print(f"Successfully saved JSON to '{output_filename}'.")
-            json_successfully_created = True # Set flag
-
-        except json.JSONDecodeError:
-            print("ERROR: Failed to decode API response as JSON even after cleaning.")
-            print(f"Saving original raw response text to fallback file: '{fallback_filename}'")
-            with open(fallback_filename, 'w', encoding='utf-8') as f:
-                f.write(raw_response_text)
-            json_successfully_created = False
-        except Exception as e:
-            print(f"ERROR during JSON cleaning/saving: {e}")
-            json_successfully_created = False
-        # --- End cleaning/saving ---
+        with timing.span('generate', pipeline='ingest', file=pdf_filepath, model=model_name, text_mode=text_mode,
+                         structured=structured_output):
+            response = client.generate_content(
+                model_name,
+                contents=contents,
+                response_schema=response_schema
+            )
+            print("Response received from API.")
+            raw_response_text = response.text
 
-        # --- Call Database Function (Conditional) ---
-        if json_successfully_created:
-            print(f"\nAttempting to update database '{db_filepath}' from '{output_filename}'...")
-            try:
-                # **** THE ACTUAL CALL TO YOUR DATABASE SCRIPT'S FUNCTION ****
-                create_database_from_json(output_filename, db_filepath) # Pass parameters
-                # *************************************************************
-                print(f"Successfully called create_database_from_json.")
-                return True # Overall success
-            except Exception as db_e:
-                print(f"ERROR during database update call: {db_e}")
-                return False # DB step failed
-        else:
-            print("\nSkipping database update because JSON generation failed.")
-            return False # JSON step failed
+        # --- Clean/Parse Response ---
+        with timing.span('parse', pipeline='ingest', file=pdf_filepath, cached=False) as parse_span:
+            response_data = _parse_response_text(raw_response_text, raw_filepath)
+            parse_span.set(ok=response_data is not None)
+        cache_text = raw_response_text
+        if response_data is None:
+            # --- Salvage Malformed Response ---
+            response_data, complete = _salvage_malformed_response(raw_response_text, pdf_filepath, GEMINI_PROMPT, contents, client,
+                                                                  response_schema=response_schema, raw_part=raw_part)
+            cache_text = json.dumps(response_data, ensure_ascii=False) if complete else None
+        if cache_text is not None and cache_key is not None:
+            cache.put(cache_key, cache_text, pdf_filepath, client.cache_identity(model_name)) # Only record valid, complete responses
+        return response_data
 
     except FileNotFoundError as e:
         print(f"ERROR: Input file not found - {e}. Please check the path: '{pdf_filepath}'")
-        return False
+        return None
     except Exception as e:
         print(f"ERROR during API call or file upload: {e}")
         if 'response' in locals() and hasattr(response, 'prompt_feedback'):
@@ -136,7 +308,7 @@ def process_pdf_to_db(pdf_filepath, db_filepath,GEMINI_PROMPT):
         if 'response' in locals() and hasattr(response, 'candidates') and response.candidates:
             print(f"Finish Reason: {response.candidates[0].finish_reason}")
             print(f"Safety Ratings: {response.candidates[0].safety_ratings}")
-        return False
+        return None
 
     finally:
         # --- Clean up uploaded Google Cloud files ---
@@ -146,11 +318,190 @@ def process_pdf_to_db(pdf_filepath, db_filepath,GEMINI_PROMPT):
         for f in files_to_delete:
              try:
                  print(f"Deleting uploaded file: {f.name}")
-                 genai.delete_file(f.name)
+                 with timing.span('remote_delete', pipeline='ingest', file=pdf_filepath):
+                     client.delete_file(f.name)
              except Exception as e:
                  print(f"Warning: Error deleting file {f.name}: {e}")
         print("-" * 30)
 
+
+# --- Network Stage for Large Documents: Page Windows ---
+def document_page_count(pdf_filepath, page_texts=None):
+    """Number of pages of a PDF (from page_texts when given), or None if unknown."""
+    if not pdf_filepath.lower().endswith('.pdf'):
+        return None
+    if page_texts is not None:
+        return len(page_texts)
+    if PdfReader is None:
+        return None
+    try:
+        return len(PdfReader(pdf_filepath).pages)
+    except Exception as e:
+        print(f"Warning: Could not count the pages of '{pdf_filepath}': {e}")
+        return None
+
+
+def generate_chunked_response_data(pdf_filepath, GEMINI_PROMPT, cache=response_cache, client=default_client,
+                                   page_texts=None, send_text=SEND_DOCUMENT_TEXT, page_count=None,
+                                   chunk_pages=CHUNK_PAGES, overlap=CHUNK_OVERLAP, max_workers=CHUNK_WORKERS):
+    """
+    Analyzes a long document in page windows (see document_chunking), so
+    no single response has to describe the whole document. Windows are sent
+    as excerpt PDFs (or as their extracted text in text mode) and generated
+    in parallel; their responses are converted to original page numbers
+    and merged into one response. If any window fails, the whole document
+    fails, so a partial result is never loaded, and windows that have not
+    started yet are cancelled.
+
+    Args:
+        pdf_filepath (str): Path to the input PDF file.
+        GEMINI_PROMPT (str): The full prompt for the document.
+        cache, client, page_texts, send_text: See generate_response_data.
+        page_count (int | None): Pages of the document (counted if None).
+        chunk_pages (int): Pages each window is responsible for.
+        overlap (int): Context pages repeated from the previous window.
+        max_workers (int): Windows generated at the same time.
+
+    Returns:
+        dict | None: The merged response, or None if any window failed.
+    """
+    page_count = page_count or document_page_count(pdf_filepath, page_texts)
+    if not page_count:
+        print(f"ERROR: Cannot split '{pdf_filepath}' into page windows.")
+        return None
+    text_mode = send_text and can_send_as_text(pdf_filepath, page_texts)
+    windows = page_windows(page_count, chunk_pages, overlap)
+    print(f"Processing '{pdf_filepath}' ({page_count} pages) in {len(windows)} window(s) of up to {chunk_pages} page(s)...")
+
+    def run_window(pages, owned):
+        owned_ranges = format_page_ranges(sorted(owned))
+        if text_mode:
+            prompt = (GEMINI_PROMPT + f'\n This part of the document contains only pages {format_page_ranges(pages)}. '
+                      f'Give page numbers as shown in the page markers. Only report content, mistakes and good answers on pages {owned_ranges}; the other pages are context.')
+            return generate_response_data(pdf_filepath, prompt, cache, client, page_texts=page_texts,
+                                          send_text=True, page_numbers=pages)
+        if len(pages) >= page_count:
+            excerpt_path = pdf_filepath # The window keeps every page: send the document itself
+        else:
+            sliced = slice_pdf(pdf_filepath, pages, neighbourhood=0)
+            if sliced is None:
+                print(f"ERROR: Could not write the excerpt of pages {format_page_ranges(pages)} of '{pdf_filepath}'.")
+                return None
+            excerpt_path, _ = sliced
+        prompt = (GEMINI_PROMPT + f'\n The uploaded PDF is an excerpt of this document holding only original pages {format_page_ranges(pages)}, in that order. '
+                  f'For page numbers give the page position within the uploaded excerpt (1 = its first page). '
+                  f'Only report content, mistakes and good answers on original pages {owned_ranges}; the other pages are context.')
+        return generate_response_data(excerpt_path, prompt, cache, client, send_text=False)
+
+    window_responses = [None] * len(windows)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as executor:
+        futures = {executor.submit(run_window, pages, owned): index for index, (pages, owned) in enumerate(windows)}
+        for future in as_completed(futures):
+            index = futures[future]
+            pages, owned = windows[index]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"ERROR: Window with pages {format_page_ranges(pages)} of '{pdf_filepath}' raised an exception: {e}")
+                data = None
+            if not isinstance(data, dict):
+                print(f"ERROR: Window with pages {format_page_ranges(pages)} of '{pdf_filepath}' failed; not loading a partial result.")
+                # Windows not yet started would only cost API calls for a discarded result
+                executor.shutdown(wait=False, cancel_futures=True)
+                return None
+            window_responses[index] = remap_window_response(data, pages, owned, relative=not text_mode)
+
+    with timing.span('merge', pipeline='ingest', file=pdf_filepath, windows=len(windows)):
+        merged = merge_responses(window_responses, os.path.basename(pdf_filepath), pdf_filepath)
+    print(f"Merged {len(windows)} window(s): {sum(len(s['topics']) for s in merged['content'])} topic(s), "
+          f"{len(merged['mistakes'])} mistake(s), {len(merged['good_answers'])} good answer(s).")
+    return merged
+
+
+def generate_document_data(pdf_filepath, GEMINI_PROMPT, cache=response_cache, client=default_client,
+                           page_texts=None, send_text=SEND_DOCUMENT_TEXT, chunk_threshold=CHUNK_THRESHOLD_PAGES):
+    """
+    Runs generate_chunked_response_data for PDFs longer than
+    chunk_threshold pages and generate_response_data for everything else.
+    Arguments and return value as for generate_response_data.
+    """
+    if chunk_threshold is not None:
+        page_count = document_page_count(pdf_filepath, page_texts)
+        if page_count is not None and page_count > chunk_threshold:
+            return generate_chunked_response_data(pdf_filepath, GEMINI_PROMPT, cache, client,
+                                                  page_texts=page_texts, send_text=send_text, page_count=page_count)
+    return generate_response_data(pdf_filepath, GEMINI_PROMPT, cache, client, page_texts=page_texts, send_text=send_text)
+
+
+# --- Database Stage: Populate (+ optional JSON copy) ---
+def response_json_path(pdf_filepath):
+    """Returns the per-document path used when saving a parsed response as JSON."""
+    return os.path.join(response_json_dir, os.path.basename(pdf_filepath) + '.json')
+
+
+def write_response_to_db(response_data, db_filepath, pdf_filepath=None, save_json=SAVE_RESPONSE_JSON):
+    """
+    Populates the database directly from a parsed Gemini response, without
+    an intermediate file round trip. This is the only stage that writes to
+    SQLite; callers running several files at once must call it from a
+    single thread.
+
+    Args:
+        response_data (dict): The parsed JSON response from generate_response_data.
+        db_filepath (str): Path to the SQLite database file to create/update.
+        pdf_filepath (str | None): The analyzed document, used to name the saved JSON.
+        save_json (bool): If True, also save the response to response_json_path(pdf_filepath).
+
+    Returns:
+        bool: True if the database update was successful, False otherwise.
+    """
+    if save_json and pdf_filepath:
+        json_path = response_json_path(pdf_filepath)
+        try:
+            os.makedirs(response_json_dir, exist_ok=True)
+            print(f"Saving valid JSON response to '{json_path}'...")
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(response_data, f, ensure_ascii=False)
+            print(f"Successfully saved JSON to '{json_path}'.")
+        except Exception as e:
+            print(f"Warning: Could not save JSON response to '{json_path}': {e}")
+
+    print(f"\nAttempting to update database '{db_filepath}' from the parsed response...")
+    try:
+        with timing.span('load', pipeline='ingest', file=pdf_filepath) as load_span:
+            success = populate_database(response_data, db_filepath, source_label=pdf_filepath or 'parsed response')
+            load_span.set(ok=success)
+        print(f"Successfully called populate_database.")
+        return success
+    except Exception as db_e:
+        print(f"ERROR during database update call: {db_e}")
+        return False # DB step failed
+
+
+# --- Main Processing Function ---
+def process_pdf_to_db(pdf_filepath, db_filepath,GEMINI_PROMPT, cache=response_cache, page_texts=None):
+    """
+    Analyzes a PDF using Gemini and populates a database from the response.
+    Runs generate_document_data (page windows for long PDFs) and
+    write_response_to_db back to back.
+
+    Args:
+        pdf_filepath (str): Path to the input PDF file.
+        db_filepath (str): Path to the SQLite database file to create/update.
+        GEMINI_PROMPT (str): The full prompt to send with the document.
+        cache (ResponseCache | None): Response cache, see generate_response_data.
+        page_texts (list[str] | None): Extracted page texts, see generate_response_data.
+
+    Returns:
+        bool: True if processing and database update were successful, False otherwise.
+    """
+    print(f"Target database: '{db_filepath}'")
+    response_data = generate_document_data(pdf_filepath, GEMINI_PROMPT, cache, page_texts=page_texts)
+    if response_data is None:
+        print("\nSkipping database update because JSON generation failed.")
+        return False # JSON step failed
+    return write_response_to_db(response_data, db_filepath, pdf_filepath)
+
 # --- Example Usage (How to call the function) ---
 if __name__ == "__main__":
     print("="*40)
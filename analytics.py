@@ -1,47 +1,115 @@
 import sqlite3
 import pandas as pd
 import json
+import argparse
 import create_database
+from db_connection import get_connection
 
 DB_FILE = 'database.db'   # match whatever your importer wrote
-conn = sqlite3.connect(DB_FILE)
-create_database.initialize_database_schema(DB_FILE)
-
-# Pull raw data
-mistakes = pd.read_sql('SELECT * FROM Mistakes;', conn, parse_dates=['date_recorded'])
-goods    = pd.read_sql('SELECT * FROM Good_Answers;', conn, parse_dates=['date_recorded'])
-topics   = pd.read_sql('SELECT topic_id, topic_name FROM Topics;', conn)
-
-# Compute metrics (as you already have)
-all_events = pd.concat([
-    mistakes.assign(is_good=0),
-    goods   .assign(is_good=1)
-])
-daily = all_events.groupby('date_recorded').agg(
-    total=('is_good','size'),
-    correct=('is_good','sum')
-).reset_index()
-daily['error_rate'] = 1 - daily['correct'] / daily['total']
-
-m2 = mistakes.merge(topics, on='topic_id')
-g2 = goods   .merge(topics, on='topic_id')
-topic_events = pd.concat([
-    m2.assign(is_good=0),
-    g2.assign(is_good=1)
-])
-by_topic = topic_events.groupby('topic_name').agg(
-    total=('is_good','size'),
-    correct=('is_good','sum')
-).reset_index()
-by_topic['error_rate'] = 1 - by_topic['correct'] / by_topic['total']
-
-# Export CSV/JSON
-daily.to_csv('daily_metrics.csv', index=False)
-by_topic.to_csv('topic_metrics.csv', index=False)
-
-json_payload = {
-    "daily": daily[['date_recorded','error_rate']].to_dict(orient='records'),
-    "by_topic": by_topic[['topic_name','error_rate']].to_dict(orient='records')
-}
-with open('latest_summary.json', 'w') as f:
-    json.dump(json_payload, f, default=str)
\ No newline at end of file
+
+# Daily/topic totals come from the Daily_Metrics and Topic_Metrics tables,
+# which triggers keep current as mistakes and good answers are inserted, so
+# producing the metrics never rescans the Mistakes/Good_Answers history.
+SQL_DAILY_METRICS = """
+    SELECT date_recorded, total, correct
+    FROM Daily_Metrics
+    ORDER BY date_recorded;
+"""
+
+SQL_TOPIC_METRICS = """
+    SELECT T.topic_name, SUM(TM.total) AS total, SUM(TM.correct) AS correct
+    FROM Topic_Metrics TM
+    JOIN Topics T ON TM.topic_id = T.topic_id
+    GROUP BY T.topic_name
+    ORDER BY T.topic_name;
+"""
+
+# The same totals computed directly from the event tables. Each side only
+# reads the grouped column (covering index scans on date_recorded/topic_id),
+# never the text columns. Used with --from-events to check or bypass the
+# aggregate tables.
+SQL_DAILY_METRICS_FROM_EVENTS = """
+    SELECT date_recorded, SUM(total) AS total, SUM(correct) AS correct
+    FROM (
+        SELECT date_recorded, COUNT(*) AS total, 0 AS correct
+        FROM Mistakes WHERE date_recorded IS NOT NULL GROUP BY date_recorded
+        UNION ALL
+        SELECT date_recorded, COUNT(*) AS total, COUNT(*) AS correct
+        FROM Good_Answers WHERE date_recorded IS NOT NULL GROUP BY date_recorded
+    )
+    GROUP BY date_recorded
+    ORDER BY date_recorded;
+"""
+
+SQL_TOPIC_METRICS_FROM_EVENTS = """
+    SELECT T.topic_name, SUM(E.total) AS total, SUM(E.correct) AS correct
+    FROM (
+        SELECT topic_id, COUNT(*) AS total, 0 AS correct
+        FROM Mistakes GROUP BY topic_id
+        UNION ALL
+        SELECT topic_id, COUNT(*) AS total, COUNT(*) AS correct
+        FROM Good_Answers GROUP BY topic_id
+    ) E
+    JOIN Topics T ON E.topic_id = T.topic_id
+    GROUP BY T.topic_name
+    ORDER BY T.topic_name;
+"""
+
+
+def load_daily_metrics(conn: sqlite3.Connection, from_events: bool = False) -> pd.DataFrame:
+    """
+    Returns date_recorded, total, correct and error_rate per day.
+    With from_events=True the totals are recomputed from Mistakes and
+    Good_Answers instead of read from Daily_Metrics.
+    """
+    query = SQL_DAILY_METRICS_FROM_EVENTS if from_events else SQL_DAILY_METRICS
+    daily = pd.read_sql(query, conn, parse_dates=['date_recorded'])
+    daily['error_rate'] = 1 - daily['correct'] / daily['total']
+    return daily
+
+
+def load_topic_metrics(conn: sqlite3.Connection, from_events: bool = False) -> pd.DataFrame:
+    """
+    Returns topic_name, total, correct and error_rate per topic name.
+    With from_events=True the totals are recomputed from Mistakes and
+    Good_Answers instead of read from Topic_Metrics.
+    """
+    query = SQL_TOPIC_METRICS_FROM_EVENTS if from_events else SQL_TOPIC_METRICS
+    by_topic = pd.read_sql(query, conn)
+    by_topic['error_rate'] = 1 - by_topic['correct'] / by_topic['total']
+    return by_topic
+
+
+def export_metrics(daily: pd.DataFrame, by_topic: pd.DataFrame) -> None:
+    """Writes daily_metrics.csv, topic_metrics.csv and latest_summary.json."""
+    daily.to_csv('daily_metrics.csv', index=False)
+    by_topic.to_csv('topic_metrics.csv', index=False)
+
+    json_payload = {
+        "daily": daily[['date_recorded','error_rate']].to_dict(orient='records'),
+        "by_topic": by_topic[['topic_name','error_rate']].to_dict(orient='records')
+    }
+    with open('latest_summary.json', 'w') as f:
+        json.dump(json_payload, f, default=str)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Export daily and per-topic error rate metrics.")
+    p.add_argument(
+        "--db", "-d",
+        default=DB_FILE,
+        help=f"Path to your SQLite database file (default: {DB_FILE})"
+    )
+    p.add_argument(
+        "--from-events",
+        action="store_true",
+        help="Recompute totals from the Mistakes/Good_Answers tables instead of the aggregate tables."
+    )
+    args = p.parse_args()
+
+    # Also applies pending migrations (creates/backfills the metric tables)
+    create_database.initialize_database_schema(args.db)
+    conn = get_connection(args.db)
+
+    # Compute metrics and export CSV/JSON
+    export_metrics(load_daily_metrics(conn, args.from_events), load_topic_metrics(conn, args.from_events))
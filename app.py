@@ -1,10 +1,49 @@
+import os
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-# Load generated metrics
-daily = pd.read_csv('daily_metrics.csv', parse_dates=['date_recorded'])
-by_topic = pd.read_csv('topic_metrics.csv')
+from analytics import load_daily_metrics, load_topic_metrics
+from create_database import initialize_database_schema
+from db_connection import get_connection
+
+DB_FILE = 'database.db'
+
+
+def db_change_token(db_path: str) -> tuple:
+    """
+    Returns a value that changes whenever a write is committed to the
+    database: the modification time and size of the database file and of
+    its WAL file (commits in WAL mode only touch the -wal file).
+    """
+    token = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            stat = os.stat(path)
+            token.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            token.append(None)
+    return tuple(token)
+
+
+@st.cache_data(show_spinner="Loading metrics...")
+def load_metrics(db_path: str, change_token: tuple):
+    """
+    Queries the daily and per-topic metrics from the database. Cached per
+    (db_path, change_token), so reruns do no work until the database changes.
+    """
+    initialize_database_schema(db_path) # Applies pending migrations (metric tables)
+    conn = get_connection(db_path)
+    return load_daily_metrics(conn), load_topic_metrics(conn)
+
+
+# Load metrics live from the database, or from exported CSVs if there is none
+if os.path.exists(DB_FILE):
+    daily, by_topic = load_metrics(DB_FILE, db_change_token(DB_FILE))
+else:
+    st.info(f"Database '{DB_FILE}' not found, showing exported metrics from CSV files.")
+    daily = pd.read_csv('daily_metrics.csv', parse_dates=['date_recorded'])
+    by_topic = pd.read_csv('topic_metrics.csv')
 
 st.title("📊 Performance Dashboard")
 
@@ -29,7 +68,7 @@ fig2 = px.bar(
 st.plotly_chart(fig2, use_container_width=True)
 
 # 3. Good vs Bad by Topic
-by_topic['bad'] = by_topic['total'] - by_topic['correct']
+by_topic = by_topic.assign(bad=by_topic['total'] - by_topic['correct']) # Copy: never mutate the cached frame
 melted = by_topic.melt(
     id_vars=['topic_name'],
     value_vars=['correct','bad'],
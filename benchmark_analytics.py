@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+benchmark_analytics.py
+
+Compares time and peak Python memory of the analytics metric computations:
+  - legacy:     the original approach (SELECT * into pandas, concat, groupby)
+  - events:     GROUP BY over the event tables (analytics.py --from-events)
+  - aggregates: reads of the trigger-maintained metric tables (default)
+and checks that all three produce identical metrics.
+
+Usage: python benchmark_analytics.py [--db synthetic.db] [--rows 1000000]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+import tracemalloc
+
+import pandas as pd
+
+from analytics import load_daily_metrics, load_topic_metrics
+from synthetic_database import create_synthetic_database
+
+
+def legacy_metrics(conn):
+    """The original analytics.py computation, kept for comparison only."""
+    mistakes = pd.read_sql('SELECT * FROM Mistakes;', conn, parse_dates=['date_recorded'])
+    goods    = pd.read_sql('SELECT * FROM Good_Answers;', conn, parse_dates=['date_recorded'])
+    topics   = pd.read_sql('SELECT topic_id, topic_name FROM Topics;', conn)
+
+    all_events = pd.concat([
+        mistakes.assign(is_good=0),
+        goods   .assign(is_good=1)
+    ])
+    daily = all_events.groupby('date_recorded').agg(
+        total=('is_good','size'),
+        correct=('is_good','sum')
+    ).reset_index()
+    daily['error_rate'] = 1 - daily['correct'] / daily['total']
+
+    m2 = mistakes.merge(topics, on='topic_id')
+    g2 = goods   .merge(topics, on='topic_id')
+    topic_events = pd.concat([
+        m2.assign(is_good=0),
+        g2.assign(is_good=1)
+    ])
+    by_topic = topic_events.groupby('topic_name').agg(
+        total=('is_good','size'),
+        correct=('is_good','sum')
+    ).reset_index()
+    by_topic['error_rate'] = 1 - by_topic['correct'] / by_topic['total']
+    return daily, by_topic
+
+
+METHODS = {
+    'legacy': legacy_metrics,
+    'events': lambda conn: (load_daily_metrics(conn, from_events=True), load_topic_metrics(conn, from_events=True)),
+    'aggregates': lambda conn: (load_daily_metrics(conn), load_topic_metrics(conn)),
+}
+
+
+def measure(method, db_filepath):
+    """Runs one method on a fresh connection; returns (result, seconds, peak MB)."""
+    conn = sqlite3.connect(db_filepath)
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = METHODS[method](conn)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.close()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark analytics metric computation.")
+    p.add_argument("--db", "-d", default="synthetic.db", help="Benchmark database (created if missing)")
+    p.add_argument("--rows", type=int, default=1_000_000, help="Mistakes to generate when creating the database")
+    p.add_argument("--json", "-j", action="store_true", help="Print results as JSON")
+    args = p.parse_args()
+
+    if not os.path.exists(args.db):
+        create_synthetic_database(args.db, mistakes=args.rows, good_answers=args.rows // 4)
+
+    results = {}
+    outputs = {}
+    for method in METHODS:
+        (daily, by_topic), seconds, peak_mb = measure(method, args.db)
+        outputs[method] = (daily, by_topic)
+        results[method] = {'seconds': round(seconds, 3), 'peak_mb': round(peak_mb, 1)}
+
+    legacy_daily, legacy_topic = outputs['legacy']
+    for method, (daily, by_topic) in outputs.items():
+        results[method]['identical_to_legacy'] = bool(daily.equals(legacy_daily) and by_topic.equals(legacy_topic))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'method':<12}{'seconds':>10}{'peak MB':>10}  identical")
+    for method, r in results.items():
+        print(f"{method:<12}{r['seconds']:>10.3f}{r['peak_mb']:>10.1f}  {r['identical_to_legacy']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+benchmark_suite.py
+
+Times the application's hot database paths on synthetic databases of
+increasing size (see synthetic_database.py):
+  - find_mistakes_topics.get_topics_with_mistakes
+  - find_mistakes_topics.export_questions_for_topic_to_txt (busiest topic)
+  - create_database.get_topic_id_pairs_as_string
+  - localisation.get_mistake_locations (all, topic-filtered and one page)
+  - analytics.load_daily_metrics + load_topic_metrics (aggregate tables)
+  - the create_study_guide_md source file query (busiest topic)
+
+Results are written as JSON (one record per scale and benchmark) so runs can
+be compared. With --baseline, medians are compared against an earlier result
+file and the script exits with status 1 if any benchmark got slower than the
+tolerance allows.
+
+Usage: python benchmark_suite.py [--scales 10000,100000,1000000] [--output benchmark_results.json]
+                                 [--baseline old_results.json --tolerance 1.25]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from analytics import load_daily_metrics, load_topic_metrics
+from create_database import get_topic_id_pairs_as_string
+from db_connection import get_connection, close_connection
+from find_mistakes_topics import get_topics_with_mistakes, export_questions_for_topic_to_txt
+from localisation import get_mistake_locations, iter_mistake_locations
+from study_guide_generation import SQL_TOPIC_SOURCE_FILES
+from synthetic_database import create_synthetic_database
+
+# --- Configuration ---
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000) # Mistakes per database
+DEFAULT_REPEATS = 3
+DEFAULT_DB_DIR = 'benchmark_dbs'
+DEFAULT_OUTPUT = 'benchmark_results.json'
+DEFAULT_TOLERANCE = 1.25 # Allowed median slowdown against a baseline
+
+
+def scale_parameters(mistakes):
+    """
+    Synthetic database parameters for a scale given as its number of
+    mistakes. Other entities grow with it; 1,000,000 mistakes gives
+    synthetic_database's defaults.
+    """
+    topics = max(20, mistakes // 5000)
+    return {'mistakes': mistakes,
+            'good_answers': mistakes // 4,
+            'subjects': max(2, topics // 40),
+            'topics': topics,
+            'sources': max(20, mistakes // 2000),
+            'topic_locations': max(100, mistakes // 50),
+            'subtopic_locations': max(100, mistakes // 50)}
+
+
+def busiest_topic(db_filepath):
+    """(topic_id, topic_name) of the topic with most mistakes."""
+    return get_connection(db_filepath).execute("""
+        SELECT T.topic_id, T.topic_name
+        FROM Topic_Metrics TM JOIN Topics T ON T.topic_id = TM.topic_id
+        GROUP BY T.topic_id
+        ORDER BY SUM(TM.total - TM.correct) DESC
+        LIMIT 1
+    """).fetchone()
+
+
+def _export_questions(db_filepath, topic):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not export_questions_for_topic_to_txt(topic[1], os.path.join(tmp_dir, 'questions.txt'), db_filepath):
+            raise RuntimeError(f"Exporting questions for '{topic[1]}' failed.")
+        return None
+
+
+def _analytics(db_filepath, topic):
+    conn = get_connection(db_filepath)
+    return len(load_daily_metrics(conn)) + len(load_topic_metrics(conn))
+
+
+# Each benchmark takes (db_filepath, busiest topic) and returns a result
+# size (or None) for the report
+BENCHMARKS = {
+    'get_topics_with_mistakes': lambda db, topic: len(get_topics_with_mistakes(db)),
+    'export_questions_for_topic_to_txt': _export_questions,
+    'get_topic_id_pairs_as_string': lambda db, topic: get_topic_id_pairs_as_string(db).count('\n') + 1,
+    'get_mistake_locations': lambda db, topic: len(get_mistake_locations(db)),
+    'mistake_locations_for_topic': lambda db, topic: sum(1 for _ in iter_mistake_locations(db, topic=topic[1])),
+    'mistake_locations_page': lambda db, topic: sum(1 for _ in iter_mistake_locations(db, limit=50)),
+    'analytics_metrics': _analytics,
+    'study_guide_source_files': lambda db, topic: len(
+        get_connection(db).execute(SQL_TOPIC_SOURCE_FILES, (topic[0],)).fetchall()),
+}
+
+
+def time_benchmark(name, db_filepath, topic, repeats):
+    """
+    Runs one benchmark `repeats` times (after one untimed warm-up run) with
+    the called functions' own printing suppressed.
+
+    Returns:
+        dict: min/median/mean seconds and the result size.
+    """
+    timings = []
+    size = None
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        BENCHMARKS[name](db_filepath, topic)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            size = BENCHMARKS[name](db_filepath, topic)
+            timings.append(time.perf_counter() - started)
+    return {'min_s': round(min(timings), 6),
+            'median_s': round(statistics.median(timings), 6),
+            'mean_s': round(statistics.fmean(timings), 6),
+            'result_size': size}
+
+
+def run_suite(scales, names, repeats, db_dir, regenerate=False, seed=0):
+    """
+    Benchmarks every scale, creating each synthetic database in db_dir
+    unless it already exists (or regenerate is set).
+
+    Returns:
+        dict: {'environment': {...}, 'results': [{scale, benchmark, ...}, ...]}
+    """
+    os.makedirs(db_dir, exist_ok=True)
+    results = []
+    for scale in scales:
+        db_filepath = os.path.join(db_dir, f"synthetic_{scale}_seed{seed}.db")
+        if regenerate or not os.path.exists(db_filepath):
+            create_synthetic_database(db_filepath, seed=seed, **scale_parameters(scale))
+        topic = busiest_topic(db_filepath)
+        for name in names:
+            record = {'scale': scale, 'benchmark': name, 'repeats': repeats}
+            record.update(time_benchmark(name, db_filepath, topic, repeats))
+            results.append(record)
+            print(f"{scale:>10}  {name:<36}{record['median_s'] * 1000:>12.2f} ms  (size {record['result_size']})")
+        close_connection(db_filepath)
+
+    environment = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'python': platform.python_version(),
+                   'sqlite': sqlite3.sqlite_version,
+                   'platform': platform.platform(),
+                   'seed': seed}
+    return {'environment': environment, 'results': results}
+
+
+def compare_with_baseline(report, baseline, tolerance):
+    """
+    Prints each benchmark's median against the baseline report.
+
+    Returns:
+        list[str]: 'scale/benchmark' entries slower than baseline * tolerance.
+    """
+    previous = {(r['scale'], r['benchmark']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'scale':>10}  {'benchmark':<36}{'ratio':>8}")
+    for record in report['results']:
+        old = previous.get((record['scale'], record['benchmark']))
+        if old is None or not old['median_s']:
+            continue
+        ratio = record['median_s'] / old['median_s']
+        slower = ratio > tolerance
+        print(f"{record['scale']:>10}  {record['benchmark']:<36}{ratio:>8.2f}{'  REGRESSION' if slower else ''}")
+        if slower:
+            regressions.append(f"{record['scale']}/{record['benchmark']}")
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark hot database queries at several scales.")
+    p.add_argument("--scales", default=','.join(str(s) for s in DEFAULT_SCALES),
+                   help="Comma-separated numbers of mistakes, one database each")
+    p.add_argument("--only", help="Comma-separated benchmark names to run (default: all)")
+    p.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    p.add_argument("--db-dir", default=DEFAULT_DB_DIR, help="Where synthetic databases are kept and reused")
+    p.add_argument("--regenerate", action="store_true", help="Recreate databases even if they exist")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", "-o", default=DEFAULT_OUTPUT, help="JSON result file")
+    p.add_argument("--baseline", "-b", help="Earlier JSON result file to compare against")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                   help="Median ratio above which a benchmark counts as a regression")
+    args = p.parse_args()
+
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+    names = [n.strip() for n in args.only.split(',')] if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        p.error(f"Unknown benchmark(s): {', '.join(sorted(unknown))}. Choose from: {', '.join(BENCHMARKS)}")
+
+    report = run_suite(scales, names, args.repeats, args.db_dir, args.regenerate, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
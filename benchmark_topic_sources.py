@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+benchmark_topic_sources.py
+
+Compares the two ways of finding the sources related to a topic, as done in
+step 4 of study_guide_generation.create_study_guide_md:
+  - legacy: the original query (Sources LEFT JOINed against locations,
+            subtopics, mistakes and good answers)
+  - index:  a primary key lookup in the trigger-maintained Topic_Sources table
+and checks that both return the same sources for every sampled topic.
+
+Usage: python benchmark_topic_sources.py [--db synthetic.db] [--rows 1000000] [--topics 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import time
+
+from create_database import initialize_database_schema
+from db_connection import close_connection
+from synthetic_database import create_synthetic_database
+
+# The original step 4 query, kept for comparison only
+SQL_LEGACY = """
+    SELECT DISTINCT s.filepath, s.filename
+    FROM Sources s
+    LEFT JOIN Topic_Source_Locations tsl ON s.source_id = tsl.source_id AND tsl.topic_id = ?
+    LEFT JOIN Subtopic_Source_Locations ssl ON s.source_id = ssl.source_id
+    LEFT JOIN Subtopics sub ON ssl.subtopic_id = sub.subtopic_id AND sub.topic_id = ?
+    LEFT JOIN Mistakes m ON s.source_id = m.source_id AND (m.topic_id = ? OR m.subtopic_id IN (SELECT subtopic_id FROM Subtopics WHERE topic_id = ?))
+    LEFT JOIN Good_Answers ga ON s.source_id = ga.source_id AND (ga.topic_id = ? OR ga.subtopic_id IN (SELECT subtopic_id FROM Subtopics WHERE topic_id = ?))
+    WHERE tsl.topic_id = ? OR sub.topic_id = ? OR m.topic_id = ? OR ga.topic_id = ?
+"""
+
+SQL_INDEX = """
+    SELECT s.filepath, s.filename
+    FROM Topic_Sources ts
+    JOIN Sources s ON s.source_id = ts.source_id
+    WHERE ts.topic_id = ?
+"""
+
+METHODS = {
+    'legacy': lambda cursor, topic_id: cursor.execute(SQL_LEGACY, (topic_id,) * 10).fetchall(),
+    'index': lambda cursor, topic_id: cursor.execute(SQL_INDEX, (topic_id,)).fetchall(),
+}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the topic -> source lookup.")
+    p.add_argument("--db", "-d", default="synthetic.db", help="Benchmark database (created if missing)")
+    p.add_argument("--rows", type=int, default=1_000_000, help="Mistakes to generate when creating the database")
+    p.add_argument("--topics", "-t", type=int, default=5, help="Number of topics to look up")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", "-j", action="store_true", help="Print results as JSON")
+    args = p.parse_args()
+
+    if not os.path.exists(args.db):
+        create_synthetic_database(args.db, mistakes=args.rows, good_answers=args.rows // 4)
+    initialize_database_schema(args.db) # Builds Topic_Sources on databases from before migration 4
+    close_connection(args.db)
+
+    conn = sqlite3.connect(args.db)
+    cursor = conn.cursor()
+    topic_ids = [row[0] for row in cursor.execute("SELECT topic_id FROM Topics")]
+    sample = random.Random(args.seed).sample(topic_ids, min(args.topics, len(topic_ids)))
+
+    results = {}
+    outputs = {}
+    for method, lookup in METHODS.items():
+        timings = []
+        outputs[method] = []
+        for topic_id in sample:
+            started = time.perf_counter()
+            rows = lookup(cursor, topic_id)
+            timings.append(time.perf_counter() - started)
+            outputs[method].append(set(rows))
+        results[method] = {
+            'topics': len(sample),
+            'mean_ms': round(statistics.mean(timings) * 1000, 3),
+            'max_ms': round(max(timings) * 1000, 3),
+            'total_s': round(sum(timings), 3),
+        }
+    conn.close()
+
+    results['index']['identical_to_legacy'] = outputs['index'] == outputs['legacy']
+    results['index']['speedup'] = round(results['legacy']['total_s'] / max(results['index']['total_s'], 1e-9), 1)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'method':<10}{'topics':>8}{'mean ms':>12}{'max ms':>12}{'total s':>10}")
+    for method, r in results.items():
+        print(f"{method:<10}{r['topics']:>8}{r['mean_ms']:>12.3f}{r['max_ms']:>12.3f}{r['total_s']:>10.3f}")
+    print(f"Identical results: {results['index']['identical_to_legacy']}, speedup: {results['index']['speedup']}x")
+
+
+if __name__ == "__main__":
+    main()
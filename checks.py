@@ -0,0 +1,25 @@
+"""
+checks.py
+
+Shared [OK]/[FAIL] reporting for the test-*.py check scripts: call check()
+for every expectation and finish() at the end of the script.
+"""
+
+import sys
+
+failures = 0
+
+
+def check(description, condition):
+    """Prints [OK] or [FAIL] with the description and counts failures."""
+    global failures
+    failures += 0 if condition else 1
+    print(f"[{'OK' if condition else 'FAIL'}] {description}")
+
+
+def finish(success_message):
+    """Exits with status 1 if any check failed, otherwise prints success_message."""
+    if failures:
+        print(f"{failures} check(s) failed.")
+        sys.exit(1)
+    print(success_message)
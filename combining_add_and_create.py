@@ -1,47 +1,196 @@
-import google.generativeai as genai
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from create_database import *
 
 
-from add_to_database import process_pdf_to_db
+from add_to_database import process_pdf_to_db, generate_document_data, write_response_to_db, response_cache, STRUCTURED_OUTPUT
+from llm_client import default_client, format_client_stats
+from response_salvage import salvage_stats, format_salvage_stats
+from topic_index import TopicIndex, document_sample, DEFAULT_TOP_K
+from text_extraction import extract_documents
+import timing
 
+DEFAULT_MAX_WORKERS = 4 # Parallel upload/generate jobs when running concurrently
+TOPIC_CANDIDATES = DEFAULT_TOP_K # Existing topics listed in each file's prompt (most relevant first)
+MAX_PROMPT_CHARS = 12_000 # Upper bound for a file's prompt; candidate topics are dropped to fit
 
-def process_and_add_file():
 
+def build_file_prompt(base_prompt: str, filename: str, filepath: str, topic_index: TopicIndex,
+                      top_k: int = TOPIC_CANDIDATES, max_chars: int = MAX_PROMPT_CHARS,
+                      pages: list[str] | None = None) -> str:
+    """
+    Builds the prompt for one file: the base instructions, a note for text
+    files, the file's name and path, and the existing topics most relevant
+    to the document (see topic_index.TopicIndex) so the model can reuse
+    their names. Each file's prompt is built from scratch, so its size does
+    not depend on how many files came before it.
+
+    Args:
+        base_prompt: The shared instructions.
+        filename, filepath: The document being analyzed.
+        topic_index: Index of the topics already in the database.
+        top_k: Maximum number of candidate topics listed.
+        max_chars: Size bound; the least relevant candidates are dropped
+                   until the prompt fits.
+        pages: The document's extracted page texts, if already available.
+
+    Returns:
+        The prompt text.
+    """
+    with timing.span('prompt', pipeline='ingest', file=filepath) as prompt_span:
+        prompt = base_prompt
+        if os.path.splitext(filename)[1] == '.txt':
+            prompt += f'\n Since this document is a text file instead of page number give row number but keep the same name in the json'
+        prompt += f'\n The name of the information file is'+filename+f'\n And the filepath is '+filepath
+
+        candidates = topic_index.candidates(document_sample(filepath, pages=pages), k=top_k) if len(topic_index) else []
+        header = f'\n This is the current topic list, make it so that every new topic if its name would be similar or mean the same thing to have use the topic name and id already there, the format is topic name: topic id, here is the topic list:\n'
+        lines = [f"{topic_name}: {topic_id}" for topic_id, topic_name, _ in candidates]
+        while lines and len(prompt) + len(header) + len('\n'.join(lines)) > max_chars:
+            lines.pop() # Least relevant first
+        if lines:
+            prompt += header + '\n'.join(lines)
+        if len(prompt) > max_chars:
+            print(f"Warning: Prompt for '{filename}' is {len(prompt)} characters, above the {max_chars} limit, even without topics.")
+        print(f"Prompt for '{filename}': {len(prompt)} characters, {len(lines)} of {len(topic_index)} topic(s) listed.")
+        prompt_span.set(chars=len(prompt), topics=len(lines), known_topics=len(topic_index))
+    return prompt
+
+
+def process_and_add_file(max_workers: int = 1, cache=response_cache) -> list[dict]:
+    """
+    Processes every file in 'data/' that is not yet in the database.
+
+    With max_workers > 1 the upload/generate stage of up to max_workers files
+    runs in parallel threads, while the results are written to the database
+    one at a time from the calling thread (a single SQLite writer). Prompts
+    are built before the jobs start, so in this mode a file's topic list does
+    not include topics added by files processed in the same run.
+
+    The text of all new files is extracted first in one pass (across a
+    process pool, see text_extraction.extract_documents) and reused for
+    picking candidate topics and, with add_to_database.SEND_DOCUMENT_TEXT,
+    as the document content sent instead of an upload.
+
+    Args:
+        max_workers: Number of files to upload/generate at the same time.
+                     1 (default) processes the files strictly one by one.
+        cache: ResponseCache used for the Gemini calls (None disables it).
+               Pass ResponseCache(replay_only=True) to replay recorded
+               responses offline, e.g. to benchmark the ingest path.
+
+    Returns:
+        A list with one dict per file in 'data/', with keys 'filename',
+        'filepath', 'status' ('added', 'skipped' or 'failed') and 'error'
+        (None unless the file failed).
+    """
     initialize_database_schema('database.db')
 
     database='database.db'
-    GEMINI_PROMPT = """
-    Please analyze the provided content according to the database schema and processing logic defined by the associated Python script. Generate ONLY a JSON object containing "content", "mistakes", and "good_answers" keys.
+    # The prompt points the model at what defines the JSON layout: the response
+    # schema with structured output, otherwise create_database.py sent along
+    if STRUCTURED_OUTPUT:
+        layout = "the response schema"
+        structure = "the response schema"
+        handling = "the fields the response schema requires"
+        insertion = "the response schema"
+    else:
+        layout = "the associated Python script"
+        structure = "the script"
+        handling = "the script's handling logic"
+        insertion = "the data insertion logic in the associated Python script"
+    GEMINI_PROMPT = f"""
+    Please analyze the provided content according to the database schema and processing logic defined by {layout}. Generate ONLY a JSON object containing "content", "mistakes", and "good_answers" keys.
     Instructions:
     Content Extraction ("content" key):Identify the hierarchy: Subject(s) -> Topic(s) -> Subtopic(s).
     For each Topic and Subtopic, extract source location details (page_number, location_description/location_detail, keywords as applicable). Use null for any unidentifiable location details.
-    Populate the "content" list following the nested structure expected by the script.
+    Populate the "content" list following the nested structure expected by {structure}.
     Mistake Identification ("mistakes" key):Only extract mistakes if the source document type is homework, exam, graded work, or if mistakes are explicitly marked in the text. Otherwise, this should be an empty list ([]). Dontjust read if the file is an lecture or exam try and deduse based on content, if it has many exercises is homeowrk/exam
     For each mistake, record: location (page_number, location_detail - use null if unknown), description, type, details, relevant_topic name, and relevant_subtopic name (if applicable).
     Use the source filename and filepath provided externally (which will be added later) for the source_filename and source_filepath fields within each mistake object.
-    If relevant_topic or relevant_subtopic cannot be confidently identified, use null or omit the entry based on the script's handling logic (assume linking to the topic is mandatory if a mistake is recorded). Do not invent links.
+    If relevant_topic or relevant_subtopic cannot be confidently identified, use null or omit the entry based on {handling} (assume linking to the topic is mandatory if a mistake is recorded). Do not invent links.
     Good Answer Identification ("good_answers" key):Only extract good answers if the source document type is homework, exam, solution set, or if good examples are explicitly marked. Otherwise, this should be an empty list ([]).
     For each good answer, record: location (page_number, location_detail - use null if unknown), description, relevant_topic name, and relevant_subtopic name (if applicable).
     Use the source filename and filepath provided externally (which will be added later) for the source_filename and source_filepath fields within each good answer object.
     Handle missing topic/subtopic links as described for mistakes. The sources should only contain the filename and the filepath the filepath,  only one entry. The descriptions you should add youself, based on the content. 
     Same with keywords for localizaiton try and find them, and specify. If there is page number on the document dont use it, use only the actual page counter. Make as many topics as possible, you can ignore subtopics and replace them with null
     General Rules:Do not invent data. Use null for optional fields where information cannot be extracted. Make sure the topics extracted are correct, Make sure none you dont create NoneType object, and find all mistakes
-    Adhere strictly to the JSON structure expected by the data insertion logic in the associated Python script. Only output the raw JSON object, nothing else before or after it.
+    Adhere strictly to the JSON structure expected by {insertion}. Only output the raw JSON object, nothing else before or after it.
     """
     entries=os.listdir('data')
+    results = []
+    pending = [] # Files not yet in the database
     for filename in entries:
 
         if not check_file_exists_in_db(database,filename):
-            name1, extension = os.path.splitext(filename)
-            if extension=='.txt':
-                GEMINI_PROMPT=GEMINI_PROMPT+f'\n Since this document is a text file instead of page number give row number but keep the same name in the json'
-            file='data/'+filename
-            file_name_to_gemini=f'\n The name of the information file is'+filename+f'\n And the filepath is '+file
-            topics=get_topic_id_pairs_as_string()
-            GEMINI_PROMPT=GEMINI_PROMPT+file_name_to_gemini
-            GEMINI_PROMPT=GEMINI_PROMPT+f'\n This is the current topic list, make it so that every new topic if its name would be similar or mean the same thing to have use the topic name and id already there, the format is topic name: topic id, here is the topic list:\n'+topics
-            process_pdf_to_db(file,database,GEMINI_PROMPT)
+            pending.append(filename)
+        else:
+            print(f'File {filename} is already in the database')
+            results.append(_file_result(filename, 'data/'+filename, 'skipped'))
+
+    # --- Extract Text of New Files (cached per page, parsed in parallel) ---
+    page_texts = extract_documents(database, ['data/'+filename for filename in pending]) if pending else {}
+
+    jobs = [] # (filename, file, prompt, pages) for files that still need processing
+    topic_index = None # Existing topics, for each file's candidate topic list
+    for filename in pending:
+        file='data/'+filename
+        pages = page_texts.get(file)
+        if max_workers <= 1 or topic_index is None:
+            # Sequentially, each file sees the topics added by the files before it
+            topic_index = TopicIndex.from_database(database)
+        prompt = build_file_prompt(GEMINI_PROMPT, filename, file, topic_index, pages=pages)
+        if max_workers <= 1:
+            success = process_pdf_to_db(file,database,prompt,cache,page_texts=pages)
+            results.append(_file_result(filename, file, 'added' if success else 'failed',
+                                        None if success else 'Processing failed, see log for details'))
         else:
-            print(f'File {filename} is already in the database')
\ No newline at end of file
+            jobs.append((filename, file, prompt, pages))
+
+    if jobs:
+        results.extend(_run_concurrent_jobs(jobs, database, max_workers, cache))
+
+    added = sum(1 for r in results if r['status'] == 'added')
+    failed = sum(1 for r in results if r['status'] == 'failed')
+    print(f"Ingest finished: {added} added, {failed} failed, {len(results) - added - failed} skipped.")
+    print(f"API client: {format_client_stats(default_client.stats())}")
+    if salvage_stats()['malformed']:
+        print(f"Response salvage: {format_salvage_stats(salvage_stats())}")
+    return results
+
+
+def _file_result(filename, filepath, status, error=None):
+    return {'filename': filename, 'filepath': filepath, 'status': status, 'error': error}
+
+
+def _run_concurrent_jobs(jobs, database, max_workers, cache):
+    """
+    Runs generate_document_data for all jobs in a bounded thread pool and
+    writes each finished response to the database from the calling thread,
+    so only one connection ever writes at a time.
+    """
+    results = []
+    print(f"Processing {len(jobs)} file(s) with up to {max_workers} parallel worker(s)...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_job = {
+            executor.submit(generate_document_data, file, prompt, cache, page_texts=pages): (filename, file)
+            for filename, file, prompt, pages in jobs
+        }
+        for future in as_completed(future_to_job):
+            filename, file = future_to_job[future]
+            try:
+                response_data = future.result()
+            except Exception as e:
+                print(f"ERROR: Processing '{file}' raised an exception: {e}")
+                results.append(_file_result(filename, file, 'failed', str(e)))
+                continue
+            if response_data is None:
+                results.append(_file_result(filename, file, 'failed', 'Upload or generation failed, see log for details'))
+                continue
+            # Single writer: database updates happen here, one file at a time
+            if write_response_to_db(response_data, database, file):
+                results.append(_file_result(filename, file, 'added'))
+            else:
+                results.append(_file_result(filename, file, 'failed', 'Database update failed'))
+    return results
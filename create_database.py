@@ -2,6 +2,9 @@ import json
 import sqlite3
 import os
 import datetime # For default date
+import time
+from db_connection import get_connection
+from response_schema import build_response_schema, validate_response, validate_records, format_validation_errors
 
 # --- Database Schema Definitions (Constants) ---
 
@@ -109,17 +112,303 @@ CREATE TABLE IF NOT EXISTS Good_Answers (
 );
 """
 
+# Aggregate tables behind analytics.py, kept current by triggers (migration 2)
+SQL_CREATE_DAILY_METRICS = """
+CREATE TABLE IF NOT EXISTS Daily_Metrics (
+    date_recorded DATE PRIMARY KEY,   -- One row per day with recorded events
+    total INTEGER NOT NULL DEFAULT 0, -- Mistakes + good answers recorded that day
+    correct INTEGER NOT NULL DEFAULT 0 -- Good answers recorded that day
+);
+"""
+
+SQL_CREATE_TOPIC_METRICS = """
+CREATE TABLE IF NOT EXISTS Topic_Metrics (
+    topic_id INTEGER PRIMARY KEY,     -- Topics.topic_id the events are linked to
+    total INTEGER NOT NULL DEFAULT 0, -- Mistakes + good answers for the topic
+    correct INTEGER NOT NULL DEFAULT 0 -- Good answers for the topic
+);
+"""
+
+
+def _metrics_trigger_sql(table: str, correct: int) -> list[str]:
+    """
+    Builds the triggers that keep Daily_Metrics and Topic_Metrics in step
+    with inserts, deletes and updates on an event table (Mistakes or
+    Good_Answers). correct is 1 if a row of the table counts as correct.
+    """
+    def add(row, sign):
+        sql = ""
+        if sign == '+': # Make sure the aggregate rows exist before counting up
+            sql += f"""
+        INSERT OR IGNORE INTO Daily_Metrics (date_recorded) SELECT {row}.date_recorded WHERE {row}.date_recorded IS NOT NULL;
+        INSERT OR IGNORE INTO Topic_Metrics (topic_id) SELECT {row}.topic_id WHERE {row}.topic_id IS NOT NULL;"""
+        return sql + f"""
+        UPDATE Daily_Metrics SET total = total {sign} 1, correct = correct {sign} {correct} WHERE date_recorded = {row}.date_recorded;
+        UPDATE Topic_Metrics SET total = total {sign} 1, correct = correct {sign} {correct} WHERE topic_id = {row}.topic_id;"""
+
+    cleanup = """
+        DELETE FROM Daily_Metrics WHERE date_recorded = OLD.date_recorded AND total <= 0;
+        DELETE FROM Topic_Metrics WHERE topic_id = OLD.topic_id AND total <= 0;"""
+
+    prefix = f"trg_{table.lower()}_metrics"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN{add('NEW', '+')}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN{add('OLD', '-')}{cleanup}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF date_recorded, topic_id ON {table} BEGIN{add('OLD', '-')}{add('NEW', '+')}{cleanup}\nEND;",
+    ]
+
+
+SQL_BACKFILL_METRICS = [
+    """
+    INSERT OR IGNORE INTO Daily_Metrics (date_recorded, total, correct)
+    SELECT date_recorded, COUNT(*), SUM(is_good)
+    FROM (SELECT date_recorded, 0 AS is_good FROM Mistakes
+          UNION ALL SELECT date_recorded, 1 AS is_good FROM Good_Answers)
+    WHERE date_recorded IS NOT NULL
+    GROUP BY date_recorded;
+    """,
+    """
+    INSERT OR IGNORE INTO Topic_Metrics (topic_id, total, correct)
+    SELECT topic_id, COUNT(*), SUM(is_good)
+    FROM (SELECT topic_id, 0 AS is_good FROM Mistakes
+          UNION ALL SELECT topic_id, 1 AS is_good FROM Good_Answers)
+    WHERE topic_id IS NOT NULL
+    GROUP BY topic_id;
+    """,
+]
+
+# --- Topic -> Source Index ---
+# Topic_Sources answers "which sources relate to topic X" with one primary
+# key lookup. A source relates to a topic through a topic location, a
+# location of one of the topic's subtopics, or a mistake/good answer filed
+# under the topic. refs counts those rows so a pair disappears once its last
+# reference is deleted; triggers keep it current as data is loaded.
+SQL_CREATE_TOPIC_SOURCES = """
+CREATE TABLE IF NOT EXISTS Topic_Sources (
+    topic_id INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    refs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic_id, source_id),
+    FOREIGN KEY (topic_id) REFERENCES Topics(topic_id) ON DELETE CASCADE,
+    FOREIGN KEY (source_id) REFERENCES Sources(source_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+
+def _topic_sources_trigger_sql(table: str, topic_expr: str, columns: str) -> list[str]:
+    """
+    Builds the triggers that keep Topic_Sources in step with a table whose
+    rows link a topic to a source. topic_expr yields the row's topic_id,
+    with {row} standing for NEW or OLD; columns are the ones whose update
+    can change the pair.
+    """
+    def add(row, sign):
+        topic = topic_expr.format(row=row)
+        if sign == '+':
+            return f"""
+        INSERT INTO Topic_Sources (topic_id, source_id, refs)
+        SELECT {topic}, {row}.source_id, 1 WHERE {topic} IS NOT NULL AND {row}.source_id IS NOT NULL
+        ON CONFLICT (topic_id, source_id) DO UPDATE SET refs = refs + 1;"""
+        return f"""
+        UPDATE Topic_Sources SET refs = refs - 1 WHERE topic_id = {topic} AND source_id = {row}.source_id;
+        DELETE FROM Topic_Sources WHERE topic_id = {topic} AND source_id = {row}.source_id AND refs <= 0;"""
+
+    prefix = f"trg_{table.lower()}_topic_sources"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN{add('NEW', '+')}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN{add('OLD', '-')}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF {columns} ON {table} BEGIN{add('OLD', '-')}{add('NEW', '+')}\nEND;",
+    ]
+
+
+_SUBTOPIC_TOPIC = "(SELECT topic_id FROM Subtopics WHERE subtopic_id = {row}.subtopic_id)"
+
+# Subtopic location rows reach their topic through Subtopics, so moving or
+# deleting a subtopic moves or drops its locations' references. (The delete
+# runs BEFORE, because cascaded location deletes no longer see the subtopic.)
+_SQL_SUBTOPIC_REFS = """
+        SELECT {topic}, source_id, {sign}COUNT(*) FROM Subtopic_Source_Locations
+        WHERE subtopic_id = OLD.subtopic_id AND source_id IS NOT NULL GROUP BY source_id
+        ON CONFLICT (topic_id, source_id) DO UPDATE SET refs = refs + excluded.refs;"""
+SQL_SUBTOPIC_TOPIC_SOURCES_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_subtopics_topic_sources_delete BEFORE DELETE ON Subtopics BEGIN
+        INSERT INTO Topic_Sources (topic_id, source_id, refs){_SQL_SUBTOPIC_REFS.format(topic='OLD.topic_id', sign='-')}
+        DELETE FROM Topic_Sources WHERE topic_id = OLD.topic_id AND refs <= 0;
+END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_subtopics_topic_sources_update AFTER UPDATE OF topic_id ON Subtopics BEGIN
+        INSERT INTO Topic_Sources (topic_id, source_id, refs){_SQL_SUBTOPIC_REFS.format(topic='OLD.topic_id', sign='-')}
+        INSERT INTO Topic_Sources (topic_id, source_id, refs){_SQL_SUBTOPIC_REFS.format(topic='NEW.topic_id', sign='')}
+        DELETE FROM Topic_Sources WHERE topic_id = OLD.topic_id AND refs <= 0;
+END;""",
+]
+
+SQL_BACKFILL_TOPIC_SOURCES = """
+    INSERT OR IGNORE INTO Topic_Sources (topic_id, source_id, refs)
+    SELECT topic_id, source_id, COUNT(*)
+    FROM (SELECT topic_id, source_id FROM Topic_Source_Locations
+          UNION ALL SELECT sub.topic_id, ssl.source_id
+                    FROM Subtopic_Source_Locations ssl JOIN Subtopics sub ON ssl.subtopic_id = sub.subtopic_id
+          UNION ALL SELECT topic_id, source_id FROM Mistakes
+          UNION ALL SELECT topic_id, source_id FROM Good_Answers)
+    WHERE topic_id IS NOT NULL AND source_id IS NOT NULL
+    GROUP BY topic_id, source_id;
+"""
+
+# Full-text indexes over the stored text (migration 5). They are FTS5
+# external-content tables: the text stays in the base table and the index
+# only stores tokens, kept in sync by triggers. The porter tokenizer lets
+# "chain rules" match "chain rule".
+def _fts_sql(fts_table: str, table: str, rowid_column: str, columns: list[str]) -> list[str]:
+    """
+    Builds the FTS5 table over table's columns, the insert/delete/update
+    triggers that keep it in sync, and the statement that backfills it from
+    the existing rows.
+    """
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"NEW.{c}" for c in columns)
+    old_values = ', '.join(f"OLD.{c}" for c in columns)
+    insert = f"INSERT INTO {fts_table} (rowid, {column_list}) VALUES (NEW.{rowid_column}, {new_values});"
+    delete = (f"INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) "
+              f"VALUES ('delete', OLD.{rowid_column}, {old_values});")
+    prefix = f"trg_{fts_table.lower()}"
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list}, content='{table}', content_rowid='{rowid_column}', tokenize='porter unicode61');""",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN\n    {insert}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN\n    {delete}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF {column_list} ON {table} BEGIN\n"
+        f"    {delete}\n    {insert}\nEND;",
+        f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild');",
+    ]
+
+MISTAKES_FTS_COLUMNS = ['mistake_description', 'problem_formulation', 'mistake_details']
+SUBTOPIC_LOCATIONS_FTS_COLUMNS = ['keywords', 'location_detail']
+
+# Locally extracted document text (migration 6, see text_extraction.py),
+# keyed by the SHA-256 of the file's bytes so a document is parsed once no
+# matter how often it is renamed, moved or re-ingested. Page_Text_Documents
+# records that a file was extracted, even if none of its pages had text.
+SQL_CREATE_PAGE_TEXT_DOCUMENTS = """
+CREATE TABLE IF NOT EXISTS Page_Text_Documents (
+    content_hash TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL,
+    text_chars INTEGER NOT NULL,
+    extracted_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+SQL_CREATE_PAGE_TEXTS = """
+CREATE TABLE IF NOT EXISTS Page_Texts (
+    content_hash TEXT NOT NULL,
+    page_number INTEGER NOT NULL, -- 1-based page (or block of rows for text files)
+    page_text TEXT NOT NULL,
+    PRIMARY KEY (content_hash, page_number),
+    FOREIGN KEY (content_hash) REFERENCES Page_Text_Documents(content_hash) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+# --- Schema Migrations ---
+# Versioned upgrades applied on top of the base tables above. The schema
+# version of a database file is stored in PRAGMA user_version; migration N
+# (1-based position in this list) upgrades a database from version N-1 to N.
+# Only ever append new migrations, never edit or reorder existing ones.
+SCHEMA_MIGRATIONS = [
+    # 1: Indexes for the hot lookups (topic by name, source by filename,
+    #    mistakes/good answers by topic, mistakes by date)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_topics_topic_name ON Topics(topic_name);",
+        "CREATE INDEX IF NOT EXISTS idx_sources_filename ON Sources(filename);",
+        "CREATE INDEX IF NOT EXISTS idx_mistakes_topic_id ON Mistakes(topic_id);",
+        "CREATE INDEX IF NOT EXISTS idx_mistakes_date_recorded ON Mistakes(date_recorded);",
+        "CREATE INDEX IF NOT EXISTS idx_good_answers_topic_id ON Good_Answers(topic_id);",
+    ],
+    # 2: Trigger-maintained Daily_Metrics/Topic_Metrics aggregates, backfilled
+    #    from the existing history
+    [SQL_CREATE_DAILY_METRICS, SQL_CREATE_TOPIC_METRICS]
+    + _metrics_trigger_sql("Mistakes", 0)
+    + _metrics_trigger_sql("Good_Answers", 1)
+    + SQL_BACKFILL_METRICS,
+    # 3: Date index on Good_Answers so per-day counts over both event tables
+    #    are covering index scans
+    [
+        "CREATE INDEX IF NOT EXISTS idx_good_answers_date_recorded ON Good_Answers(date_recorded);",
+    ],
+    # 4: Topic -> source index for study guide file lookup, maintained by
+    #    triggers and backfilled from the existing data
+    [SQL_CREATE_TOPIC_SOURCES]
+    + _topic_sources_trigger_sql("Topic_Source_Locations", "{row}.topic_id", "topic_id, source_id")
+    + _topic_sources_trigger_sql("Subtopic_Source_Locations", _SUBTOPIC_TOPIC, "subtopic_id, source_id")
+    + _topic_sources_trigger_sql("Mistakes", "{row}.topic_id", "topic_id, source_id")
+    + _topic_sources_trigger_sql("Good_Answers", "{row}.topic_id", "topic_id, source_id")
+    + SQL_SUBTOPIC_TOPIC_SOURCES_TRIGGERS
+    + [SQL_BACKFILL_TOPIC_SOURCES],
+    # 5: FTS5 full-text search over mistakes and subtopic source locations
+    #    (see search.py), backfilled from the existing rows
+    _fts_sql("Mistakes_FTS", "Mistakes", "mistake_id", MISTAKES_FTS_COLUMNS)
+    + _fts_sql("Subtopic_Locations_FTS", "Subtopic_Source_Locations", "subtopic_location_id",
+               SUBTOPIC_LOCATIONS_FTS_COLUMNS),
+    # 6: Per-page text cache for local extraction (text_extraction.py)
+    [SQL_CREATE_PAGE_TEXT_DOCUMENTS, SQL_CREATE_PAGE_TEXTS],
+]
+
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+# JSON schema of the ingest response ("content", "mistakes", "good_answers"),
+# derived from the tables the records are loaded into. Sent to the model as
+# its response schema and used to validate records before loading them.
+RESPONSE_SCHEMA = build_response_schema([SQL_CREATE_SUBJECTS, SQL_CREATE_TOPICS, SQL_CREATE_SUBTOPICS,
+                                         SQL_CREATE_SOURCES, SQL_CREATE_TOPIC_SOURCE_LOCATIONS,
+                                         SQL_CREATE_SUBTOPIC_SOURCE_LOCATIONS, SQL_CREATE_MISTAKES,
+                                         SQL_CREATE_GOOD_ANSWERS])
+
+
+def apply_schema_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Brings an existing database up to SCHEMA_VERSION by running every
+    migration newer than its PRAGMA user_version. Each migration runs in its
+    own write-locked transaction together with the version bump, so an
+    interrupted upgrade never leaves a half-applied version behind and
+    connections migrating at the same time never apply a version twice.
+
+    Args:
+        conn: Open connection to a database whose base tables already exist.
+
+    Returns:
+        The schema version of the database after migrating.
+    """
+    current_version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    while current_version < SCHEMA_VERSION:
+        try:
+            # Take the write lock first and re-read the version under it:
+            # another connection may have applied migrations meanwhile
+            conn.execute("BEGIN IMMEDIATE")
+            current_version = conn.execute("PRAGMA user_version;").fetchone()[0]
+            if current_version >= SCHEMA_VERSION:
+                conn.commit()
+                break
+            version = current_version + 1
+            for statement in SCHEMA_MIGRATIONS[version - 1]:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version};")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"Applied schema migration {version}.")
+        current_version = version
+    return current_version
+
 
 def initialize_database_schema(db_file_path: str) -> bool:
     """
     Connects to the SQLite database and creates all necessary tables
-    including Mistakes and Good_Answers with the problem_formulation field.
+    including Mistakes and Good_Answers with the problem_formulation field,
+    then applies any pending schema migrations (see SCHEMA_MIGRATIONS).
     """
     conn = None
     try:
-        conn = sqlite3.connect(db_file_path)
+        conn = get_connection(db_file_path) # Shared connection: WAL, busy timeout, foreign keys
         cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
 
         # Execute CREATE TABLE statements for the full schema
         cursor.execute(SQL_CREATE_SUBJECTS)
@@ -132,6 +421,7 @@ def initialize_database_schema(db_file_path: str) -> bool:
         cursor.execute(SQL_CREATE_GOOD_ANSWERS) # Uses updated constant
 
         conn.commit()
+        apply_schema_migrations(conn)
         print(f"Database schema (with Problem Formulation) initialized successfully in '{db_file_path}'.")
         return True
 
@@ -143,14 +433,260 @@ def initialize_database_schema(db_file_path: str) -> bool:
         print(f"An unexpected error occurred during schema initialization: {e}")
         if conn: conn.rollback()
         return False
-    finally:
-        if conn: conn.close()
+
+# --- Bulk Loading ---
+BULK_BATCH_SIZE = 1000 # Rows buffered per executemany call
+
+class BulkLoader:
+    """
+    Populates an open connection from parsed 'content', 'mistakes' and
+    'good_answers' data (see create_database_from_json for the structure).
+
+    Subject, topic, subtopic and source name->id maps are preloaded once when
+    the loader is created and kept up to date as rows are added, so lookups
+    never go back to the database. Locations, mistakes and good answers are
+    buffered and written with executemany. Call flush() before committing.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = BULK_BATCH_SIZE):
+        self.cursor = conn.cursor()
+        self.batch_size = batch_size
+        self.rows_inserted = 0
+        self.started = time.perf_counter()
+        self._topic_locations = []
+        self._subtopic_locations = []
+        self._mistakes = []
+        self._good_answers = []
+        self._preload_id_maps()
+
+    def _preload_id_maps(self):
+        cursor = self.cursor
+        self.subject_ids = {name: sid for sid, name in cursor.execute("SELECT subject_id, subject_name FROM Subjects")}
+        self.topic_ids = {}
+        self.topic_ids_by_name = {} # First (lowest id) topic per name, like a lookup by name alone
+        for tid, sid, name in cursor.execute("SELECT topic_id, subject_id, topic_name FROM Topics ORDER BY topic_id"):
+            self.topic_ids[(sid, name)] = tid
+            self.topic_ids_by_name.setdefault(name, tid)
+        self.subtopic_ids = {(tid, name): stid for stid, tid, name in cursor.execute("SELECT subtopic_id, topic_id, subtopic_name FROM Subtopics")}
+        self.source_ids = {(fname, fpath): src_id for src_id, fname, fpath in cursor.execute("SELECT source_id, filename, filepath FROM Sources")}
+
+    # --- ID helpers (map first, insert on miss) ---
+    def _get_or_create_subject(self, subject_name, description=None):
+        subject_id = self.subject_ids.get(subject_name)
+        if subject_id is None:
+            subject_id = self.cursor.execute("INSERT INTO Subjects (subject_name, subject_description) VALUES (?, ?)", (subject_name, description)).lastrowid
+            self.subject_ids[subject_name] = subject_id
+            self.rows_inserted += 1
+        return subject_id
+
+    def _get_or_create_topic(self, subject_id, topic_name, description=None):
+        topic_id = self.topic_ids.get((subject_id, topic_name))
+        if topic_id is None:
+            topic_id = self.cursor.execute("INSERT INTO Topics (subject_id, topic_name, topic_description) VALUES (?, ?, ?)", (subject_id, topic_name, description)).lastrowid
+            self.topic_ids[(subject_id, topic_name)] = topic_id
+            self.topic_ids_by_name.setdefault(topic_name, topic_id)
+            self.rows_inserted += 1
+        return topic_id
+
+    def _get_or_create_subtopic(self, topic_id, subtopic_name, description=None):
+        subtopic_id = self.subtopic_ids.get((topic_id, subtopic_name))
+        if subtopic_id is None:
+            subtopic_id = self.cursor.execute("INSERT INTO Subtopics (topic_id, subtopic_name, subtopic_description) VALUES (?, ?, ?)", (topic_id, subtopic_name, description)).lastrowid
+            self.subtopic_ids[(topic_id, subtopic_name)] = subtopic_id
+            self.rows_inserted += 1
+        return subtopic_id
+
+    def _get_or_create_source(self, filename, filepath):
+        source_id = self.source_ids.get((filename, filepath))
+        if source_id is None:
+            source_id = self.cursor.execute("INSERT INTO Sources (filename, filepath) VALUES (?, ?)", (filename, filepath)).lastrowid
+            self.source_ids[(filename, filepath)] = source_id
+            self.rows_inserted += 1
+        return source_id
+
+    def _get_subtopic_id_by_name(self, topic_id, subtopic_name):
+        if not topic_id: return None
+        return self.subtopic_ids.get((topic_id, subtopic_name))
+
+    # --- Section loaders ---
+    def load_content(self, content_data):
+        """Adds subjects, topics, subtopics and their source locations."""
+        for subject_data in content_data:
+            self.add_subject(subject_data)
+
+    def add_subject(self, subject_data):
+        subject_name = subject_data.get("subject_name")
+        if not subject_name: return
+        subject_id = self._get_or_create_subject(subject_name, subject_data.get("subject_description"))
+        for topic_data in subject_data.get("topics", []):
+            topic_name = topic_data.get("topic_name")
+            if not topic_name: continue
+            topic_id = self._get_or_create_topic(subject_id, topic_name, topic_data.get("topic_description"))
+            for loc_data in topic_data.get("source_locations", []):
+                filename = loc_data.get("filename"); filepath = loc_data.get("filepath")
+                if not filename or not filepath: continue
+                source_id = self._get_or_create_source(filename, filepath)
+                self._buffer(self._topic_locations, (topic_id, source_id, loc_data.get("page"), loc_data.get("location_description")))
+            for subtopic_data in topic_data.get("subtopics", []):
+                subtopic_name = subtopic_data.get("subtopic_name")
+                if not subtopic_name: continue
+                subtopic_id = self._get_or_create_subtopic(topic_id, subtopic_name, subtopic_data.get("subtopic_description"))
+                for sub_loc_data in subtopic_data.get("source_locations", []):
+                    filename = sub_loc_data.get("filename"); filepath = sub_loc_data.get("filepath")
+                    if not filename or not filepath: continue
+                    source_id = self._get_or_create_source(filename, filepath)
+                    self._buffer(self._subtopic_locations, (subtopic_id, source_id, sub_loc_data.get("page"), sub_loc_data.get("location_detail"), sub_loc_data.get("keywords")))
+
+    def load_mistakes(self, mistakes_data):
+        """Adds mistakes, skipping (with a warning) entries without a known topic."""
+        for mistake_data in mistakes_data:
+            self.add_mistake(mistake_data)
+
+    def add_mistake(self, mistake_data):
+        source_filename = mistake_data.get("source_filename"); source_filepath = mistake_data.get("source_filepath")
+        desc = mistake_data.get("description"); topic_name = mistake_data.get("relevant_topic")
+        if not source_filename or not source_filepath or not desc or not topic_name:
+            print(f"Warning: Skipping mistake due to missing required fields. Desc: {desc}")
+            return
+
+        source_id = self._get_or_create_source(source_filename, source_filepath)
+        topic_id = self.topic_ids_by_name.get(topic_name)
+        if not topic_id:
+            print(f"Warning: Could not find topic '{topic_name}' for mistake. Skipping. Desc: {desc}")
+            return
+
+        subtopic_id = None; subtopic_name = mistake_data.get("relevant_subtopic")
+        if subtopic_name:
+            subtopic_id = self._get_subtopic_id_by_name(topic_id, subtopic_name)
+
+        self._buffer(self._mistakes, (
+            source_id,
+            topic_id,
+            subtopic_id,
+            desc,
+            mistake_data.get("problem_formulation"), # None if not present
+            mistake_data.get("type"),
+            mistake_data.get("page"),
+            mistake_data.get("location_detail"),
+            mistake_data.get("details")
+        ))
+
+    def load_good_answers(self, good_answers_data):
+        """Adds good answers, skipping (with a warning) entries without a known topic."""
+        for answer_data in good_answers_data:
+            self.add_good_answer(answer_data)
+
+    def add_good_answer(self, answer_data):
+        source_filename = answer_data.get("source_filename")
+        source_filepath = answer_data.get("source_filepath")
+        desc = answer_data.get("description")
+        topic_name = answer_data.get("relevant_topic")
+
+        if not source_filename or not source_filepath or not desc or not topic_name:
+            print(f"Warning: Skipping good answer due to missing required fields (source_filename, source_filepath, description, relevant_topic). Desc: {desc}")
+            return
+
+        source_id = self._get_or_create_source(source_filename, source_filepath)
+        topic_id = self.topic_ids_by_name.get(topic_name)
+        if not topic_id:
+             print(f"Warning: Could not find topic '{topic_name}' for good answer. Skipping. Desc: {desc}")
+             return
+
+        subtopic_id = None
+        subtopic_name = answer_data.get("relevant_subtopic")
+        if subtopic_name: # Only look for subtopic if topic was found and subtopic name provided
+            subtopic_id = self._get_subtopic_id_by_name(topic_id, subtopic_name)
+            if not subtopic_id:
+                 print(f"Warning: Could not find subtopic '{subtopic_name}' under topic '{topic_name}' for good answer. Linking to topic only.")
+
+        self._buffer(self._good_answers, (
+            source_id,
+            topic_id,
+            subtopic_id, # Can be None
+            desc,
+            answer_data.get("problem_formulation"), # None if not present
+            answer_data.get("page"),
+            answer_data.get("location_detail")
+        ))
+
+    def load_records(self, records):
+        """
+        Adds (section, record) pairs in arrival order. Mistakes and good
+        answers that arrive before the 'content' section has been seen are
+        held back until it has, so topic lookups match a whole-dict load.
+        """
+        content_seen = False
+        pending = []
+        for section, record in records:
+            if section == "content":
+                content_seen = True
+                self.add_subject(record)
+            elif section in ("mistakes", "good_answers"):
+                if not content_seen:
+                    pending.append((section, record))
+                    continue
+                for held in pending:
+                    self._add_result_record(*held)
+                pending.clear()
+                self._add_result_record(section, record)
+            else:
+                print(f"Warning: Ignoring record from unknown section '{section}'.")
+        for held in pending:
+            self._add_result_record(*held)
+
+    def _add_result_record(self, section, record):
+        if section == "mistakes":
+            self.add_mistake(record)
+        else:
+            self.add_good_answer(record)
+
+    # --- Batching ---
+    def _buffer(self, batch, row):
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered rows with one executemany per table."""
+        cursor = self.cursor
+        if self._topic_locations:
+            cursor.executemany("INSERT OR IGNORE INTO Topic_Source_Locations (topic_id, source_id, page_number, location_description) VALUES (?, ?, ?, ?)", self._topic_locations)
+            self.rows_inserted += cursor.rowcount
+            self._topic_locations.clear()
+        if self._subtopic_locations:
+            cursor.executemany("INSERT OR IGNORE INTO Subtopic_Source_Locations (subtopic_id, source_id, page_number, location_detail, keywords) VALUES (?, ?, ?, ?, ?)", self._subtopic_locations)
+            self.rows_inserted += cursor.rowcount
+            self._subtopic_locations.clear()
+        if self._mistakes:
+            cursor.executemany("""
+                INSERT INTO Mistakes
+                (source_id, topic_id, subtopic_id, mistake_description, problem_formulation, mistake_type, page_number, location_detail, mistake_details)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, self._mistakes)
+            self.rows_inserted += cursor.rowcount
+            self._mistakes.clear()
+        if self._good_answers:
+            cursor.executemany("""
+                INSERT INTO Good_Answers
+                (source_id, topic_id, subtopic_id, answer_description, problem_formulation, page_number, location_detail)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, self._good_answers)
+            self.rows_inserted += cursor.rowcount
+            self._good_answers.clear()
+
+    def report(self) -> str:
+        """Returns a one-line summary of rows inserted and throughput."""
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows_inserted / elapsed if elapsed > 0 else 0.0
+        return f"Inserted {self.rows_inserted} row(s) in {elapsed:.3f}s ({rate:.0f} rows/s)."
 
 def create_database_from_json(json_file_path: str, db_file_path: str) -> bool:
     """
     Initializes the database schema (if needed) and populates it by parsing
     a JSON file containing 'content', 'mistakes', and 'good_answers' sections.
     Mistakes and Good Answers can now include a 'problem_formulation' field.
+    The file is read incrementally (see iter_json_records), so very large
+    saved responses are never held in memory as a whole.
 
     Assumes JSON structure:
     {
@@ -185,210 +721,83 @@ def create_database_from_json(json_file_path: str, db_file_path: str) -> bool:
         True if the database was populated successfully, False otherwise.
     """
 
-    # --- Step 1: Ensure Database Schema Exists ---
-    print(f"Initializing database schema for '{db_file_path}'...")
-    if not initialize_database_schema(db_file_path):
-        print("Failed to initialize database schema. Aborting population.")
-        return False
-    print("Schema check/initialization complete.")
-
-    # --- Step 2: Load JSON Data ---
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if not isinstance(data, dict):
-                 raise ValueError("JSON must be an object.")
-            content_data = data.get("content", [])
-            mistakes_data = data.get("mistakes", [])
-            good_answers_data = data.get("good_answers", [])
-
-    except FileNotFoundError:
+    if not os.path.exists(json_file_path):
         print(f"Error: JSON file not found at {json_file_path}")
         return False
-    except (json.JSONDecodeError, ValueError) as e:
-        print(f"Error: Could not decode JSON or invalid structure in {json_file_path}: {e}")
-        return False
-    except Exception as e:
-        print(f"Error reading JSON file: {e}")
-        return False
-
-    # --- Helper Functions (nested) ---
-    # Content helpers (unchanged)
-    def _get_or_create_subject(cursor, subject_name, description=None):
-        cursor.execute("SELECT subject_id FROM Subjects WHERE subject_name = ?", (subject_name,))
-        result = cursor.fetchone(); return result[0] if result else cursor.execute("INSERT INTO Subjects (subject_name, subject_description) VALUES (?, ?)", (subject_name, description)).lastrowid
-
-    def _get_or_create_topic(cursor, subject_id, topic_name, description=None):
-        cursor.execute("SELECT topic_id FROM Topics WHERE subject_id = ? AND topic_name = ?", (subject_id, topic_name))
-        result = cursor.fetchone(); return result[0] if result else cursor.execute("INSERT INTO Topics (subject_id, topic_name, topic_description) VALUES (?, ?, ?)", (subject_id, topic_name, description)).lastrowid
-
-    def _get_or_create_subtopic(cursor, topic_id, subtopic_name, description=None):
-        cursor.execute("SELECT subtopic_id FROM Subtopics WHERE topic_id = ? AND subtopic_name = ?", (topic_id, subtopic_name))
-        result = cursor.fetchone(); return result[0] if result else cursor.execute("INSERT INTO Subtopics (topic_id, subtopic_name, subtopic_description) VALUES (?, ?, ?)", (topic_id, subtopic_name, description)).lastrowid
+    return populate_database(iter_json_records(json_file_path), db_file_path, source_label=json_file_path)
 
-    def _get_or_create_source(cursor, filename, filepath):
-        cursor.execute("SELECT source_id FROM Sources WHERE filename = ? AND filepath = ?", (filename, filepath))
-        result = cursor.fetchone(); return result[0] if result else cursor.execute("INSERT INTO Sources (filename, filepath) VALUES (?, ?)", (filename, filepath)).lastrowid
 
-    def _link_topic_to_source_location(cursor, topic_id, source_id, page=None, location_desc=None):
-        cursor.execute("INSERT OR IGNORE INTO Topic_Source_Locations (topic_id, source_id, page_number, location_description) VALUES (?, ?, ?, ?)", (topic_id, source_id, page, location_desc))
-
-    def _link_subtopic_to_source_location(cursor, subtopic_id, source_id, page=None, detail=None, keywords=None):
-        cursor.execute("INSERT OR IGNORE INTO Subtopic_Source_Locations (subtopic_id, source_id, page_number, location_detail, keywords) VALUES (?, ?, ?, ?, ?)", (subtopic_id, source_id, page, detail, keywords))
+def populate_database(data, db_file_path: str, source_label: str = 'parsed data') -> bool:
+    """
+    Initializes the database schema (if needed) and populates it from data
+    that is already in memory or arrives incrementally. Records are first
+    checked against RESPONSE_SCHEMA: invalid ones are reported and skipped.
 
-    # ID Lookup helpers (unchanged)
-    def _get_topic_id_by_name(cursor, topic_name):
-        cursor.execute("SELECT topic_id FROM Topics WHERE topic_name = ?", (topic_name,))
-        result = cursor.fetchone(); return result[0] if result else None
+    Args:
+        data: Either a parsed response dict with 'content', 'mistakes' and
+              'good_answers' keys (see create_database_from_json), or an
+              iterable of (section, record) pairs such as the one produced
+              by iter_json_records.
+        db_file_path: The path where the SQLite database file should be created/updated.
+        source_label: Name of the data source used in log messages.
 
-    def _get_subtopic_id_by_name(cursor, topic_id, subtopic_name):
-        if not topic_id: return None
-        cursor.execute("SELECT subtopic_id FROM Subtopics WHERE topic_id = ? AND subtopic_name = ?", (topic_id, subtopic_name))
-        result = cursor.fetchone(); return result[0] if result else None
+    Returns:
+        True if the database was populated successfully, False otherwise.
+    """
 
-    # MODIFIED: Mistake creation helper accepts problem_formulation
-    def _create_mistake(cursor, source_id, topic_id, subtopic_id, desc, problem_formulation, type, page, location, details):
-        if not source_id or not topic_id:
-            print(f"Warning: Skipping mistake creation due to missing source_id or topic_id. Desc: {desc}")
-            return
-        cursor.execute("""
-            INSERT INTO Mistakes
-            (source_id, topic_id, subtopic_id, mistake_description, problem_formulation, mistake_type, page_number, location_detail, mistake_details)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (source_id, topic_id, subtopic_id, desc, problem_formulation, type, page, location, details))
-
-    # MODIFIED: Good answer creation helper accepts problem_formulation
-    def _create_good_answer(cursor, source_id, topic_id, subtopic_id, desc, problem_formulation, page, location):
-        if not source_id or not topic_id:
-            print(f"Warning: Skipping good answer creation due to missing source_id or topic_id. Desc: {desc}")
-            return
-        cursor.execute("""
-            INSERT INTO Good_Answers
-            (source_id, topic_id, subtopic_id, answer_description, problem_formulation, page_number, location_detail)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (source_id, topic_id, subtopic_id, desc, problem_formulation, page, location))
-        # print(f"    Created good answer record (ID: {cursor.lastrowid})") # Optional logging
+    # --- Step 1: Ensure Database Schema Exists ---
+    print(f"Initializing database schema for '{db_file_path}'...")
+    if not initialize_database_schema(db_file_path):
+        print("Failed to initialize database schema. Aborting population.")
+        return False
+    print("Schema check/initialization complete.")
 
+    # --- Step 2: Validate Records Against the Response Schema ---
+    validation_errors = []
+    if isinstance(data, dict):
+        data = validate_response(data, RESPONSE_SCHEMA, validation_errors)
+    else:
+        data = validate_records(data, RESPONSE_SCHEMA, validation_errors) # Checked as records arrive
 
     # --- Step 3: Populate Database ---
     conn = None
     try:
-        conn = sqlite3.connect(db_file_path)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-
-        # --- Process Content Section ---
-        print("Processing 'content' section...")
-        # ... (existing logic for subjects, topics, subtopics, locations - unchanged) ...
-        for subject_data in content_data:
-            subject_name = subject_data.get("subject_name")
-            if not subject_name: continue
-            subject_id = _get_or_create_subject(cursor, subject_name, subject_data.get("subject_description"))
-            for topic_data in subject_data.get("topics", []):
-                topic_name = topic_data.get("topic_name")
-                if not topic_name: continue
-                topic_id = _get_or_create_topic(cursor, subject_id, topic_name, topic_data.get("topic_description"))
-                for loc_data in topic_data.get("source_locations", []):
-                    filename = loc_data.get("filename"); filepath = loc_data.get("filepath")
-                    if not filename or not filepath: continue
-                    source_id = _get_or_create_source(cursor, filename, filepath)
-                    _link_topic_to_source_location(cursor, topic_id, source_id, loc_data.get("page"), loc_data.get("location_description"))
-                for subtopic_data in topic_data.get("subtopics", []):
-                    subtopic_name = subtopic_data.get("subtopic_name")
-                    if not subtopic_name: continue
-                    subtopic_id = _get_or_create_subtopic(cursor, topic_id, subtopic_name, subtopic_data.get("subtopic_description"))
-                    for sub_loc_data in subtopic_data.get("source_locations", []):
-                         filename = sub_loc_data.get("filename"); filepath = sub_loc_data.get("filepath")
-                         if not filename or not filepath: continue
-                         source_id = _get_or_create_source(cursor, filename, filepath)
-                         _link_subtopic_to_source_location(cursor, subtopic_id, source_id, sub_loc_data.get("page"), sub_loc_data.get("location_detail"), sub_loc_data.get("keywords"))
-        print("'content' section processing complete.")
-
-        # --- Process Mistakes Section ---
-        print("Processing 'mistakes' section...")
-        for mistake_data in mistakes_data:
-            source_filename = mistake_data.get("source_filename"); source_filepath = mistake_data.get("source_filepath")
-            desc = mistake_data.get("description"); topic_name = mistake_data.get("relevant_topic")
-            if not source_filename or not source_filepath or not desc or not topic_name:
-                print(f"Warning: Skipping mistake due to missing required fields. Desc: {desc}")
-                continue
-
-            source_id = _get_or_create_source(cursor, source_filename, source_filepath)
-            topic_id = _get_topic_id_by_name(cursor, topic_name)
-            if not topic_id:
-                print(f"Warning: Could not find topic '{topic_name}' for mistake. Skipping. Desc: {desc}")
-                continue
-
-            subtopic_id = None; subtopic_name = mistake_data.get("relevant_subtopic")
-            if subtopic_name:
-                subtopic_id = _get_subtopic_id_by_name(cursor, topic_id, subtopic_name)
-                # Optional: Warn if subtopic not found but still proceed with topic link
-                # if not subtopic_id: print(f"Warning: Subtopic '{subtopic_name}' not found under topic '{topic_name}' for mistake.")
-
-            # MODIFIED: Get problem formulation from JSON
-            problem_formulation = mistake_data.get("problem_formulation") # Gets None if not present
-
-            # MODIFIED: Pass problem formulation to helper function
-            _create_mistake(
-                cursor,
-                source_id,
-                topic_id,
-                subtopic_id,
-                desc,
-                problem_formulation, # Pass the text here
-                mistake_data.get("type"),
-                mistake_data.get("page"),
-                mistake_data.get("location_detail"),
-                mistake_data.get("details")
-            )
-        print("'mistakes' section processing complete.")
-
-        # --- Process Good Answers Section ---
-        print("Processing 'good_answers' section...")
-        for answer_data in good_answers_data:
-            source_filename = answer_data.get("source_filename")
-            source_filepath = answer_data.get("source_filepath")
-            desc = answer_data.get("description")
-            topic_name = answer_data.get("relevant_topic")
-
-            if not source_filename or not source_filepath or not desc or not topic_name:
-                print(f"Warning: Skipping good answer due to missing required fields (source_filename, source_filepath, description, relevant_topic). Desc: {desc}")
-                continue
-
-            source_id = _get_or_create_source(cursor, source_filename, source_filepath)
-            topic_id = _get_topic_id_by_name(cursor, topic_name)
-            if not topic_id:
-                 print(f"Warning: Could not find topic '{topic_name}' for good answer. Skipping. Desc: {desc}")
-                 continue
-
-            subtopic_id = None
-            subtopic_name = answer_data.get("relevant_subtopic")
-            if subtopic_name: # Only look for subtopic if topic was found and subtopic name provided
-                subtopic_id = _get_subtopic_id_by_name(cursor, topic_id, subtopic_name)
-                if not subtopic_id:
-                     print(f"Warning: Could not find subtopic '{subtopic_name}' under topic '{topic_name}' for good answer. Linking to topic only.")
-
-            # MODIFIED: Get problem formulation from JSON
-            problem_formulation = answer_data.get("problem_formulation") # Gets None if not present
-
-            # MODIFIED: Pass problem formulation to helper function
-            _create_good_answer(
-                cursor,
-                source_id,
-                topic_id,
-                subtopic_id, # Can be None
-                desc,
-                problem_formulation, # Pass the text here
-                answer_data.get("page"),
-                answer_data.get("location_detail")
-            )
-        print("'good_answers' section processing complete.")
-
-
+        conn = get_connection(db_file_path)
+        loader = BulkLoader(conn)
+
+        if isinstance(data, dict):
+            # --- Process Content Section ---
+            print("Processing 'content' section...")
+            loader.load_content(data.get("content", []))
+            print("'content' section processing complete.")
+
+            # --- Process Mistakes Section ---
+            print("Processing 'mistakes' section...")
+            loader.load_mistakes(data.get("mistakes", []))
+            print("'mistakes' section processing complete.")
+
+            # --- Process Good Answers Section ---
+            print("Processing 'good_answers' section...")
+            loader.load_good_answers(data.get("good_answers", []))
+            print("'good_answers' section processing complete.")
+        else:
+            print("Processing records incrementally...")
+            loader.load_records(data)
+            print("Record processing complete.")
+
+        loader.flush()
         conn.commit()
-        print(f"Successfully populated database '{db_file_path}' from '{json_file_path}' (with Problem Formulation).")
+        if validation_errors:
+            print(f"Warning: {len(validation_errors)} schema problem(s) in {source_label}:\n"
+                  + format_validation_errors(validation_errors))
+        print(loader.report())
+        print(f"Successfully populated database '{db_file_path}' from '{source_label}' (with Problem Formulation).")
         return True
 
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error: Could not decode JSON or invalid structure in {source_label}: {e}")
+        if conn: conn.rollback()
+        return False
     except sqlite3.Error as e:
         print(f"Database error occurred during population: {e}")
         if conn: conn.rollback()
@@ -397,8 +806,103 @@ def create_database_from_json(json_file_path: str, db_file_path: str) -> bool:
         print(f"An unexpected error occurred during database population: {e}")
         if conn: conn.rollback()
         return False
-    finally:
-        if conn: conn.close()
+
+
+# --- Incremental JSON Reading ---
+RESPONSE_SECTIONS = ("content", "mistakes", "good_answers")
+JSON_READ_CHUNK_SIZE = 64 * 1024
+
+class _JsonStreamReader:
+    """Minimal pull parser over a text file, refilling its buffer on demand."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk # Drop what was already consumed
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buf, self.pos)
+        self.pos += 1
+        return ch
+
+    def value(self):
+        """Decodes the next complete JSON value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer end (e.g. a number) may continue
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_records(json_file_path: str, chunk_size: int = JSON_READ_CHUNK_SIZE):
+    """
+    Reads a saved response file incrementally and yields one
+    (section, record) pair per element of its 'content', 'mistakes' and
+    'good_answers' lists, in file order. Other top-level keys are skipped.
+    Only one record is held in memory at a time.
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON.
+        ValueError: If the top level is not an object or a section is not a list.
+    """
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        reader = _JsonStreamReader(f, chunk_size)
+        if reader.peek() != '{':
+            raise ValueError("JSON must be an object.")
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key in RESPONSE_SECTIONS and reader.peek() == '[':
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield key, reader.value()
+                        if reader.expect(',]') == ']':
+                            break
+            else:
+                value = reader.value()
+                if key in RESPONSE_SECTIONS:
+                    if value is not None:
+                        raise ValueError(f"'{key}' must be a list.")
+            if reader.expect(',}') == '}':
+                break
 
 # --- check_file_exists_in_db function remains unchanged ---
 def check_file_exists_in_db(db_filepath: str, filename_to_check: str) -> bool:
@@ -414,14 +918,13 @@ def check_file_exists_in_db(db_filepath: str, filename_to_check: str) -> bool:
         True if at least one record with that filename exists, False otherwise.
         Returns False also if a database error occurs.
     """
-    conn = None
     exists = False
     try:
         if not os.path.exists(db_filepath):
             print(f"Error: Database file not found at '{db_filepath}'")
             return False
 
-        conn = sqlite3.connect(db_filepath)
+        conn = get_connection(db_filepath)
         cursor = conn.cursor()
 
         sql_query = "SELECT COUNT(*) FROM Sources WHERE filename = ?"
@@ -439,9 +942,6 @@ def check_file_exists_in_db(db_filepath: str, filename_to_check: str) -> bool:
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         exists = False
-    finally:
-        if conn:
-            conn.close()
 
     return exists
 
@@ -466,10 +966,9 @@ def get_topic_id_pairs_as_string(db_filepath: str = 'database.db') -> str:
     if not os.path.exists(db_filepath):
         return f"Error: Database file not found at '{db_filepath}'"
 
-    conn = None
     try:
         # Connect to the SQLite database
-        conn = sqlite3.connect(db_filepath)
+        conn = get_connection(db_filepath)
         cursor = conn.cursor()
 
         # Check if the Topics table exists
@@ -507,7 +1006,3 @@ def get_topic_id_pairs_as_string(db_filepath: str = 'database.db') -> str:
     except Exception as e:
         # Catch any other unexpected errors
         return f"Error: An unexpected error occurred - {e}"
-    finally:
-        # Ensure the database connection is closed
-        if conn:
-            conn.close()
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import threading
+
+# --- Configuration ---
+BUSY_TIMEOUT_MS = 30000 # How long a writer waits for another writer's lock
+
+_local = threading.local()
+
+
+def _file_identity(db_filepath: str):
+    """Returns (device, inode) of the database file, or None if it does not exist."""
+    try:
+        stat = os.stat(db_filepath)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def _open_connection(db_filepath: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_filepath, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    # WAL lets readers (e.g. the GUI thread) run while an ingest transaction
+    # is writing; synchronous=NORMAL is the recommended pairing for WAL.
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+def get_connection(db_filepath: str = 'database.db') -> sqlite3.Connection:
+    """
+    Returns this thread's shared connection to db_filepath, opening it on
+    first use. Connections are configured with WAL journaling, a busy
+    timeout and foreign key enforcement.
+
+    The connection is owned by the cache: callers must not close it, and
+    should commit or roll back their own transactions. Set row factories on
+    cursors rather than on the connection, since it is shared.
+
+    Args:
+        db_filepath: Path to the SQLite database file.
+
+    Returns:
+        An open sqlite3.Connection usable only from the calling thread.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = os.path.abspath(db_filepath)
+    cached = connections.get(key)
+    if cached is not None:
+        conn, identity = cached
+        # Reopen if the file was deleted or replaced since we connected
+        if identity == _file_identity(db_filepath):
+            return conn
+        conn.close()
+
+    conn = _open_connection(db_filepath)
+    connections[key] = (conn, _file_identity(db_filepath))
+    return conn
+
+
+def close_connection(db_filepath: str = None) -> None:
+    """
+    Closes this thread's cached connection to db_filepath, or all of this
+    thread's cached connections if no path is given.
+    """
+    connections = getattr(_local, 'connections', None)
+    if not connections:
+        return
+    keys = [os.path.abspath(db_filepath)] if db_filepath else list(connections)
+    for key in keys:
+        cached = connections.pop(key, None)
+        if cached is not None:
+            cached[0].close()
@@ -0,0 +1,200 @@
+from topic_index import normalize_topic_name
+
+# --- Configuration ---
+CHUNK_PAGES = 10 # Pages each window is responsible for
+CHUNK_OVERLAP = 1 # Pages of the previous window repeated at the start of the next, as context only
+
+
+def page_windows(page_count: int, chunk_pages: int = CHUNK_PAGES,
+                 overlap: int = CHUNK_OVERLAP) -> list[tuple[list[int], set[int]]]:
+    """
+    Splits a document into consecutive page windows.
+
+    Every page is owned by exactly one window. A window after the first also
+    starts with the last `overlap` pages of the previous one, so exercises
+    running across the boundary keep their context; results reported on
+    those pages are dropped in favour of the window that owns them.
+
+    Returns:
+        list of (pages, owned_pages): the 1-based original page numbers
+        sent in the window, in order, and the subset it is responsible for.
+    """
+    chunk_pages = max(1, chunk_pages)
+    windows = []
+    start = 1
+    while start <= page_count:
+        end = min(page_count, start + chunk_pages - 1)
+        first = max(1, start - overlap) if windows else start
+        windows.append((list(range(first, end + 1)), set(range(start, end + 1))))
+        start = end + 1
+    return windows
+
+
+def _as_page(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _absolute_page(value, pages: list[int], relative: bool):
+    """Original page number for a page reported by a window, or None if it is outside the window."""
+    page = _as_page(value)
+    if page is None:
+        return None
+    if relative:
+        return pages[page - 1] if 1 <= page <= len(pages) else None
+    return page if page in pages else None
+
+
+def _owned_items(items, pages, owned, relative):
+    """Items (locations, mistakes, answers) with absolute pages, minus those on pages the window does not own."""
+    kept = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        if item.get("page") is not None:
+            page = _absolute_page(item["page"], pages, relative)
+            if page is not None and page not in owned:
+                continue # Context page, reported by the window that owns it
+            item = dict(item, page=page)
+        kept.append(item)
+    return kept
+
+
+def remap_window_response(data: dict, pages: list[int], owned: set[int], relative: bool) -> dict:
+    """
+    Converts one window's response to original page numbers.
+
+    Args:
+        data: Parsed response for the window.
+        pages: Original page numbers sent in the window, in order.
+        owned: Pages the window is responsible for (see page_windows).
+        relative: True if the model saw an excerpt and reported page
+                  positions within it (1 = first page of the window); False
+                  if it reported original page numbers (text with page
+                  markers).
+
+    Returns:
+        dict: A new response with every "page" absolute (None if it was
+        outside the window) and entries on non-owned pages removed.
+    """
+    content = []
+    for subject in data.get("content") or []:
+        if not isinstance(subject, dict):
+            continue
+        topics = []
+        for topic in subject.get("topics") or []:
+            if not isinstance(topic, dict):
+                continue
+            subtopics = [dict(subtopic, source_locations=_owned_items(subtopic.get("source_locations"), pages, owned, relative))
+                         for subtopic in topic.get("subtopics") or [] if isinstance(subtopic, dict)]
+            topics.append(dict(topic, source_locations=_owned_items(topic.get("source_locations"), pages, owned, relative),
+                               subtopics=subtopics))
+        content.append(dict(subject, topics=topics))
+    return {"content": content,
+            "mistakes": _owned_items(data.get("mistakes"), pages, owned, relative),
+            "good_answers": _owned_items(data.get("good_answers"), pages, owned, relative)}
+
+
+def _key(text):
+    return normalize_topic_name(text) if isinstance(text, str) else text
+
+
+def merge_responses(responses: list[dict], filename: str, filepath: str) -> dict:
+    """
+    Merges the (remapped) responses of a document's windows into one
+    response for populate_database.
+
+    Subjects, topics and subtopics with the same normalized name are merged
+    under the name seen first, and mistakes and good answers are relinked to
+    those names. Source locations, mistakes and good answers are
+    deduplicated by page, location and description. Every source reference
+    is set to the original document, since windows may have been uploaded
+    as excerpt files.
+
+    Args:
+        responses: Window responses in page order.
+        filename, filepath: The original document.
+
+    Returns:
+        dict: A response with "content", "mistakes" and "good_answers".
+    """
+    subjects = {} # normalized subject name -> merged subject
+    topics = {} # (subject key, topic key) -> merged topic
+    subtopics = {} # (subject key, topic key, subtopic key) -> merged subtopic
+    topic_names = {} # topic key -> canonical topic name
+    subtopic_names = {} # (topic key, subtopic key) -> canonical subtopic name
+    seen_locations = set()
+
+    def add_locations(target, locations, detail_field, owner_key):
+        for location in locations:
+            key = (owner_key, location.get("page"), _key(location.get(detail_field)))
+            if key in seen_locations:
+                continue
+            seen_locations.add(key)
+            target.append(dict(location, filename=filename, filepath=filepath))
+
+    for data in responses:
+        for subject in data.get("content") or []:
+            subject_name = subject.get("subject_name")
+            if not subject_name:
+                continue
+            subject_key = _key(subject_name)
+            merged_subject = subjects.get(subject_key)
+            if merged_subject is None:
+                merged_subject = subjects[subject_key] = dict(subject, topics=[])
+            elif not merged_subject.get("subject_description"):
+                merged_subject["subject_description"] = subject.get("subject_description")
+
+            for topic in subject.get("topics") or []:
+                topic_name = topic.get("topic_name")
+                if not topic_name:
+                    continue
+                topic_key = _key(topic_name)
+                topic_names.setdefault(topic_key, topic_name)
+                merged_topic = topics.get((subject_key, topic_key))
+                if merged_topic is None:
+                    merged_topic = topics[(subject_key, topic_key)] = dict(topic, topic_name=topic_names[topic_key],
+                                                                           source_locations=[], subtopics=[])
+                    merged_subject["topics"].append(merged_topic)
+                elif not merged_topic.get("topic_description"):
+                    merged_topic["topic_description"] = topic.get("topic_description")
+                add_locations(merged_topic["source_locations"], topic.get("source_locations") or [],
+                              "location_description", (subject_key, topic_key))
+
+                for subtopic in topic.get("subtopics") or []:
+                    subtopic_name = subtopic.get("subtopic_name")
+                    if not subtopic_name:
+                        continue
+                    subtopic_key = _key(subtopic_name)
+                    subtopic_names.setdefault((topic_key, subtopic_key), subtopic_name)
+                    merged_subtopic = subtopics.get((subject_key, topic_key, subtopic_key))
+                    if merged_subtopic is None:
+                        merged_subtopic = subtopics[(subject_key, topic_key, subtopic_key)] = dict(
+                            subtopic, subtopic_name=subtopic_names[(topic_key, subtopic_key)], source_locations=[])
+                        merged_topic["subtopics"].append(merged_subtopic)
+                    add_locations(merged_subtopic["source_locations"], subtopic.get("source_locations") or [],
+                                  "location_detail", (subject_key, topic_key, subtopic_key))
+
+    def merge_events(section):
+        merged, seen = [], set()
+        for data in responses:
+            for event in data.get(section) or []:
+                topic_key = _key(event.get("relevant_topic"))
+                subtopic_key = _key(event.get("relevant_subtopic"))
+                key = (event.get("page"), _key(event.get("location_detail")), _key(event.get("description")))
+                if key in seen:
+                    continue
+                seen.add(key)
+                event = dict(event, source_filename=filename, source_filepath=filepath)
+                if topic_key in topic_names:
+                    event["relevant_topic"] = topic_names[topic_key]
+                if (topic_key, subtopic_key) in subtopic_names:
+                    event["relevant_subtopic"] = subtopic_names[(topic_key, subtopic_key)]
+                merged.append(event)
+        return merged
+
+    return {"content": list(subjects.values()),
+            "mistakes": merge_events("mistakes"),
+            "good_answers": merge_events("good_answers")}
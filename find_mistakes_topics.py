@@ -1,6 +1,7 @@
 import sqlite3
 import os
 import sys
+from db_connection import get_connection
 
 # --- Configuration ---
 DEFAULT_DB_FILE = 'database.db'
@@ -25,9 +26,9 @@ def get_topics_with_mistakes(db_filepath: str = DEFAULT_DB_FILE) -> list[str] |
 
     topics_with_mistakes = []
     try:
-        with sqlite3.connect(db_filepath) as conn:
-            conn.row_factory = sqlite3.Row
+        with get_connection(db_filepath) as conn:
             cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row # Per cursor: the connection is shared
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('Mistakes', 'Topics');")
             tables_found = {row['name'] for row in cursor.fetchall()}
             if 'Mistakes' not in tables_found or 'Topics' not in tables_found:
@@ -78,9 +79,9 @@ def export_questions_for_topic_to_txt(
 
     formulations_data = []
     try:
-        with sqlite3.connect(db_filepath) as conn:
-            conn.row_factory = sqlite3.Row # Use Row factory
+        with get_connection(db_filepath) as conn:
             cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row # Use Row factory (per cursor: the connection is shared)
 
             # Check tables (Keep Sources check in case needed later, but not strictly required for this version)
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('Mistakes', 'Topics', 'Sources');")
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from response_cache import hash_file
+
+# --- Configuration ---
+DEFAULT_INDEX_PATH = os.path.join('study_guides', '.guide_cache.json')
+
+
+class GuideCache:
+    """
+    Remembers which generated study guide belongs to which set of inputs.
+
+    A guide is identified by the topic name, the content hash of the exported
+    question file, the content hashes of the relevant source files, the
+    prompt template version and the model name. A lookup only hits if the
+    Markdown file is still on disk with the content that was generated, so
+    a guide overwritten by a later regeneration is never returned for the
+    old inputs.
+
+    The index is a small JSON file; hits, misses and the upload bytes saved
+    by hits are counted for the current session (see stats()).
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(topic_name: str, question_filepath: str, source_filepaths: list[str],
+                 template_version: str, model_name: str, options: dict | None = None) -> str:
+        """
+        Builds the cache key for one guide request. options holds any other
+        JSON-serializable settings that change the prompt (e.g. page excerpts).
+        """
+        payload = {
+            'topic': topic_name,
+            'questions': hash_file(question_filepath),
+            'sources': sorted(hash_file(path) for path in source_filepaths),
+            'template_version': template_version,
+            'model_name': model_name,
+        }
+        if options:
+            payload['options'] = options
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_index(self, index: dict) -> None:
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, key: str, upload_bytes: int = 0) -> str | None:
+        """
+        Returns the path of the cached guide for key, or None on a miss.
+        upload_bytes (the size of the files that would have been uploaded)
+        is added to bytes_saved on a hit.
+        """
+        with self._lock:
+            entry = self._read_index().get(key)
+            path = entry and entry.get('path')
+            if path and os.path.exists(path) and hash_file(path) == entry.get('content_hash'):
+                self.hits += 1
+                self.bytes_saved += upload_bytes
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, key: str, topic_name: str, guide_path: str) -> None:
+        """Records guide_path (already written) as the guide for key."""
+        with self._lock:
+            try:
+                index = self._read_index()
+                index[key] = {
+                    'topic': topic_name,
+                    'path': guide_path,
+                    'content_hash': hash_file(guide_path),
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                }
+                self._write_index(index)
+            except OSError as e:
+                print(f"Warning: Could not update study guide cache index: {e}")
+
+    def stats(self) -> dict:
+        """Returns this session's hits, misses and upload bytes saved."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes_saved': self.bytes_saved}
@@ -0,0 +1,246 @@
+import random
+import threading
+import time
+
+from model_backends import ModelBackend, create_backend
+
+try:
+    import config
+except ImportError:
+    config = None
+
+# --- Configuration ---
+DEFAULT_REQUESTS_PER_MINUTE = 10 # generate_content calls allowed per minute
+DEFAULT_TOKENS_PER_MINUTE = 250_000 # Input tokens allowed per minute
+DEFAULT_MAX_RETRIES = 4 # Retries after the first attempt
+DEFAULT_BASE_DELAY = 2.0 # Seconds; backoff ceiling doubles on every retry
+DEFAULT_MAX_DELAY = 60.0 # Seconds; upper bound of a single backoff
+CHARS_PER_TOKEN = 4 # Rough size of a token in prompt text
+FILE_TOKEN_ESTIMATE = 5000 # Assumed tokens per uploaded file until usage is reported
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to `capacity` tokens and refilling
+    at `capacity` tokens per `period` seconds.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Takes `amount` tokens, sleeping until enough have been refilled.
+        Amounts above the capacity are capped at the capacity.
+
+        Returns:
+            float: Seconds spent waiting (0.0 if the tokens were available).
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+    def debit(self, amount: float) -> None:
+        """Removes amount tokens without waiting; the balance may go negative."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    True for errors worth retrying: HTTP 408/429/5xx (google.api_core
+    exceptions expose the status as .code) and connection or timeout errors.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    for attribute in ('code', 'status_code'):
+        code = getattr(error, attribute, None)
+        try:
+            if code is not None and int(code) in RETRYABLE_STATUS_CODES:
+                return True
+        except (TypeError, ValueError):
+            continue
+    return False
+
+
+class LLMClient:
+    """
+    Shared wrapper around a model backend (see model_backends) used by every
+    module that talks to the model.
+
+    generate_content calls pass through a requests-per-minute and a
+    tokens-per-minute token bucket. Every call (including uploads and
+    deletes) is retried on retryable errors with exponential backoff and
+    full jitter, up to max_retries times. Counters for calls, throttled
+    calls, retries and failures are available from stats().
+
+    Without a backend, the one chosen by model_backends.create_backend()
+    (Gemini unless configured otherwise) is created on first use.
+    """
+
+    def __init__(self,
+                 backend: ModelBackend | None = None,
+                 requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 clock=time.monotonic,
+                 sleep=time.sleep,
+                 rng: random.Random | None = None):
+        self._backend = backend
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock, sleep=sleep)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._configured_key = None
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'throttled': 0, 'throttled_seconds': 0.0,
+                         'retried': 0, 'failed': 0}
+
+    @property
+    def backend(self) -> ModelBackend:
+        """The model backend, created on first use."""
+        with self._lock:
+            if self._backend is None:
+                self._backend = create_backend()
+                print(f"Using model backend: {self._backend.name}")
+            return self._backend
+
+    @property
+    def requires_api_key(self) -> bool:
+        return self.backend.requires_api_key
+
+    def cache_identity(self, model_name: str) -> str:
+        """Model name to use in response/guide cache keys (includes the backend if not Gemini)."""
+        return self.backend.cache_identity(model_name)
+
+    def _count(self, name: str, amount=1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _with_retries(self, description: str, call):
+        """Runs call(), retrying retryable errors with jittered exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            self._count('calls')
+            try:
+                return call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    self._count('failed')
+                    raise
+                delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self._count('retried')
+                print(f"Warning: {description} failed ({e}); retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 2} of {self.max_retries + 1}).")
+                self._sleep(delay)
+
+    def _throttle(self, estimated_tokens: int) -> None:
+        waited = self.request_bucket.acquire(1) + self.token_bucket.acquire(estimated_tokens)
+        if waited > 0:
+            self._count('throttled')
+            self._count('throttled_seconds', waited)
+            print(f"Rate limit: waited {waited:.1f}s before calling the model.")
+
+    def configure(self, api_key: str | None) -> None:
+        """Configures the backend with api_key (once per key)."""
+        backend = self.backend
+        with self._lock:
+            if self._configured_key == api_key:
+                return
+            backend.configure(api_key)
+            self._configured_key = api_key
+
+    def upload_file(self, path: str, display_name: str | None = None):
+        """Uploads a file, retrying transient errors. Returns the backend's file handle."""
+        backend = self.backend
+        return self._with_retries(f"Upload of '{path}'", lambda: backend.upload_file(path, display_name))
+
+    def delete_file(self, name: str) -> None:
+        """Deletes an uploaded file, retrying transient errors."""
+        backend = self.backend
+        self._with_retries(f"Deletion of '{name}'", lambda: backend.delete_file(name))
+
+    @staticmethod
+    def estimate_tokens(contents: list) -> int:
+        """Rough input token count: prompt text length plus a flat amount per file."""
+        tokens = 0
+        for part in contents:
+            if isinstance(part, str):
+                tokens += len(part) // CHARS_PER_TOKEN
+            else:
+                tokens += FILE_TOKEN_ESTIMATE
+        return max(tokens, 1)
+
+    def generate_content(self, model_name: str, contents: list,
+                         timeout: float | None = None, stream: bool = False,
+                         response_schema: dict | None = None):
+        """
+        Generates a response for contents with the backend after waiting for
+        the rate limits, retrying transient errors. response_schema asks for
+        JSON following that schema (structured output).
+
+        With stream=True only starting the stream is retried; errors while
+        iterating the returned response reach the caller. For non-streamed
+        calls the token bucket is corrected with the reported token usage.
+        """
+        estimated_tokens = self.estimate_tokens(contents)
+        backend = self.backend
+
+        def call():
+            self._throttle(estimated_tokens)
+            if response_schema is not None:
+                return backend.generate_content(model_name, contents, timeout=timeout, stream=stream,
+                                                response_schema=response_schema)
+            return backend.generate_content(model_name, contents, timeout=timeout, stream=stream)
+
+        response = self._with_retries(f"Generation with '{model_name}'", call)
+        if not stream:
+            usage = getattr(response, 'usage_metadata', None)
+            prompt_tokens = getattr(usage, 'prompt_token_count', None)
+            if isinstance(prompt_tokens, int):
+                self.token_bucket.debit(prompt_tokens - estimated_tokens)
+        return response
+
+    def stats(self) -> dict:
+        """Returns a copy of the call, throttle, retry and failure counters."""
+        with self._lock:
+            return dict(self.counters)
+
+
+def format_client_stats(stats: dict) -> str:
+    """One-line summary of LLMClient.stats() for logs and status bars."""
+    return (f"{stats['calls']} call(s), {stats['throttled']} throttled ({stats['throttled_seconds']:.0f}s waiting), "
+            f"{stats['retried']} retried, {stats['failed']} failed")
+
+
+# Shared by ingest and study guide generation so their calls draw on one
+# quota. config.py may override the limits with requests_per_minute and
+# tokens_per_minute.
+default_client = LLMClient(requests_per_minute=getattr(config, 'requests_per_minute', DEFAULT_REQUESTS_PER_MINUTE),
+                           tokens_per_minute=getattr(config, 'tokens_per_minute', DEFAULT_TOKENS_PER_MINUTE))
@@ -2,31 +2,87 @@
 """
 locate_mistakes.py
 
-Connects to your SQLite DB, fetches every mistake with its file, page & location,
-and either prints a plain text report or exports JSON for downstream use.
+Connects to your SQLite DB, fetches the mistakes with their file, page & location
+(optionally filtered by topic, date, filename or search words, and paged with
+--limit/--after), and streams a plain text report, JSON or NDJSON row by row.
 """
 
-import sqlite3
+import os
+import sys
 import json
 import argparse
+import contextlib
+from db_connection import get_connection
+from create_database import initialize_database_schema
+from search import to_fts_query
 
-def get_mistake_locations(db_file):
+# --- Configuration ---
+FETCH_BATCH_SIZE = 500 # Rows fetched from SQLite at a time while streaming
+
+LOCATION_FIELDS = ('mistake_id', 'filename', 'date', 'subject', 'topic', 'page_number',
+                   'problem_formulation', 'location_detail', 'mistake_description')
+
+# Rows come out in (date, filename, mistake_id) order (the date index keeps
+# it cheap); --after continues after a mistake_id using the same key, so
+# pages never skip or repeat rows even when other rows are added in between.
+# NULL dates sort first, so the comparison treats them as ''.
+SQL_ORDER_BY = "M.date_recorded, S.filename, M.mistake_id"
+SQL_AFTER_KEY = "(COALESCE(M.date_recorded, ''), S.filename, M.mistake_id)"
+
+
+def iter_mistake_locations(db_file, topic=None, date=None, filename=None, search=None,
+                           after=None, limit=None):
     """
-    Connect to `db_file`, query the Mistakes join Sources table,
-    and return a list of dicts with keys:
-      - filename
-      - date
-      - subject
-      - topic
-      - page_number
-      - problem_formulation
-      - location_detail
-      - mistake_description
+    Streams mistakes with their location, filtered in SQL, as dicts with
+    keys mistake_id, filename, date, subject, topic, page_number,
+    problem_formulation, location_detail and mistake_description. Rows are
+    fetched from SQLite in batches, so memory use does not grow with the
+    number of mistakes.
+
+    Args:
+        db_file: Path to the SQLite database file.
+        topic: Only mistakes of this topic (exact name).
+        date: Only mistakes recorded on this date (YYYY-MM-DD).
+        filename: Only mistakes in this source file.
+        search: Only mistakes whose text matches all of these words, found
+                through the Mistakes_FTS full-text index (schema migration
+                5; migrate the database once beforehand).
+        after: mistake_id of the last row of the previous page; rows continue
+               after it in (date, filename, mistake_id) order.
+        limit: Maximum number of rows (None for all).
+
+    Yields:
+        dict: One mistake location per row.
     """
-    conn = sqlite3.connect(db_file)
+    conn = get_connection(db_file)
+    joins = []
+    conditions = []
+    params = []
+    fts_query = to_fts_query(search) if search else ''
+    if fts_query:
+        joins.append("JOIN Mistakes_FTS ON Mistakes_FTS.rowid = M.mistake_id AND Mistakes_FTS MATCH ?")
+        params.append(fts_query)
+    if topic is not None:
+        conditions.append("T.topic_name = ?")
+        params.append(topic)
+    if date is not None:
+        conditions.append("M.date_recorded = ?")
+        params.append(date)
+    if filename is not None:
+        conditions.append("S.filename = ?")
+        params.append(filename)
+    if after is not None:
+        conditions.append(f"""{SQL_AFTER_KEY} > (
+            SELECT COALESCE(M2.date_recorded, ''), S2.filename, M2.mistake_id
+            FROM Mistakes M2 JOIN Sources S2 ON M2.source_id = S2.source_id
+            WHERE M2.mistake_id = ?)""")
+        params.append(after)
+    params.append(-1 if limit is None else limit)
+
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT
+            M.mistake_id,
             S.filename,
             M.date_recorded,
             U.subject_name,
@@ -39,24 +95,85 @@ def get_mistake_locations(db_file):
         JOIN Sources  S ON M.source_id = S.source_id
         JOIN Topics   T ON M.topic_id   = T.topic_id
         JOIN Subjects U ON T.subject_id = U.subject_id
-        ORDER BY M.date_recorded, S.filename;
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            'filename': row[0],
-            'date': row[1],
-            'subject': row[2],
-            'topic': row[3],
-            'page_number': row[4],
-            'problem_formulation': row[5],
-            'location_detail': row[6],
-            'mistake_description': row[7]
-        }
-        for row in rows
-    ]
+        {' '.join(joins)}
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY {SQL_ORDER_BY}
+        LIMIT ?;
+    """, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(LOCATION_FIELDS, row))
+    finally:
+        cursor.close()
+
+
+def get_mistake_locations(db_file, search=None, **filters):
+    """
+    Connect to `db_file`, query the Mistakes join Sources table,
+    and return a list of dicts with keys:
+      - mistake_id
+      - filename
+      - date
+      - subject
+      - topic
+      - page_number
+      - problem_formulation
+      - location_detail
+      - mistake_description
+
+    With `search` set, only mistakes whose text matches all of its words
+    are returned, found through the Mistakes_FTS full-text index. Other
+    keyword arguments (topic, date, filename, after, limit) are passed to
+    iter_mistake_locations; prefer it for large results.
+    """
+    return list(iter_mistake_locations(db_file, search=search, **filters))
+
+
+# --- Output ---
+def write_json_array(mistakes, out=sys.stdout):
+    """Writes mistakes as an indented JSON array, one element at a time. Returns the count."""
+    count = 0
+    out.write("[")
+    for m in mistakes:
+        out.write(",\n" if count else "\n")
+        out.write("  " + json.dumps(m, indent=2, default=str).replace("\n", "\n  "))
+        count += 1
+    out.write("\n]\n" if count else "]\n")
+    return count
+
+
+def write_ndjson(mistakes, out=sys.stdout):
+    """Writes one JSON object per line. Returns the count."""
+    count = 0
+    for m in mistakes:
+        out.write(json.dumps(m, default=str) + "\n")
+        count += 1
+    return count
+
+
+def format_text(m, mode):
+    """Plain-text block for one mistake; mode is 'date', 'topic' or 'all' (which fields are shown)."""
+    if mode == 'date':
+        lines = [f"Topic: {m['topic']}"]
+    elif mode == 'topic':
+        lines = [f"Filename: {m['filename']}", f"Date: {m['date']}"]
+    else:
+        lines = [f"File: {m['filename']}", f"Date: {m['date']}", f"Subject: {m['subject']}", f"Topic: {m['topic']}"]
+    lines += [f"Page: {m['page_number']}", f"Question: {m['problem_formulation']}",
+              f"Mistake: {m['mistake_description']}", "---"]
+    return "\n".join(lines)
+
+
+def _track_last(mistakes, state):
+    """Passes mistakes through, remembering the count and the last mistake_id in state."""
+    for m in mistakes:
+        state['count'] += 1
+        state['last_id'] = m['mistake_id']
+        yield m
 
 
 def main():
@@ -68,11 +185,17 @@ def main():
         required=True,
         help="Path to your SQLite database file (e.g. database.db)"
     )
-    p.add_argument(
+    output_group = p.add_mutually_exclusive_group(required=False)
+    output_group.add_argument(
         "--json", "-j",
         action="store_true",
         help="If set, outputs the results as JSON to stdout; otherwise prints plain text."
     )
+    output_group.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Output one JSON object per line (streamed)"
+    )
     mode_group = p.add_mutually_exclusive_group(required=False)
     mode_group.add_argument(
         '--date',
@@ -86,58 +209,68 @@ def main():
         '--filename', '-f',
         help="Filename to filter (required with --date)"
     )
+    p.add_argument(
+        '--search', '-s',
+        help="Only mistakes whose text contains these words (full-text search)"
+    )
+    p.add_argument(
+        '--limit', '-n',
+        type=int,
+        help="Maximum number of mistakes (one page)"
+    )
+    p.add_argument(
+        '--after', '-a',
+        type=int,
+        help="Continue after this mistake_id (printed at the end of the previous page)"
+    )
 
     args = p.parse_args()
-    mistakes = get_mistake_locations(args.db)
+    if args.date and not args.filename:
+        # date filter requires filename
+        p.error("--filename is required when using --date")
 
-    if args.json:
-        print(json.dumps(mistakes, indent=2, default=str))
-        return
+    # Older databases get the FTS index first; the log goes to stderr to keep JSON output clean
+    if os.path.exists(args.db):
+        with contextlib.redirect_stdout(sys.stderr):
+            if not initialize_database_schema(args.db):
+                sys.exit(1)
 
-    # Plain-text output modes
-    if args.date:
-        # date filter requires filename
-        if not args.filename:
-            p.error("--filename is required when using --date")
-        filtered = [m for m in mistakes if str(m['date']) == args.date and m['filename'] == args.filename]
-        print("---")
-        for m in filtered:
-            print(f"Topic: {m['topic']}")
-            print(f"Page: {m['page_number']}")
-            print(f"Question: {m['problem_formulation']}")
-            print(f"Mistake: {m['mistake_description']}")
-            print("---")
-    elif args.topic:
-        filtered = [m for m in mistakes if m['topic'] == args.topic]
-        for m in filtered:
-            print(f"Filename: {m['filename']}")
-            print(f"Date: {m['date']}")
-            print(f"Page: {m['page_number']}")
-            print(f"Question: {m['problem_formulation']}")
-            print(f"Mistake: {m['mistake_description']}")
-            print("---")
+    state = {'count': 0, 'last_id': None}
+    mistakes = _track_last(iter_mistake_locations(args.db, topic=args.topic, date=args.date,
+                                                  filename=args.filename, search=args.search,
+                                                  after=args.after, limit=args.limit), state)
+
+    if args.json:
+        write_json_array(mistakes)
+    elif args.ndjson:
+        write_ndjson(mistakes)
     else:
-        # no filters: list all mistakes
-        filtered = mistakes
-        for m in filtered:
-            print(f"File: {m['filename']}")
-            print(f"Date: {m['date']}")
-            print(f"Subject: {m['subject']}")
-            print(f"Topic: {m['topic']}")
-            print(f"Page: {m['page_number']}")
-            print(f"Question: {m['problem_formulation']}")
-            print(f"Mistake: {m['mistake_description']}")
+        # Plain-text output modes; the questions are also written to a text file as they stream
+        mode = 'date' if args.date else 'topic' if args.topic else 'all'
+        if mode == 'date':
             print("---")
+        try:
+            questions = open('questions.txt', 'w')
+        except Exception as e:
+            print(f"try again: {e}")
+            questions = None
+        try:
+            for m in mistakes:
+                print(format_text(m, mode))
+                if questions is not None and m['problem_formulation'] is not None:
+                    questions.write(m['problem_formulation'] + '\n')
+        finally:
+            if questions is not None:
+                questions.close()
 
-    # After printing results, output questions to a text file
-    try:
-        with open('questions.txt', 'w') as f:
-            for q in filtered:
-                f.write(q['problem_formulation'] + '\n')
-        # print("Questions written to questions.txt")
-    except Exception as e:
-        print(f"try again: {e}")
+    if args.limit is not None and state['count'] == args.limit and state['last_id'] is not None:
+        print(f"More results may follow: use --after {state['last_id']}", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    except BrokenPipeError:
+        # Output piped into e.g. head, which stopped reading
+        sys.stdout = open(os.devnull, 'w')
+        sys.exit(1)
@@ -11,19 +11,25 @@ import time
 # --- Import functions from other project files ---
 # Ensure these files are in the same directory or Python path
 try:
-    from combining_add_and_create import process_and_add_file
+    from combining_add_and_create import process_and_add_file, DEFAULT_MAX_WORKERS
     # We need to handle how plot_analytics starts Streamlit
     # from plot_analaytic import plot_analytics
-    from find_mistakes_topics import get_topics_with_mistakes, export_questions_for_topic_to_txt
-    from study_guide_generation import create_study_guide_md
+    from create_database import initialize_database_schema
+    from find_mistakes_topics import get_topics_with_mistakes
+    from search import search_topics_with_mistakes
+    from study_guide_generation import (generate_guide_for_topic, generate_study_guides_batch,
+                                        guide_cache, DEFAULT_GUIDE_WORKERS)
 except ImportError as e:
     messagebox.showerror("Import Error", f"Error importing required modules: {e}\n\nPlease ensure all .py files are in the same directory.")
     sys.exit(1)
 
 # --- Configuration ---
 DEFAULT_DB = 'database.db'
-QUESTIONS_FILENAME = 'questions_for_study.txt' # Temp file for guide generation
 STUDY_GUIDE_DIR = 'study_guides'
+INGEST_WORKERS = DEFAULT_MAX_WORKERS # Files uploaded/analyzed in parallel by "Process New Files"
+GUIDE_WORKERS = DEFAULT_GUIDE_WORKERS # Guides generated in parallel by "Generate Guides for All Topics"
+STREAM_GUIDES = True # Write guides to disk as they are generated and show progress
+GUIDE_PAGE_NEIGHBOURHOOD = None # e.g. 1 to upload only the topic's recorded PDF pages (+/- 1 page); None uploads whole files
 os.makedirs(STUDY_GUIDE_DIR, exist_ok=True) # Ensure study guide dir exists
 
 # --- Main Application Class ---
@@ -64,6 +70,17 @@ class DocAssistantApp(tk.Tk):
         self.btn_refresh = ttk.Button(right_frame, text="Refresh List", command=self.load_topics_into_listbox)
         self.btn_refresh.pack(pady=(0, 5), anchor='nw')
 
+        # Free-text filter: only topics with a mistake mentioning these words
+        filter_frame = ttk.Frame(right_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter mistakes:").pack(side=tk.LEFT)
+        self.topic_filter_var = tk.StringVar()
+        self.topic_filter_entry = ttk.Entry(filter_frame, textvariable=self.topic_filter_var)
+        self.topic_filter_entry.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+        self.topic_filter_entry.bind('<Return>', lambda event: self.load_topics_into_listbox())
+        self.btn_filter = ttk.Button(filter_frame, text="Filter", command=self.load_topics_into_listbox)
+        self.btn_filter.pack(side=tk.LEFT)
+
         # Listbox with Scrollbar
         listbox_frame = ttk.Frame(right_frame)
         listbox_frame.pack(expand=True, fill=tk.BOTH, pady=(0, 10))
@@ -81,6 +98,18 @@ class DocAssistantApp(tk.Tk):
         self.btn_generate_guide = ttk.Button(right_frame, text="Generate Study Guide for Selected", command=self.on_topic_select)
         self.btn_generate_guide.pack(pady=5)
 
+        self.btn_generate_all = ttk.Button(right_frame, text="Generate Guides for All Topics", command=self.run_generate_all_guides)
+        self.btn_generate_all.pack(pady=5)
+
+        self.force_regenerate_var = tk.BooleanVar(value=False)
+        self.chk_force_regenerate = ttk.Checkbutton(right_frame, text="Force regenerate (ignore cached guide)", variable=self.force_regenerate_var)
+        self.chk_force_regenerate.pack()
+
+        # Only enabled while guides are being generated
+        self.guide_cancel_event = threading.Event()
+        self.btn_cancel_guide = ttk.Button(right_frame, text="Cancel Guide Generation", command=self.cancel_guide_generation, state=tk.DISABLED)
+        self.btn_cancel_guide.pack(pady=5)
+
         # --- Status Bar ---
         self.status_var = tk.StringVar()
         self.status_var.set("Ready.")
@@ -105,17 +134,26 @@ class DocAssistantApp(tk.Tk):
         thread.start()
 
     def load_topics_into_listbox(self):
-        """Fetches topics with mistakes and populates the listbox."""
+        """
+        Fetches topics with mistakes and populates the listbox. With filter
+        text entered, only topics having a mistake that matches it (full-text
+        search, best match first) are listed.
+        """
         self.update_status("Loading topics...")
         self.topic_listbox.delete(0, tk.END) # Clear existing items
+        filter_text = self.topic_filter_var.get().strip()
         try:
-            topics = get_topics_with_mistakes(DEFAULT_DB)
+            if filter_text:
+                topics = search_topics_with_mistakes(DEFAULT_DB, filter_text, prefix=True)
+            else:
+                topics = get_topics_with_mistakes(DEFAULT_DB)
             if topics is None:
                 self.topic_listbox.insert(tk.END, "Error loading topics!")
                 self.update_status("Error loading topics.", 5000)
             elif not topics:
-                self.topic_listbox.insert(tk.END, "No topics with mistakes found.")
-                self.update_status("No topics with mistakes found.", 5000)
+                message = f"No mistakes match '{filter_text}'." if filter_text else "No topics with mistakes found."
+                self.topic_listbox.insert(tk.END, message)
+                self.update_status(message, 5000)
             else:
                 for topic in topics:
                     self.topic_listbox.insert(tk.END, topic)
@@ -130,11 +168,16 @@ class DocAssistantApp(tk.Tk):
         self.update_status("Processing new files...")
         self.set_buttons_state(tk.DISABLED)
         try:
-            process_and_add_file()
+            results = process_and_add_file(max_workers=INGEST_WORKERS)
             # After processing, refresh the topic list automatically
             self.after(100, self.load_topics_into_listbox) # Run in main thread
-            self.update_status("File processing complete.", 5000)
-            messagebox.showinfo("Processing Complete", "Finished processing files in 'data/' directory.")
+            added = [r for r in results if r['status'] == 'added']
+            failed = [r for r in results if r['status'] == 'failed']
+            self.update_status(f"File processing complete: {len(added)} added, {len(failed)} failed.", 5000)
+            summary = f"Finished processing files in 'data/' directory.\n\nAdded: {len(added)}\nSkipped: {len(results) - len(added) - len(failed)}\nFailed: {len(failed)}"
+            if failed:
+                summary += "\n\nFailed files:\n" + "\n".join(f"- {r['filename']}: {r['error']}" for r in failed)
+            messagebox.showinfo("Processing Complete", summary)
         except Exception as e:
             self.update_status(f"Error during file processing: {e}", 5000)
             messagebox.showerror("Processing Error", f"An error occurred during file processing:\n{e}")
@@ -150,12 +193,9 @@ class DocAssistantApp(tk.Tk):
         self.update_status("Launching analytics dashboard...")
         self.set_buttons_state(tk.DISABLED)
         try:
-            # plot_analytics() directly calls Streamlit. We might need a more robust way
-            # For simplicity, let's assume plot_analytic.py just runs streamlit
             # Find python executable to ensure it runs in the correct environment
             python_executable = sys.executable
-            # Ensure analytics.py runs first if needed by plot_analytics
-            subprocess.run([python_executable, "analytics.py"], check=True, capture_output=True)
+            # The dashboard queries the database directly, no analytics.py pre-run needed
             # Launch streamlit app
             # Use Popen to not block waiting for Streamlit to exit
             subprocess.Popen([python_executable, "-m", "streamlit", "run", "app.py"])
@@ -163,11 +203,8 @@ class DocAssistantApp(tk.Tk):
             messagebox.showinfo("Analytics Launched", "The Streamlit analytics dashboard should be opening in your web browser.")
 
         except FileNotFoundError:
-             self.update_status("Error: streamlit or analytics.py/app.py not found.", 5000)
-             messagebox.showerror("Launch Error", "Could not find Streamlit or necessary script files (analytics.py/app.py). Is Streamlit installed?")
-        except subprocess.CalledProcessError as e:
-             self.update_status(f"Error running analytics script: {e}", 5000)
-             messagebox.showerror("Analytics Error", f"Error running analytics.py:\n{e.stderr.decode()}")
+             self.update_status("Error: streamlit or app.py not found.", 5000)
+             messagebox.showerror("Launch Error", "Could not find Streamlit or the dashboard script (app.py). Is Streamlit installed?")
         except Exception as e:
              self.update_status(f"Error launching analytics: {e}", 5000)
              messagebox.showerror("Launch Error", f"An unexpected error occurred launching analytics:\n{e}")
@@ -189,42 +226,42 @@ class DocAssistantApp(tk.Tk):
         selected_topic = self.topic_listbox.get(selected_index)
 
         # Avoid triggering on error/info messages in listbox
-        if "Error loading" in selected_topic or "No topics" in selected_topic:
+        if "Error loading" in selected_topic or "No topics" in selected_topic or selected_topic.startswith("No mistakes match"):
              messagebox.showinfo("Info", "Cannot generate guide for this list entry.")
              return
 
         # Confirmation
         if messagebox.askyesno("Confirm Guide Generation", f"Generate study guide for:\n'{selected_topic}'?"):
-            self.run_in_thread(self._generate_guide_task, selected_topic)
+            # Read Tk state here (main thread), not in the background task
+            self.run_in_thread(self._generate_guide_task, selected_topic, self.force_regenerate_var.get())
 
-    def _generate_guide_task(self, topic_name):
+    def _generate_guide_task(self, topic_name, force_regenerate=False):
         """Background task to export questions and generate the study guide."""
         self.update_status(f"Generating guide for '{topic_name}'...")
         self.set_buttons_state(tk.DISABLED)
+        self.start_cancellable_guide_task()
         guide_path = None
-        try:
-            # Step 1: Export questions
-            self.update_status(f"Exporting questions for '{topic_name}'...")
-            export_success = export_questions_for_topic_to_txt(
-                topic_name=topic_name,
-                output_filepath=QUESTIONS_FILENAME,
-                db_filepath=DEFAULT_DB
-            )
 
-            if not export_success:
-                raise ValueError(f"Failed to export questions for topic '{topic_name}'.") # Raise error to be caught
+        def show_progress(chunks, bytes_received, elapsed):
+            self.update_status(f"Generating guide for '{topic_name}': {bytes_received / 1024:.1f} KB in {chunks} chunk(s), {elapsed:.0f}s elapsed")
 
-            # Step 2: Generate guide
+        try:
+            # Questions are exported to a private temp file inside generate_guide_for_topic
             self.update_status(f"Generating study guide Markdown for '{topic_name}'...")
-            guide_path = create_study_guide_md(
+            guide_path = generate_guide_for_topic(
                 topic_name=topic_name,
-                question_txt_filepath=QUESTIONS_FILENAME,
                 db_filepath=DEFAULT_DB,
-                output_dir=STUDY_GUIDE_DIR
+                output_dir=STUDY_GUIDE_DIR,
+                force_regenerate=force_regenerate,
+                page_neighbourhood=GUIDE_PAGE_NEIGHBOURHOOD,
+                stream=STREAM_GUIDES,
+                progress_callback=show_progress,
+                cancel_event=self.guide_cancel_event
             )
 
             if guide_path:
-                self.update_status(f"Study guide saved: {guide_path}", 5000)
+                stats = guide_cache.stats()
+                self.update_status(f"Study guide saved: {guide_path} (cache: {stats['hits']} hits, {stats['misses']} misses, {stats['bytes_saved'] / 1024:.0f} KB upload saved)", 5000)
                 messagebox.showinfo("Guide Generated", f"Study guide successfully generated and saved to:\n{guide_path}")
                 # Optionally open the file or directory
                 try:
@@ -238,34 +275,82 @@ class DocAssistantApp(tk.Tk):
                        except FileNotFoundError:
                             print("Could not automatically open the output directory.")
 
+        except Exception as e:
+            if self.guide_cancel_event.is_set():
+                self.update_status(f"Guide generation for '{topic_name}' cancelled.", 5000)
             else:
-                 raise RuntimeError("Study guide generation function returned None.")
+                self.update_status(f"Error generating guide for '{topic_name}': {e}", 5000)
+                messagebox.showerror("Guide Generation Error", f"Failed to generate study guide for '{topic_name}':\n{e}")
+        finally:
+            self.btn_cancel_guide.config(state=tk.DISABLED)
+            self.set_buttons_state(tk.NORMAL)
 
+    def run_generate_all_guides(self):
+        """Asks for confirmation, then generates guides for every topic with mistakes."""
+        if messagebox.askyesno("Confirm Batch Generation",
+                               f"Generate study guides for all topics with mistakes?\n"
+                               f"Up to {GUIDE_WORKERS} guides are generated at a time."):
+            self.run_in_thread(self._generate_all_guides_task, self.force_regenerate_var.get())
 
+    def _generate_all_guides_task(self, force_regenerate=False):
+        """Background task that generates guides for all topics concurrently."""
+        self.update_status(f"Generating study guides for all topics ({GUIDE_WORKERS} at a time)...")
+        self.set_buttons_state(tk.DISABLED)
+        self.start_cancellable_guide_task()
+        try:
+            report = generate_study_guides_batch(
+                db_filepath=DEFAULT_DB,
+                output_dir=STUDY_GUIDE_DIR,
+                max_workers=GUIDE_WORKERS,
+                force_regenerate=force_regenerate,
+                page_neighbourhood=GUIDE_PAGE_NEIGHBOURHOOD,
+                stream=STREAM_GUIDES,
+                cancel_event=self.guide_cancel_event
+            )
+            if report is None:
+                raise RuntimeError("Could not load the list of topics with mistakes.")
+
+            summary = (f"{report['succeeded']} guide(s) generated, {report['failed']} failed "
+                       f"in {report['wall_seconds']:.0f}s (slowest guide {report['max_seconds']:.0f}s).")
+            self.update_status(summary, 10000)
+            failures = [f"- {r['topic']}: {r['error']}" for r in report['results'] if r['error']]
+            if failures:
+                messagebox.showwarning("Batch Generation Finished", summary + "\n\nFailed topics:\n" + "\n".join(failures))
+            else:
+                messagebox.showinfo("Batch Generation Finished", summary + f"\n\nGuides saved to: {STUDY_GUIDE_DIR}")
         except Exception as e:
-            self.update_status(f"Error generating guide for '{topic_name}': {e}", 5000)
-            messagebox.showerror("Guide Generation Error", f"Failed to generate study guide for '{topic_name}':\n{e}")
+            self.update_status(f"Error during batch guide generation: {e}", 5000)
+            messagebox.showerror("Batch Generation Error", f"Batch study guide generation failed:\n{e}")
         finally:
-            # Clean up temporary questions file
-            if os.path.exists(QUESTIONS_FILENAME):
-                try:
-                    os.remove(QUESTIONS_FILENAME)
-                    print(f"Removed temporary file: {QUESTIONS_FILENAME}")
-                except OSError as e:
-                    print(f"Warning: Could not remove temporary file {QUESTIONS_FILENAME}: {e}")
+            self.btn_cancel_guide.config(state=tk.DISABLED)
             self.set_buttons_state(tk.NORMAL)
 
+    def start_cancellable_guide_task(self):
+        """Resets the cancel flag and enables the Cancel button for a new guide task."""
+        self.guide_cancel_event.clear()
+        self.btn_cancel_guide.config(state=tk.NORMAL)
+
+    def cancel_guide_generation(self):
+        """Asks running guide generation to stop after the chunk being received."""
+        self.guide_cancel_event.set()
+        self.btn_cancel_guide.config(state=tk.DISABLED)
+        self.update_status("Cancelling guide generation...")
+
     def set_buttons_state(self, state):
         """Enable or disable buttons during operations (e.g., tk.DISABLED or tk.NORMAL)."""
         self.btn_process.config(state=state)
         self.btn_analytics.config(state=state)
         self.btn_refresh.config(state=state)
+        self.btn_filter.config(state=state)
         self.btn_generate_guide.config(state=state)
+        self.btn_generate_all.config(state=state)
+        self.chk_force_regenerate.config(state=state)
         # Optionally disable listbox interaction too
         self.topic_listbox.config(state=state)
 
 
 # --- Run the Application ---
 if __name__ == "__main__":
+    initialize_database_schema(DEFAULT_DB) # Apply pending migrations once, before any worker thread uses the DB
     app = DocAssistantApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,324 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+try:
+    import config
+except ImportError:
+    config = None
+
+# --- Configuration ---
+BACKEND_ENV_VAR = 'CLASSMATE_BACKEND' # Overrides config.model_backend ('gemini' or 'fake')
+DEFAULT_BACKEND = 'gemini'
+
+
+class ModelBackend:
+    """
+    Interface between the pipeline (through llm_client.LLMClient) and a
+    model provider.
+
+    Uploaded files are returned as handles with .name (used for deletion)
+    and .uri. generate_content returns a response with .text, .parts and
+    .candidates; with stream=True the response is first iterated for chunk
+    responses (each with .text and .parts) and then exposes the combined
+    .text and .parts. With a response_schema (see response_schema.py) the
+    response text is JSON following that schema.
+    """
+
+    name = 'base'
+    requires_api_key = True
+
+    def configure(self, api_key: str | None) -> None:
+        """Sets credentials before the first call."""
+
+    def upload_file(self, path: str, display_name: str | None = None):
+        raise NotImplementedError
+
+    def delete_file(self, name: str) -> None:
+        raise NotImplementedError
+
+    def generate_content(self, model_name: str, contents: list,
+                         timeout: float | None = None, stream: bool = False,
+                         response_schema: dict | None = None):
+        raise NotImplementedError
+
+    def cache_identity(self, model_name: str) -> str:
+        """Model name used in cache keys, so responses of different backends never mix."""
+        return f"{self.name}/{model_name}"
+
+
+class GeminiBackend(ModelBackend):
+    """google.generativeai, imported on first use (or the module passed in)."""
+
+    name = 'gemini'
+
+    def __init__(self, genai_module=None):
+        self._genai = genai_module
+
+    @property
+    def genai(self):
+        if self._genai is None:
+            import google.generativeai as genai
+            self._genai = genai
+        return self._genai
+
+    def configure(self, api_key):
+        self.genai.configure(api_key=api_key)
+
+    def upload_file(self, path, display_name=None):
+        if display_name is None:
+            return self.genai.upload_file(path=path)
+        return self.genai.upload_file(path=path, display_name=display_name)
+
+    def delete_file(self, name):
+        self.genai.delete_file(name)
+
+    def generate_content(self, model_name, contents, timeout=None, stream=False, response_schema=None):
+        model = self.genai.GenerativeModel(model_name=model_name)
+        kwargs = {'contents': contents}
+        if response_schema is not None:
+            kwargs['generation_config'] = {'response_mime_type': 'application/json',
+                                           'response_schema': response_schema}
+        if timeout is not None:
+            kwargs['request_options'] = self.genai.types.RequestOptions(timeout=timeout)
+        if stream:
+            kwargs['stream'] = True
+        return model.generate_content(**kwargs)
+
+    def cache_identity(self, model_name):
+        return model_name # Keeps cache keys written before backends existed valid
+
+
+# --- Local Fake ---
+class FakeBackendError(Exception):
+    """Injected failure; .code carries the HTTP status like google.api_core errors."""
+    def __init__(self, code: int):
+        super().__init__(f"Injected fake backend error (HTTP {code})")
+        self.code = code
+
+
+class FakeFile:
+    def __init__(self, name, uri, path, display_name):
+        self.name = name
+        self.uri = uri
+        self.path = path
+        self.display_name = display_name
+
+
+class FakeResponse:
+    """Response (or streamed chunk) holding plain text."""
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+        self.candidates = []
+
+
+class FakeStreamResponse:
+    """Streamed response: iterate for chunks, then .text/.parts hold the whole text."""
+    def __init__(self, chunks, chunk_delay, sleep):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._sleep = sleep
+        self._done = False
+        self.candidates = []
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self._sleep(self._chunk_delay)
+            yield FakeResponse(chunk)
+        self._done = True
+
+    @property
+    def parts(self):
+        if not self._done:
+            raise ValueError("Iterate over the streamed response before reading it.")
+        return list(self._chunks)
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+_FAKE_SUBJECTS = {
+    "Linear Algebra": ["Matrix Multiplication", "Eigenvalues", "Vector Spaces", "Determinants"],
+    "Calculus": ["Differentiation", "Integration", "Limits", "Series"],
+    "Machine Learning": ["Linear Regression", "Gradient Descent", "Overfitting", "Loss Functions"],
+}
+_FAKE_MISTAKE_TYPES = ["Calculation", "Conceptual", "Procedural"]
+
+
+class FakeBackend(ModelBackend):
+    """
+    Deterministic offline backend for tests and load tests. Needs no network
+    or API key.
+
+    Ingest prompts get JSON in the shape populate_database expects, with
+    topics, mistakes and good answers derived from the document's name (the
+    same document always yields the same data). Prompts asking for a study
+    guide get Markdown citing the uploaded files; with a response_schema the
+    answer is always the ingest JSON. Every generate call takes
+    about `latency` seconds (+/- `jitter` as a fraction), uploads take
+    `upload_latency`, and each call fails with an injected 429/500/503
+    error with probability `failure_rate`.
+    """
+
+    name = 'fake'
+    requires_api_key = False
+
+    def __init__(self, latency: float = 0.5, upload_latency: float = 0.05,
+                 jitter: float = 0.2, failure_rate: float = 0.0,
+                 stream_chunks: int = 8, seed: int = 0, sleep=time.sleep):
+        self.latency = latency
+        self.upload_latency = upload_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stream_chunks = stream_chunks
+        self._sleep = sleep
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._files = {}
+        self._lock = threading.Lock()
+        self.calls = {'upload': 0, 'delete': 0, 'generate': 0, 'structured': 0, 'failed': 0}
+
+    def _call(self, kind, delay):
+        """Counts a call, waits for its simulated latency and maybe injects a failure."""
+        with self._lock:
+            self.calls[kind] += 1
+            spread = 1 + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+            code = self._rng.choice((429, 500, 503))
+            if fail:
+                self.calls['failed'] += 1
+        self._sleep(max(0.0, delay * spread))
+        if fail:
+            raise FakeBackendError(code)
+
+    def upload_file(self, path, display_name=None):
+        with open(path, 'rb'):
+            pass # Raise FileNotFoundError like the real upload
+        self._call('upload', self.upload_latency)
+        handle = FakeFile(f"files/fake-{next(self._ids)}", f"fake://{os.path.basename(path)}",
+                          path, display_name or os.path.basename(path))
+        with self._lock:
+            self._files[handle.name] = handle
+        return handle
+
+    def delete_file(self, name):
+        with self._lock:
+            self.calls['delete'] += 1
+            self._files.pop(name, None)
+
+    def generate_content(self, model_name, contents, timeout=None, stream=False, response_schema=None):
+        texts = [part for part in contents if isinstance(part, str)]
+        prompt = texts[0] if texts else '' # The instructions; later text parts are documents
+        files = [part for part in contents if isinstance(part, FakeFile)]
+        # Documents sent as extracted text (see text_extraction.format_document_text)
+        path_match = re.search(r'And the filepath is (\S+)', prompt)
+        for filename in re.findall(r'^===== Document: (.+?) =====$', '\n'.join(texts[1:]), re.MULTILINE):
+            path = path_match.group(1) if path_match and os.path.basename(path_match.group(1)) == filename else filename
+            files.append(FakeFile(f"inline/{filename}", None, path, filename))
+        if response_schema is None and 'study guide' in prompt.lower():
+            text = self.fake_study_guide(files)
+        else:
+            text = json.dumps(self.fake_response_data(files[0] if files else None))
+            if response_schema is not None:
+                with self._lock:
+                    self.calls['structured'] += 1
+
+        if not stream:
+            self._call('generate', self.latency)
+            return FakeResponse(text)
+        # The first chunk arrives after a tenth of the latency, the rest is spread over the chunks
+        self._call('generate', self.latency * 0.1)
+        size = max(1, -(-len(text) // self.stream_chunks))
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        return FakeStreamResponse(chunks, self.latency * 0.9 / max(1, len(chunks)), self._sleep)
+
+    @staticmethod
+    def _document_rng(document: FakeFile | None) -> random.Random:
+        key = os.path.basename(document.path) if document else ''
+        return random.Random(hashlib.sha256(key.encode('utf-8')).digest())
+
+    def fake_response_data(self, document: FakeFile | None) -> dict:
+        """Builds the ingest JSON for one document (same document, same data)."""
+        rng = self._document_rng(document)
+        filename = os.path.basename(document.path) if document else 'document.pdf'
+        filepath = document.path if document else filename
+        subject = rng.choice(sorted(_FAKE_SUBJECTS))
+        topic_names = rng.sample(_FAKE_SUBJECTS[subject], 2)
+
+        topics = []
+        for topic_name in topic_names:
+            topics.append({
+                "topic_name": topic_name,
+                "topic_description": f"{topic_name} as covered in {filename}.",
+                "source_locations": [{"filename": filename, "filepath": filepath,
+                                      "page": rng.randint(1, 20), "location_description": "Section heading"}],
+                "subtopics": [{
+                    "subtopic_name": f"{topic_name} Basics",
+                    "subtopic_description": f"Fundamentals of {topic_name}.",
+                    "source_locations": [{"filename": filename, "filepath": filepath,
+                                          "page": rng.randint(1, 20), "location_detail": "Worked example",
+                                          "keywords": topic_name.lower()}],
+                }],
+            })
+
+        def event(number):
+            topic_name = rng.choice(topic_names)
+            return {"source_filename": filename, "source_filepath": filepath,
+                    "page": rng.randint(1, 20), "location_detail": f"Q{number}",
+                    "relevant_topic": topic_name,
+                    "relevant_subtopic": f"{topic_name} Basics" if rng.random() < 0.5 else None,
+                    "problem_formulation": f"Exercise {number} on {topic_name.lower()}."}
+
+        mistakes = []
+        for number in range(1, rng.randint(2, 5) + 1):
+            mistake = event(number)
+            mistake.update({"description": f"Incorrect step in exercise {number}.",
+                            "type": rng.choice(_FAKE_MISTAKE_TYPES),
+                            "details": "The intermediate result was not carried over correctly."})
+            mistakes.append(mistake)
+        good_answers = []
+        for number in range(1, rng.randint(1, 3) + 1):
+            answer = event(100 + number)
+            answer["description"] = f"Complete and well-justified answer to exercise {100 + number}."
+            good_answers.append(answer)
+
+        return {"content": [{"subject_name": subject, "subject_description": f"Fake {subject} course.",
+                             "topics": topics}],
+                "mistakes": mistakes, "good_answers": good_answers}
+
+    def fake_study_guide(self, files: list) -> str:
+        """Builds a Markdown study guide citing the uploaded files."""
+        names = [f.display_name for f in files] or ['context.pdf']
+        sources = [n for n in names if not n.endswith('.txt')] or names
+        lines = ["# Study Guide", "", "## Core Concepts", ""]
+        for i, name in enumerate(sources * 3, start=1):
+            lines.append(f"- Key idea {i}, explained with a worked example [{name}, Page {i}].")
+        lines += ["", "## Common Mistakes", ""]
+        for i in range(1, 6):
+            lines.append(f"{i}. Skipping an intermediate step when simplifying [{sources[0]}].")
+        lines += ["", "## Tips", "", "- Re-derive each formula once by hand before using it.", ""]
+        return '\n'.join(lines)
+
+
+def create_backend(name: str | None = None) -> ModelBackend:
+    """
+    Returns the backend called name ('gemini' or 'fake'). Without a name it
+    is read from the CLASSMATE_BACKEND environment variable, then from
+    config.model_backend, defaulting to 'gemini'. The fake backend's latency
+    and failure rate can be set with CLASSMATE_FAKE_LATENCY and
+    CLASSMATE_FAKE_FAILURE_RATE.
+    """
+    name = name or os.environ.get(BACKEND_ENV_VAR) or getattr(config, 'model_backend', DEFAULT_BACKEND)
+    if name == 'gemini':
+        return GeminiBackend()
+    if name == 'fake':
+        return FakeBackend(latency=float(os.environ.get('CLASSMATE_FAKE_LATENCY', 0.5)),
+                           failure_rate=float(os.environ.get('CLASSMATE_FAKE_FAILURE_RATE', 0.0)))
+    raise ValueError(f"Unknown model backend '{name}' (expected 'gemini' or 'fake').")
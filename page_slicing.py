@@ -0,0 +1,147 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from response_cache import hash_file
+
+# pypdf is optional: without it, sources are always uploaded in full
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+PAGE_SLICING_AVAILABLE = PdfReader is not None
+
+# --- Configuration ---
+DEFAULT_PAGE_NEIGHBOURHOOD = 1 # Pages kept before and after every recorded page
+DEFAULT_SLICE_DIR = '.page_slices' # Where derived excerpt PDFs are cached
+
+
+def get_topic_pages(conn: sqlite3.Connection, topic_id: int) -> dict[str, set[int]]:
+    """
+    Returns the recorded page numbers per source filepath for a topic.
+
+    Pages come from Topic_Source_Locations, Subtopic_Source_Locations (for
+    the topic's subtopics), Mistakes and Good_Answers. Rows without a page
+    number are ignored, so a source with no recorded pages is absent from
+    the result.
+
+    Args:
+        conn: Open database connection.
+        topic_id: ID of the topic.
+
+    Returns:
+        dict mapping Sources.filepath to a set of 1-based page numbers.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT s.filepath, p.page_number
+        FROM (
+            SELECT source_id, page_number FROM Topic_Source_Locations WHERE topic_id = ?
+            UNION
+            SELECT ssl.source_id, ssl.page_number
+            FROM Subtopic_Source_Locations ssl
+            JOIN Subtopics sub ON ssl.subtopic_id = sub.subtopic_id
+            WHERE sub.topic_id = ?
+            UNION
+            SELECT source_id, page_number FROM Mistakes
+            WHERE topic_id = ? OR subtopic_id IN (SELECT subtopic_id FROM Subtopics WHERE topic_id = ?)
+            UNION
+            SELECT source_id, page_number FROM Good_Answers
+            WHERE topic_id = ? OR subtopic_id IN (SELECT subtopic_id FROM Subtopics WHERE topic_id = ?)
+        ) p
+        JOIN Sources s ON p.source_id = s.source_id
+        WHERE p.page_number IS NOT NULL AND s.filepath IS NOT NULL
+    """, (topic_id,) * 6)
+
+    pages = {}
+    for filepath, page_number in cursor.fetchall():
+        if isinstance(page_number, int) and page_number > 0:
+            pages.setdefault(os.path.normpath(filepath), set()).add(page_number)
+    return pages
+
+
+def expand_pages(pages, neighbourhood: int, page_count: int) -> list[int]:
+    """
+    Returns the sorted pages within `neighbourhood` pages of any recorded
+    page, clipped to 1..page_count.
+    """
+    expanded = set()
+    for page in pages:
+        for p in range(page - neighbourhood, page + neighbourhood + 1):
+            if 1 <= p <= page_count:
+                expanded.add(p)
+    return sorted(expanded)
+
+
+def format_page_ranges(pages: list[int]) -> str:
+    """Formats sorted page numbers compactly, e.g. [1, 2, 3, 7] -> '1-3, 7'."""
+    ranges = []
+    start = prev = None
+    for page in pages:
+        if prev is not None and page == prev + 1:
+            prev = page
+            continue
+        if start is not None:
+            ranges.append(f"{start}-{prev}" if prev != start else str(start))
+        start = prev = page
+    if start is not None:
+        ranges.append(f"{start}-{prev}" if prev != start else str(start))
+    return ', '.join(ranges)
+
+
+def slice_pdf(source_filepath: str,
+              pages,
+              neighbourhood: int = DEFAULT_PAGE_NEIGHBOURHOOD,
+              slice_dir: str = DEFAULT_SLICE_DIR) -> tuple[str, list[int]] | None:
+    """
+    Writes a derived PDF holding only the given pages (plus neighbourhood)
+    of source_filepath, reusing a previously derived file for the same
+    source content and page set.
+
+    Args:
+        source_filepath: Path to the original PDF.
+        pages: Recorded 1-based page numbers.
+        neighbourhood: Pages kept before and after each recorded page.
+        slice_dir: Directory holding the derived PDFs.
+
+    Returns:
+        (derived_filepath, kept_pages) where kept_pages lists the original
+        page number of each derived page in order, or None if the PDF cannot
+        be sliced (pypdf missing, unreadable file, or every page is kept).
+    """
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(source_filepath)
+        page_count = len(reader.pages)
+    except Exception as e:
+        print(f"  Warning: Could not read '{source_filepath}' for page slicing: {e}")
+        return None
+
+    kept_pages = expand_pages(pages, neighbourhood, page_count)
+    if not kept_pages or len(kept_pages) >= page_count:
+        return None
+
+    # --- Reuse a derived PDF for the same source content and page set ---
+    key_source = f"{hash_file(source_filepath)}:{','.join(map(str, kept_pages))}"
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:32]
+    stem = os.path.splitext(os.path.basename(source_filepath))[0]
+    derived_filepath = os.path.join(slice_dir, f"{stem}.{key}.pdf")
+    if os.path.exists(derived_filepath):
+        return derived_filepath, kept_pages
+
+    try:
+        writer = PdfWriter()
+        for page_number in kept_pages:
+            writer.add_page(reader.pages[page_number - 1])
+        os.makedirs(slice_dir, exist_ok=True)
+        tmp_path = f"{derived_filepath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        os.replace(tmp_path, derived_filepath)
+    except Exception as e:
+        print(f"  Warning: Could not write page excerpt of '{source_filepath}': {e}")
+        return None
+    return derived_filepath, kept_pages
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# --- Configuration ---
+DEFAULT_CACHE_DIR = '.response_cache'
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024 # 200 MB of cached responses
+
+
+def hash_file(filepath: str, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of raw Gemini responses.
+
+    Entries are keyed by the content hash of the document, the exact prompt
+    text and the model name, and stored as one JSON file per entry. When the
+    total size exceeds max_bytes the least recently used entries are removed.
+
+    With replay_only=True the cache acts as a replay fixture: a miss is
+    reported to the caller instead of falling through to the API, so a
+    recorded ingest can be re-run (and benchmarked) without network access.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 replay_only: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(document_path: str, prompt: str, model_name: str, mode: str | None = None) -> str:
+        """
+        Builds the cache key for a document/prompt/model combination. mode
+        distinguishes other ways of sending the same document (e.g. 'text'
+        for extracted text instead of an upload).
+        """
+        digest = hashlib.sha256()
+        digest.update(hash_file(document_path).encode('ascii'))
+        digest.update(b'\0')
+        digest.update(prompt.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(model_name.encode('utf-8'))
+        if mode:
+            digest.update(b'\0')
+            digest.update(mode.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        """
+        Returns the cached raw response text for key, or None on a miss.
+        A hit refreshes the entry's position in the LRU order.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path) # Mark as recently used
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry.get('response_text')
+
+    def put(self, key: str, response_text: str, document_path: str = None, model_name: str = None) -> None:
+        """Stores a raw response text under key and evicts old entries if needed."""
+        entry = {
+            'document': os.path.basename(document_path) if document_path else None,
+            'model_name': model_name,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'response_text': response_text,
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._entry_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path) # Atomic, safe with concurrent writers
+        except OSError as e:
+            print(f"Warning: Could not write response cache entry '{key}': {e}")
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort() # Oldest (least recently used) first
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    print(f"Evicted response cache entry: {os.path.basename(path)}")
+                except OSError:
+                    pass
@@ -0,0 +1,238 @@
+import json
+import re
+import threading
+
+# --- Configuration ---
+SECTIONS = ('content', 'mistakes', 'good_answers') # Top-level keys of an ingest response
+FOLLOWUP_LIST_LIMIT = 200 # Already recovered entries listed in a follow-up prompt, per section
+
+_decoder = json.JSONDecoder()
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+_stats_lock = threading.Lock()
+_stats = {'malformed': 0, 'salvaged': 0, 'unsalvageable': 0, 'items_recovered': 0,
+          'followups': 0, 'followups_ok': 0, 'completed': 0}
+
+
+# --- Tolerant Parsing ---
+def _strip_fences(text: str) -> str:
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        first_line_end = cleaned.find('\n')
+        cleaned = cleaned[first_line_end + 1:] if first_line_end != -1 else ''
+    if cleaned.rstrip().endswith("```"):
+        cleaned = cleaned.rstrip()[:-3]
+    return cleaned
+
+
+def _value_end(text: str, start: int) -> int | None:
+    """Index after the object/array starting at start, or None if the text ends first."""
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in '{[':
+            depth += 1
+        elif c in '}]':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def _skip(text: str, i: int, chars: str = ' \t\r\n') -> int:
+    while i < len(text) and text[i] in chars:
+        i += 1
+    return i
+
+
+def _salvage_array(text: str, start: int) -> tuple[list, bool, int, int]:
+    """
+    Recovers the complete elements of the JSON array whose '[' is at start.
+    Elements that are complete but malformed are repaired (trailing commas)
+    or skipped.
+
+    Returns:
+        (items, complete, stop, skipped): complete is False if the text
+        ends inside the array, stop is where parsing stopped and skipped is
+        the number of unrecoverable complete elements.
+    """
+    items, skipped = [], 0
+    i = start + 1
+    while True:
+        i = _skip(text, i, ' \t\r\n,')
+        if i >= len(text):
+            return items, False, i, skipped
+        if text[i] == ']':
+            return items, True, i + 1, skipped
+        try:
+            item, i = _decoder.raw_decode(text, i)
+            items.append(item)
+            continue
+        except json.JSONDecodeError:
+            pass
+        end = _value_end(text, i) if text[i] in '{[' else None
+        if end is None:
+            return items, False, i, skipped # Truncated inside this element
+        try:
+            items.append(json.loads(_TRAILING_COMMA.sub(r'\1', text[i:end])))
+        except json.JSONDecodeError:
+            skipped += 1
+        i = end
+
+
+def _string_field(text: str, name: str) -> str | None:
+    match = re.search(r'"%s"\s*:\s*("(?:[^"\\]|\\.)*")' % re.escape(name), text)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+
+
+def _partial_subject(text: str, start: int) -> dict | None:
+    """The named subject starting at start with its complete topics, if the text ends inside it."""
+    fragment = text[start:]
+    topics_match = re.search(r'"topics"\s*:\s*\[', fragment)
+    subject_name = _string_field(fragment[:topics_match.start()] if topics_match else fragment, 'subject_name')
+    if not subject_name or not topics_match:
+        return None
+    topics, _, _, _ = _salvage_array(fragment, topics_match.end() - 1)
+    if not topics:
+        return None
+    return {'subject_name': subject_name,
+            'subject_description': _string_field(fragment[:topics_match.start()], 'subject_description'),
+            'topics': topics}
+
+
+def salvage_response(raw_text: str) -> tuple[dict | None, dict]:
+    """
+    Recovers every complete element of the "content", "mistakes" and
+    "good_answers" arrays from a truncated or slightly malformed ingest
+    response. For a subject cut off part-way, its complete topics are kept.
+
+    Args:
+        raw_text (str): The model's raw response text.
+
+    Returns:
+        (data, report): data has a list for every section (empty when
+        missing), or is None if nothing could be recovered. report maps
+        'sections' to {section: 'complete' | 'partial' | 'missing'}, 'items'
+        to {section: recovered element count} and 'skipped' to the number of
+        complete but unparseable elements dropped.
+    """
+    text = _strip_fences(raw_text)
+    data = {}
+    report = {'sections': {}, 'items': {}, 'skipped': 0}
+    for section in SECTIONS:
+        match = re.search(r'"%s"\s*:\s*\[' % section, text)
+        if not match:
+            data[section] = []
+            report['sections'][section] = 'missing'
+            report['items'][section] = 0
+            continue
+        items, complete, stop, skipped = _salvage_array(text, match.end() - 1)
+        if not complete and section == 'content' and stop < len(text) and text[stop] == '{':
+            subject = _partial_subject(text, stop)
+            if subject:
+                items.append(subject)
+        data[section] = items
+        report['sections'][section] = 'complete' if complete and not skipped else 'partial'
+        report['items'][section] = len(items)
+        report['skipped'] += skipped
+    if not any(data.values()):
+        return None, report
+    return data, report
+
+
+def missing_sections(report: dict) -> list[str]:
+    """Sections of a salvage report that were not recovered completely."""
+    return [section for section in SECTIONS if report['sections'].get(section) != 'complete']
+
+
+# --- Follow-up Request ---
+def _recovered_summary(section: str, items: list) -> list[str]:
+    if section == 'content':
+        lines = [f"{topic.get('topic_name')}" for subject in items if isinstance(subject, dict)
+                 for topic in subject.get('topics') or [] if isinstance(topic, dict)]
+    else:
+        lines = [f"page {item.get('page')}, {item.get('location_detail')}: {item.get('description')}"
+                 for item in items if isinstance(item, dict)]
+    if len(lines) > FOLLOWUP_LIST_LIMIT:
+        lines = lines[:FOLLOWUP_LIST_LIMIT] + [f"... and {len(lines) - FOLLOWUP_LIST_LIMIT} more"]
+    return lines
+
+
+def build_followup_prompt(base_prompt: str, data: dict, report: dict) -> str:
+    """
+    Prompt asking only for the sections that were not recovered completely,
+    listing what was already recovered so it is not generated again.
+    """
+    sections = missing_sections(report)
+    parts = [f"Your previous answer to the instructions below was cut off or malformed. "
+             f"Return ONLY a raw JSON object with the keys {', '.join(repr(s) for s in sections)}, "
+             f"in the same structure as before, with nothing before or after it."]
+    for section in sections:
+        recovered = _recovered_summary(section, data.get(section) or [])
+        if not recovered:
+            continue
+        if section == 'content':
+            parts.append("For \"content\", include only topics NOT in this list (they were already recovered):\n"
+                         + '\n'.join(recovered))
+        else:
+            parts.append(f"For \"{section}\", include only entries NOT in this list (they were already recovered):\n"
+                         + '\n'.join(recovered))
+    parts.append("Original instructions:\n" + base_prompt)
+    return '\n\n'.join(parts)
+
+
+# --- Salvage Metrics ---
+def record_salvage(recovered_items: int, followup: bool = False, followup_ok: bool = False,
+                   completed: bool = False) -> None:
+    """
+    Counts one malformed response. recovered_items is 0 when nothing could
+    be salvaged; completed means every section ended up complete.
+    """
+    with _stats_lock:
+        _stats['malformed'] += 1
+        if recovered_items:
+            _stats['salvaged'] += 1
+            _stats['items_recovered'] += recovered_items
+        else:
+            _stats['unsalvageable'] += 1
+        _stats['followups'] += int(followup)
+        _stats['followups_ok'] += int(followup_ok)
+        _stats['completed'] += int(completed)
+
+
+def salvage_stats() -> dict:
+    """
+    Counters since start-up: 'malformed' responses, 'salvaged' (something
+    recovered), 'unsalvageable', 'items_recovered', 'followups' sent,
+    'followups_ok', 'completed' (all sections recovered), 'salvage_rate'
+    and 'full_calls_saved' (whole-document regenerations avoided; the
+    narrower follow-ups are counted separately).
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['salvage_rate'] = round(stats['salvaged'] / stats['malformed'], 3) if stats['malformed'] else 0.0
+    stats['full_calls_saved'] = stats['salvaged']
+    return stats
+
+
+def format_salvage_stats(stats: dict) -> str:
+    """One-line summary of salvage_stats() for logs."""
+    return (f"{stats['malformed']} malformed response(s), {stats['salvaged']} salvaged "
+            f"({stats['salvage_rate']:.0%}), {stats['items_recovered']} item(s) recovered, "
+            f"{stats['followups']} follow-up(s) ({stats['followups_ok']} ok), {stats['completed']} completed, "
+            f"{stats['full_calls_saved']} full regeneration(s) saved")
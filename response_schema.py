@@ -0,0 +1,248 @@
+import re
+
+# --- Configuration ---
+MAX_REPORTED_ERRORS = 10 # Validation problems printed per load (all are counted)
+
+# SQL column type -> response schema type
+SQL_TYPES = {'INTEGER': 'INTEGER', 'TEXT': 'STRING', 'DATE': 'STRING', 'REAL': 'NUMBER'}
+
+# Fields of each record of the ingest response and the column storing them,
+# as (table, column) or, for fields resolved into a foreign key, (table,
+# column, referencing table, foreign key column). A field is required when
+# its column (and the foreign key, if any) is NOT NULL; otherwise it may be
+# null.
+SUBJECT_FIELDS = {
+    'subject_name': ('Subjects', 'subject_name'),
+    'subject_description': ('Subjects', 'subject_description'),
+}
+TOPIC_FIELDS = {
+    'topic_name': ('Topics', 'topic_name'),
+    'topic_description': ('Topics', 'topic_description'),
+}
+SUBTOPIC_FIELDS = {
+    'subtopic_name': ('Subtopics', 'subtopic_name'),
+    'subtopic_description': ('Subtopics', 'subtopic_description'),
+}
+TOPIC_LOCATION_FIELDS = {
+    'filename': ('Sources', 'filename', 'Topic_Source_Locations', 'source_id'),
+    'filepath': ('Sources', 'filepath', 'Topic_Source_Locations', 'source_id'),
+    'page': ('Topic_Source_Locations', 'page_number'),
+    'location_description': ('Topic_Source_Locations', 'location_description'),
+}
+SUBTOPIC_LOCATION_FIELDS = {
+    'filename': ('Sources', 'filename', 'Subtopic_Source_Locations', 'source_id'),
+    'filepath': ('Sources', 'filepath', 'Subtopic_Source_Locations', 'source_id'),
+    'page': ('Subtopic_Source_Locations', 'page_number'),
+    'location_detail': ('Subtopic_Source_Locations', 'location_detail'),
+    'keywords': ('Subtopic_Source_Locations', 'keywords'),
+}
+MISTAKE_FIELDS = {
+    'source_filename': ('Sources', 'filename', 'Mistakes', 'source_id'),
+    'source_filepath': ('Sources', 'filepath', 'Mistakes', 'source_id'),
+    'relevant_topic': ('Topics', 'topic_name', 'Mistakes', 'topic_id'),
+    'relevant_subtopic': ('Subtopics', 'subtopic_name', 'Mistakes', 'subtopic_id'),
+    'description': ('Mistakes', 'mistake_description'),
+    'problem_formulation': ('Mistakes', 'problem_formulation'),
+    'type': ('Mistakes', 'mistake_type'),
+    'page': ('Mistakes', 'page_number'),
+    'location_detail': ('Mistakes', 'location_detail'),
+    'details': ('Mistakes', 'mistake_details'),
+}
+GOOD_ANSWER_FIELDS = {
+    'source_filename': ('Sources', 'filename', 'Good_Answers', 'source_id'),
+    'source_filepath': ('Sources', 'filepath', 'Good_Answers', 'source_id'),
+    'relevant_topic': ('Topics', 'topic_name', 'Good_Answers', 'topic_id'),
+    'relevant_subtopic': ('Subtopics', 'subtopic_name', 'Good_Answers', 'subtopic_id'),
+    'description': ('Good_Answers', 'answer_description'),
+    'problem_formulation': ('Good_Answers', 'problem_formulation'),
+    'page': ('Good_Answers', 'page_number'),
+    'location_detail': ('Good_Answers', 'location_detail'),
+}
+
+_TABLE_NAME = re.compile(r'CREATE TABLE IF NOT EXISTS (\w+)')
+_COLUMN = re.compile(r'^\s*(\w+)\s+(INTEGER|TEXT|DATE|REAL)\b([^,\n]*)', re.MULTILINE)
+
+
+# --- Schema Derivation ---
+def parse_table_columns(create_sql: str) -> tuple[str, dict[str, tuple[str, bool]]]:
+    """
+    Reads the table name and column definitions of a CREATE TABLE statement.
+
+    Returns:
+        (table, columns): columns maps each column name to (SQL type,
+        NOT NULL).
+    """
+    table = _TABLE_NAME.search(create_sql)
+    if table is None:
+        raise ValueError("Not a CREATE TABLE IF NOT EXISTS statement.")
+    columns = {name: (sql_type, 'NOT NULL' in constraints.upper())
+               for name, sql_type, constraints in _COLUMN.findall(create_sql)}
+    return table.group(1), columns
+
+
+def _record_schema(fields: dict, tables: dict, arrays: dict | None = None) -> dict:
+    properties, required = {}, []
+    for field, spec in fields.items():
+        table, column = spec[0], spec[1]
+        if column not in tables.get(table, {}):
+            raise ValueError(f"Response field '{field}' maps to unknown column {table}.{column}.")
+        sql_type, not_null = tables[table][column]
+        if len(spec) == 4:
+            link_table, link_column = spec[2], spec[3]
+            if link_column not in tables.get(link_table, {}):
+                raise ValueError(f"Response field '{field}' links through unknown column {link_table}.{link_column}.")
+            not_null = not_null and tables[link_table][link_column][1]
+        properties[field] = {'type': SQL_TYPES[sql_type]}
+        if not_null:
+            required.append(field)
+        else:
+            properties[field]['nullable'] = True
+    for name, item_schema in (arrays or {}).items():
+        properties[name] = {'type': 'ARRAY', 'items': item_schema}
+    return {'type': 'OBJECT', 'properties': properties, 'required': required}
+
+
+def build_response_schema(create_statements: list[str]) -> dict:
+    """
+    Derives the JSON schema of the ingest response ("content", "mistakes"
+    and "good_answers") from the CREATE TABLE statements, in the OpenAPI
+    subset accepted as a Gemini response schema. Field types and
+    nullability come from the mapped columns.
+
+    Raises:
+        ValueError: If a mapped column is missing from the statements, so
+            the schema cannot silently drift from the tables.
+    """
+    tables = dict(parse_table_columns(sql) for sql in create_statements)
+    topic_location = _record_schema(TOPIC_LOCATION_FIELDS, tables)
+    subtopic = _record_schema(SUBTOPIC_FIELDS, tables,
+                              {'source_locations': _record_schema(SUBTOPIC_LOCATION_FIELDS, tables)})
+    topic = _record_schema(TOPIC_FIELDS, tables, {'source_locations': topic_location, 'subtopics': subtopic})
+    subject = _record_schema(SUBJECT_FIELDS, tables, {'topics': topic})
+    return {'type': 'OBJECT',
+            'properties': {'content': {'type': 'ARRAY', 'items': subject},
+                           'mistakes': {'type': 'ARRAY', 'items': _record_schema(MISTAKE_FIELDS, tables)},
+                           'good_answers': {'type': 'ARRAY', 'items': _record_schema(GOOD_ANSWER_FIELDS, tables)}},
+            'required': ['content', 'mistakes', 'good_answers']}
+
+
+def section_schema(schema: dict, sections: list[str]) -> dict:
+    """
+    The response schema narrowed to the given top-level sections (e.g. the
+    ones a follow-up request asks for), all of them required.
+    """
+    return {'type': schema['type'],
+            'properties': {section: schema['properties'][section] for section in sections},
+            'required': list(sections)}
+
+
+# --- Local Validation ---
+def _coerce(value, schema_type: str):
+    """(True, value converted to schema_type) or (False, None) if it cannot be."""
+    if value is None:
+        return True, None
+    if isinstance(value, bool):
+        return False, None
+    if schema_type == 'STRING':
+        return (True, value) if isinstance(value, str) else (True, str(value)) if isinstance(value, (int, float)) else (False, None)
+    if schema_type == 'INTEGER':
+        if isinstance(value, int):
+            return True, value
+        if isinstance(value, float) and value.is_integer():
+            return True, int(value)
+        if isinstance(value, str) and value.strip().isdigit():
+            return True, int(value.strip())
+        return False, None
+    if schema_type == 'NUMBER':
+        return (True, value) if isinstance(value, (int, float)) else (False, None)
+    return True, value
+
+
+def validate_record(record, schema: dict, path: str, errors: list[str]) -> dict | None:
+    """
+    Checks one record (and its nested arrays) against its schema.
+
+    Required fields that are missing, empty or of the wrong type reject the
+    record; optional fields of the wrong type are set to null. Rejected
+    nested records are dropped without rejecting their parent. Every
+    problem is appended to errors.
+
+    Returns:
+        dict | None: A cleaned copy of the record, or None if it is rejected.
+    """
+    if not isinstance(record, dict):
+        errors.append(f"{path}: expected an object, got {type(record).__name__}; rejected")
+        return None
+    clean = dict(record)
+    for field, prop in schema['properties'].items():
+        value = record.get(field)
+        if prop['type'] == 'ARRAY':
+            if value is None:
+                continue
+            if not isinstance(value, list):
+                errors.append(f"{path}.{field}: expected a list; ignored")
+                clean[field] = []
+                continue
+            items = (validate_record(item, prop['items'], f"{path}.{field}[{i}]", errors) for i, item in enumerate(value))
+            clean[field] = [item for item in items if item is not None]
+            continue
+        ok, value = _coerce(value, prop['type'])
+        if field in schema['required'] and (not ok or value is None or (isinstance(value, str) and not value.strip())):
+            errors.append(f"{path}: required field '{field}' is missing or invalid ({record.get(field)!r}); rejected")
+            return None
+        if not ok:
+            errors.append(f"{path}.{field}: expected {prop['type'].lower()}, got {record.get(field)!r}; set to null")
+        if field in record:
+            clean[field] = value
+    return clean
+
+
+def validate_response(data, schema: dict, errors: list[str]) -> dict:
+    """
+    Validates a parsed ingest response section by section (see
+    validate_record). Missing or non-list sections count as empty.
+
+    Returns:
+        dict: The response with only the valid (cleaned) records.
+    """
+    if not isinstance(data, dict):
+        errors.append(f"response: expected an object, got {type(data).__name__}; rejected")
+        return {section: [] for section in schema['properties']}
+    clean = dict(data)
+    for section, prop in schema['properties'].items():
+        items = data.get(section)
+        if items is None:
+            clean[section] = []
+            continue
+        if not isinstance(items, list):
+            errors.append(f"{section}: expected a list; ignored")
+            clean[section] = []
+            continue
+        records = (validate_record(item, prop['items'], f"{section}[{i}]", errors) for i, item in enumerate(items))
+        clean[section] = [record for record in records if record is not None]
+    return clean
+
+
+def validate_records(records, schema: dict, errors: list[str]):
+    """
+    Validates (section, record) pairs as they arrive (e.g. from
+    create_database.iter_json_records), yielding only the valid ones.
+    """
+    counts = {}
+    for section, record in records:
+        prop = schema['properties'].get(section)
+        if prop is None:
+            yield section, record
+            continue
+        index = counts[section] = counts.get(section, -1) + 1
+        record = validate_record(record, prop['items'], f"{section}[{index}]", errors)
+        if record is not None:
+            yield section, record
+
+
+def format_validation_errors(errors: list[str], limit: int = MAX_REPORTED_ERRORS) -> str:
+    """The first limit problems, one per line, and how many more there were."""
+    lines = errors[:limit]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more")
+    return '\n'.join(f"  - {line}" for line in lines)
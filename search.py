@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+search.py
+
+Ranked full-text search over stored mistakes (description, problem
+formulation, details) and subtopic source locations (keywords, location
+detail), using the FTS5 indexes created by schema migration 5. Callers
+migrate the database once beforehand (initialize_database_schema); the
+command line does so at startup.
+
+Usage: python search.py "chain rule" [--db database.db] [--limit 20] [--json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import sys
+
+from create_database import initialize_database_schema
+from db_connection import get_connection
+
+# --- Configuration ---
+DEFAULT_DB_FILE = 'database.db'
+DEFAULT_LIMIT = 20
+SNIPPET_TOKENS = 12 # Words of context around the matches in each snippet
+# bm25 column weights: a match in the description/keywords counts more than
+# one in the longer formulation/details text
+MISTAKE_WEIGHTS = (2.0, 1.0, 0.5) # mistake_description, problem_formulation, mistake_details
+LOCATION_WEIGHTS = (2.0, 1.0) # keywords, location_detail
+
+SQL_SEARCH_MISTAKES = f"""
+    SELECT M.mistake_id, S.filename, S.filepath, M.page_number, M.location_detail,
+           T.topic_name, M.mistake_description, M.problem_formulation,
+           snippet(Mistakes_FTS, -1, '[', ']', '...', {SNIPPET_TOKENS}) AS snippet,
+           bm25(Mistakes_FTS, {', '.join(map(str, MISTAKE_WEIGHTS))}) AS score
+    FROM Mistakes_FTS
+    JOIN Mistakes M ON M.mistake_id = Mistakes_FTS.rowid
+    JOIN Sources S ON S.source_id = M.source_id
+    LEFT JOIN Topics T ON T.topic_id = M.topic_id
+    WHERE Mistakes_FTS MATCH ?
+    ORDER BY score
+    LIMIT ?
+"""
+
+SQL_SEARCH_LOCATIONS = f"""
+    SELECT L.subtopic_location_id, S.filename, S.filepath, L.page_number, L.location_detail,
+           T.topic_name, ST.subtopic_name, L.keywords,
+           snippet(Subtopic_Locations_FTS, -1, '[', ']', '...', {SNIPPET_TOKENS}) AS snippet,
+           bm25(Subtopic_Locations_FTS, {', '.join(map(str, LOCATION_WEIGHTS))}) AS score
+    FROM Subtopic_Locations_FTS
+    JOIN Subtopic_Source_Locations L ON L.subtopic_location_id = Subtopic_Locations_FTS.rowid
+    JOIN Sources S ON S.source_id = L.source_id
+    JOIN Subtopics ST ON ST.subtopic_id = L.subtopic_id
+    LEFT JOIN Topics T ON T.topic_id = ST.topic_id
+    WHERE Subtopic_Locations_FTS MATCH ?
+    ORDER BY score
+    LIMIT ?
+"""
+
+# Topics with mistakes matching a query, best match first
+SQL_SEARCH_TOPICS = """
+    SELECT T.topic_name
+    FROM (SELECT M.topic_id, Mistakes_FTS.rank AS score
+          FROM Mistakes_FTS
+          JOIN Mistakes M ON M.mistake_id = Mistakes_FTS.rowid
+          WHERE Mistakes_FTS MATCH ?) H
+    JOIN Topics T ON T.topic_id = H.topic_id
+    GROUP BY T.topic_id
+    ORDER BY MIN(H.score), T.topic_name
+    LIMIT ?
+"""
+
+
+def to_fts_query(text: str, prefix: bool = False) -> str:
+    """
+    Turns free text into an FTS5 query matching rows that contain every
+    word, so user input never hits FTS5 query syntax errors. Text in double
+    quotes is kept together as a phrase.
+
+    Args:
+        text (str): The user's search text, e.g. 'chain rule "sign error"'.
+        prefix (bool): Also match words starting with the last word (for
+            search-as-you-type).
+
+    Returns:
+        str: The FTS5 query, or '' if the text holds no words.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\w+)', text):
+        words = re.findall(r'\w+', phrase) if phrase else [word]
+        if words:
+            terms.append('"' + ' '.join(words) + '"')
+    if prefix and terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _run_search(db_filepath, sql, query, limit, prefix):
+    fts_query = to_fts_query(query, prefix)
+    if not fts_query:
+        return []
+    conn = get_connection(db_filepath)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row # Per cursor: the connection is shared
+    return cursor.execute(sql, (fts_query, -1 if limit is None else limit)).fetchall()
+
+
+def search_mistakes(db_filepath: str, query: str, limit: int | None = DEFAULT_LIMIT,
+                    prefix: bool = False) -> list[dict] | None:
+    """
+    Finds mistakes whose description, problem formulation or details match
+    query, best match first. limit=None returns every match.
+
+    Returns:
+        list[dict] | None: Hits with kind 'mistake', mistake_id, filename,
+            filepath, page_number, location_detail, topic, description,
+            problem_formulation, snippet (matches in [brackets]) and score
+            (bm25; lower is better). None if the database query failed.
+    """
+    try:
+        rows = _run_search(db_filepath, SQL_SEARCH_MISTAKES, query, limit, prefix)
+    except sqlite3.Error as e:
+        print(f"Error: Mistake search failed. SQLite error: {e}", file=sys.stderr)
+        return None
+    return [{'kind': 'mistake', 'mistake_id': r['mistake_id'], 'filename': r['filename'],
+             'filepath': r['filepath'], 'page_number': r['page_number'],
+             'location_detail': r['location_detail'], 'topic': r['topic_name'],
+             'description': r['mistake_description'], 'problem_formulation': r['problem_formulation'],
+             'snippet': r['snippet'], 'score': r['score']}
+            for r in rows]
+
+
+def search_locations(db_filepath: str, query: str, limit: int | None = DEFAULT_LIMIT,
+                     prefix: bool = False) -> list[dict] | None:
+    """
+    Finds subtopic source locations whose keywords or location detail match
+    query, best match first.
+
+    Returns:
+        list[dict] | None: Hits with kind 'location', location_id, filename,
+            filepath, page_number, location_detail, topic, subtopic,
+            keywords, snippet and score. None if the database query failed.
+    """
+    try:
+        rows = _run_search(db_filepath, SQL_SEARCH_LOCATIONS, query, limit, prefix)
+    except sqlite3.Error as e:
+        print(f"Error: Location search failed. SQLite error: {e}", file=sys.stderr)
+        return None
+    return [{'kind': 'location', 'location_id': r['subtopic_location_id'], 'filename': r['filename'],
+             'filepath': r['filepath'], 'page_number': r['page_number'],
+             'location_detail': r['location_detail'], 'topic': r['topic_name'],
+             'subtopic': r['subtopic_name'], 'keywords': r['keywords'],
+             'snippet': r['snippet'], 'score': r['score']}
+            for r in rows]
+
+
+def search(db_filepath: str, query: str, limit: int = DEFAULT_LIMIT, prefix: bool = False) -> list[dict] | None:
+    """
+    Searches mistakes and subtopic source locations together.
+
+    Returns:
+        list[dict] | None: Up to limit hits of both kinds (see search_mistakes
+            and search_locations) ordered by score, or None on a database error.
+    """
+    mistakes = search_mistakes(db_filepath, query, limit, prefix)
+    locations = search_locations(db_filepath, query, limit, prefix)
+    if mistakes is None or locations is None:
+        return None
+    return sorted(mistakes + locations, key=lambda hit: hit['score'])[:limit]
+
+
+def search_topics_with_mistakes(db_filepath: str, query: str, prefix: bool = False) -> list[str] | None:
+    """
+    Topic names having at least one mistake that matches query, best match
+    first (like find_mistakes_topics.get_topics_with_mistakes, filtered).
+    """
+    try:
+        return [r['topic_name'] for r in _run_search(db_filepath, SQL_SEARCH_TOPICS, query, None, prefix)]
+    except sqlite3.Error as e:
+        print(f"Error: Topic search failed. SQLite error: {e}", file=sys.stderr)
+        return None
+
+
+def main():
+    p = argparse.ArgumentParser(description="Full-text search over stored mistakes and source keywords.")
+    p.add_argument("query", help='Words to find (all must match); "quoted words" match as a phrase')
+    p.add_argument("--db", "-d", default=DEFAULT_DB_FILE, help="Path to the SQLite database file")
+    p.add_argument("--limit", "-n", type=int, default=DEFAULT_LIMIT, help="Maximum number of hits")
+    p.add_argument("--kind", choices=("all", "mistakes", "locations"), default="all")
+    p.add_argument("--json", "-j", action="store_true", help="Print the hits as JSON")
+    args = p.parse_args()
+
+    # Older databases get the FTS indexes first; the log goes to stderr to keep --json output clean
+    if os.path.exists(args.db):
+        with contextlib.redirect_stdout(sys.stderr):
+            if not initialize_database_schema(args.db):
+                sys.exit(1)
+
+    if args.kind == "mistakes":
+        hits = search_mistakes(args.db, args.query, args.limit)
+    elif args.kind == "locations":
+        hits = search_locations(args.db, args.query, args.limit)
+    else:
+        hits = search(args.db, args.query, args.limit)
+    if hits is None:
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(hits, indent=2, default=str))
+        return
+    if not hits:
+        print(f"No matches for '{args.query}'.")
+    for hit in hits:
+        where = f"{hit['filename']}, page {hit['page_number']}" if hit['page_number'] is not None else hit['filename']
+        label = hit['topic'] if hit['kind'] == 'mistake' else f"{hit['topic']} / {hit['subtopic']}"
+        print(f"[{hit['kind']}] {where} ({label})")
+        print(f"  {hit['snippet']}")
+        print("---")
+
+
+if __name__ == "__main__":
+    main()
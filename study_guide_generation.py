@@ -1,7 +1,19 @@
-import google.generativeai as genai
 import os
 import sqlite3
 import re # Import regular expressions for cleaning filename
+import tempfile
+import threading
+import time
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from db_connection import get_connection
+from create_database import initialize_database_schema
+from guide_cache import GuideCache
+from llm_client import LLMClient, default_client, format_client_stats
+from page_slicing import get_topic_pages, slice_pdf, format_page_ranges, PAGE_SLICING_AVAILABLE
+from text_extraction import extract_documents, extract_pages, can_send_as_text, format_document_text
+from find_mistakes_topics import get_topics_with_mistakes, export_questions_for_topic_to_txt
+import timing
 
 # Import or define your API key handling (e.g., from config.py)
 # Ensure config.py exists and contains your API key
@@ -13,12 +25,38 @@ except ImportError:
     # For now, we'll set api_key to None and let the genai configure call fail later
     config = type('obj', (object,), {'api_key': None})()
 
+# Bump whenever the prompt in step 7 changes, so cached guides are regenerated
+PROMPT_TEMPLATE_VERSION = "1"
+
+# Shared cache of generated guides (see guide_cache.GuideCache)
+guide_cache = GuideCache()
+
+QUESTIONS_FILENAME = 'questions_for_study.txt' # Name of each job's exported question file
+
+# Files linked to a topic, from the trigger-maintained Topic_Sources index
+# (topic/subtopic locations, mistakes and good answers of the topic)
+SQL_TOPIC_SOURCE_FILES = """
+    SELECT s.filepath, s.filename
+    FROM Topic_Sources ts
+    JOIN Sources s ON s.source_id = ts.source_id
+    WHERE ts.topic_id = ?
+"""
+DEFAULT_GUIDE_WORKERS = 3 # Guides generated at the same time in batch mode
+
 
 def create_study_guide_md(topic_name: str,
                           question_txt_filepath: str,
                           db_filepath: str = 'database.db',
                           output_dir: str = 'study_guides',
-                          model_name: str = "gemini-2.5-flash-preview-04-17") -> str | None:
+                          model_name: str = "gemini-2.5-flash-preview-04-17",
+                          force_regenerate: bool = False,
+                          cache: GuideCache | None = guide_cache,
+                          page_neighbourhood: int | None = None,
+                          stream: bool = False,
+                          progress_callback: Callable[[int, int, float], None] | None = None,
+                          cancel_event: threading.Event | None = None,
+                          client: LLMClient = default_client,
+                          send_text: bool = False) -> str | None:
     """
     Generates a Markdown study guide for a topic using Gemini.
 
@@ -27,29 +65,69 @@ def create_study_guide_md(topic_name: str,
     question text file, asks Gemini to generate a cited Markdown study guide,
     and saves it to a file.
 
+    If a guide was already generated for the same topic, question set,
+    source file contents, prompt template version and model, the existing
+    Markdown path is returned without calling Gemini.
+
+    With page_neighbourhood set, PDF sources with recorded page numbers for
+    the topic are replaced by excerpts holding only those pages (plus
+    page_neighbourhood pages on either side), and the prompt tells Gemini
+    which original pages each excerpt contains. Requires pypdf; without it
+    the full files are uploaded.
+
+    With stream=True the guide is requested as a stream and every chunk is
+    appended to a temporary file next to the output Markdown file as it
+    arrives, so the file (and progress_callback) show content within
+    seconds instead of after the whole guide is generated. The temporary
+    file replaces the guide only once the stream has finished. Setting
+    cancel_event stops a streaming generation after the current chunk; the
+    partial file is discarded, the previous guide (if any) is left as it
+    was, and None is returned.
+
+    With send_text=True, files whose extracted text can stand in for them
+    (text files and PDFs with a text layer on every page, see
+    text_extraction) are sent inline as text instead of being uploaded;
+    with page_neighbourhood only the excerpt pages are sent. Scanned PDFs
+    are still uploaded.
+
+    The database must already be at the current schema version (see
+    create_database.initialize_database_schema); callers migrate it once
+    up front rather than on every call.
+
     Args:
         topic_name (str): The name of the topic.
         question_txt_filepath (str): The path to the text file containing questions.
         db_filepath (str): Path to the SQLite database file.
         output_dir (str): Directory where the generated Markdown file will be saved.
         model_name (str): The Gemini model to use.
+        force_regenerate (bool): Skip the cache lookup and always call Gemini.
+        cache (GuideCache | None): Guide cache to use; None disables caching.
+        page_neighbourhood (int | None): Upload only the recorded pages of each
+                    PDF source plus this many pages around them; None uploads
+                    whole files.
+        stream (bool): Stream the response and write it incrementally.
+        progress_callback (Callable | None): Called after every streamed chunk
+                    with (chunks received, bytes received, seconds elapsed).
+        cancel_event (threading.Event | None): Set to cancel a streaming
+                    generation part-way through.
+        client (LLMClient): Rate-limited, retrying client used for all API calls.
+        send_text (bool): Send extracted text instead of uploading when possible.
 
     Returns:
         str | None: The full path to the saved Markdown file if successful,
                     otherwise None.
     """
-    conn = None
     uploaded_files_info = []
     output_filepath = None # Path to the saved markdown file
 
     try:
         # --- 1. Configure Gemini API ---
         api_key = config.api_key # Load your API key from config.py
-        if not api_key:
+        if not api_key and client.requires_api_key:
              print("Error: Gemini API Key not found in config.py or config object.")
              return None
-        genai.configure(api_key=api_key)
-        print(f"Configured Gemini API with model: {model_name}")
+        client.configure(api_key=api_key)
+        print(f"Configured model backend '{client.backend.name}' with model: {model_name}")
 
 
         # --- 2. Validate Inputs & Create Output Directory ---
@@ -65,14 +143,13 @@ def create_study_guide_md(topic_name: str,
 
 
         # --- 3. Connect to Database & Find Topic ID ---
-        conn = sqlite3.connect(db_filepath)
+        conn = get_connection(db_filepath)
         cursor = conn.cursor()
         print(f"Connected to database: {db_filepath}")
         cursor.execute("SELECT topic_id FROM Topics WHERE topic_name = ?", (topic_name,))
         topic_result = cursor.fetchone()
         if not topic_result:
             print(f"Error: Topic '{topic_name}' not found in the database.")
-            conn.close()
             return None
         topic_id = topic_result[0]
         print(f"Found Topic ID for '{topic_name}': {topic_id}")
@@ -80,19 +157,11 @@ def create_study_guide_md(topic_name: str,
 
         # --- 4. Find Relevant Files from DB (Excluding the question file itself if listed) ---
         relevant_files_from_db = set()
-        # Query to find linked files (using filepath directly)
-        cursor.execute("""
-            SELECT DISTINCT s.filepath, s.filename
-            FROM Sources s
-            LEFT JOIN Topic_Source_Locations tsl ON s.source_id = tsl.source_id AND tsl.topic_id = ?
-            LEFT JOIN Subtopic_Source_Locations ssl ON s.source_id = ssl.source_id
-            LEFT JOIN Subtopics sub ON ssl.subtopic_id = sub.subtopic_id AND sub.topic_id = ?
-            LEFT JOIN Mistakes m ON s.source_id = m.source_id AND (m.topic_id = ? OR m.subtopic_id IN (SELECT subtopic_id FROM Subtopics WHERE topic_id = ?))
-            LEFT JOIN Good_Answers ga ON s.source_id = ga.source_id AND (ga.topic_id = ? OR ga.subtopic_id IN (SELECT subtopic_id FROM Subtopics WHERE topic_id = ?))
-            WHERE tsl.topic_id = ? OR sub.topic_id = ? OR m.topic_id = ? OR ga.topic_id = ?
-        """, (topic_id, topic_id, topic_id, topic_id, topic_id, topic_id, topic_id, topic_id, topic_id, topic_id)) # Ensure all placeholders are filled
-
-        for row in cursor.fetchall():
+        with timing.span('query', pipeline='guide', topic=topic_name):
+            cursor.execute(SQL_TOPIC_SOURCE_FILES, (topic_id,))
+            source_rows = cursor.fetchall()
+
+        for row in source_rows:
             fpath = row[0] # Get the value from the 'filepath' column
             if fpath: # Check if filepath column value is not None or empty
                 # Assume fpath directly contains the full path including the filename
@@ -133,32 +202,88 @@ def create_study_guide_md(topic_name: str,
 
         if not files_to_upload_paths_ordered:
              print(f"Error: No valid files to process for topic '{topic_name}'. Cannot generate guide.")
-             if conn: conn.close() # Ensure connection is closed before returning
              return None
 
+        # --- 5a. Optionally Replace PDF Sources With Page Excerpts ---
+        upload_paths = {p: p for p in files_to_upload_paths_ordered} # Original path -> path actually uploaded
+        excerpt_pages = {} # Original path -> original page numbers kept in its excerpt
+        if page_neighbourhood is not None:
+            if not PAGE_SLICING_AVAILABLE:
+                print("Warning: pypdf is not installed; uploading full source files instead of page excerpts.")
+            else:
+                topic_pages = get_topic_pages(conn, topic_id)
+                for f_path in files_to_upload_paths_ordered:
+                    if f_path == question_file_normalized or not f_path.lower().endswith('.pdf') or f_path not in topic_pages:
+                        continue
+                    sliced = slice_pdf(f_path, topic_pages[f_path], page_neighbourhood)
+                    if sliced:
+                        upload_paths[f_path], excerpt_pages[f_path] = sliced
+                        print(f"  - Using excerpt of '{f_path}': pages {format_page_ranges(excerpt_pages[f_path])}")
+
+        # --- 5a'. Optionally Send Extracted Text Instead of Uploading ---
+        inline_pages = {} # Original path -> page texts sent inline instead of an upload
+        if send_text:
+            source_pages = extract_documents(db_filepath, [p for p in files_to_upload_paths_ordered
+                                                           if p != question_file_normalized])
+            # The question file is a per-job temporary file, so it is not cached
+            source_pages[question_file_normalized] = extract_pages(question_file_normalized)
+            for f_path, pages in source_pages.items():
+                if can_send_as_text(f_path, pages):
+                    inline_pages[f_path] = pages
+                    print(f"  - Sending text of '{f_path}' instead of uploading it")
+
+        # --- 5b. Return Cached Guide If Inputs Are Unchanged ---
+        cache_key = None
+        if cache is not None:
+            source_paths = [upload_paths[p] for p in files_to_upload_paths_ordered if p != question_file_normalized]
+            cache_options = {}
+            if excerpt_pages:
+                cache_options['excerpt_pages'] = {os.path.basename(p): pages for p, pages in excerpt_pages.items()}
+            if inline_pages:
+                cache_options['send_text'] = sorted(os.path.basename(p) for p in inline_pages)
+            cache_options = cache_options or None
+            cache_key = cache.make_key(topic_name, question_file_normalized, source_paths,
+                                       PROMPT_TEMPLATE_VERSION, client.cache_identity(model_name), cache_options)
+            if not force_regenerate:
+                upload_bytes = sum(os.path.getsize(upload_paths[p]) for p in files_to_upload_paths_ordered)
+                cached_path = cache.get(cache_key, upload_bytes)
+                if cached_path:
+                    print(f"Study guide cache hit for '{topic_name}': {cached_path}")
+                    return cached_path
+
 
         # --- 6. Upload Files to Gemini ---
         gemini_files = [] # List to hold file objects for the API call
+        text_parts = [] # Extracted text sent in place of uploads
         file_metadata_for_prompt = [] # List to hold info for the prompt text
         print("\nUploading files to Gemini:")
         for file_path in files_to_upload_paths_ordered: # Iterate in defined order
+            if file_path in inline_pages:
+                file_basename = os.path.basename(file_path)
+                text_parts.append(format_document_text(file_basename, inline_pages[file_path],
+                                                       excerpt_pages.get(file_path)))
+                file_metadata_for_prompt.append({'filename': file_basename, 'uri': None,
+                                                 'pages': excerpt_pages.get(file_path), 'inline': True})
+                continue
             print(f"  Uploading '{file_path}'...")
             try:
                 # Use os.path.basename to get the display name from the full path
                 file_basename = os.path.basename(file_path)
-                file_obj = genai.upload_file(path=file_path, display_name=file_basename)
+                with timing.span('upload', pipeline='guide', topic=topic_name, file=upload_paths[file_path],
+                                 bytes=os.path.getsize(upload_paths[file_path])):
+                    file_obj = client.upload_file(path=upload_paths[file_path], display_name=file_basename)
                 gemini_files.append(file_obj) # Add file object for API
                 uploaded_files_info.append({'name': file_obj.name, 'path': file_path}) # For cleanup
                 # Store the basename derived from the full path for the prompt list
-                file_metadata_for_prompt.append({'filename': file_basename, 'uri': file_obj.uri})
+                file_metadata_for_prompt.append({'filename': file_basename, 'uri': file_obj.uri,
+                                                 'pages': excerpt_pages.get(file_path)})
                 print(f"    Uploaded successfully: {file_obj.uri} (Filename: {file_basename})")
             except Exception as upload_err:
                 print(f"    Warning: Failed to upload file '{file_path}'. Error: {upload_err}. Skipping this file.")
                 # Crucially, don't add metadata for failed uploads to file_metadata_for_prompt
 
-        if not gemini_files:
+        if not gemini_files and not text_parts:
              print("Error: Failed to upload any files to Gemini. Cannot generate guide.")
-             if conn: conn.close() # Ensure connection is closed before returning
              # Clean up any files that *were* successfully uploaded before this check failed
              # (Cleanup logic is in the finally block, which will run)
              return None
@@ -169,7 +294,11 @@ def create_study_guide_md(topic_name: str,
         question_file_basename = os.path.basename(question_file_normalized)
         # Use the filenames derived in step 6 (which respected the order)
         # Ensure only metadata from successfully uploaded files is included
-        file_list_str = "\n".join([f"- {meta['filename']}" for meta in file_metadata_for_prompt])
+        file_list_str = "\n".join([
+            f"- {meta['filename']}"
+            + (f" (excerpt containing only original pages {format_page_ranges(meta['pages'])}, in that order)" if meta['pages'] else "")
+            + (" (provided as extracted text after this prompt)" if meta.get('inline') else "")
+            for meta in file_metadata_for_prompt])
 
         # Updated prompt incorporating user requests
         prompt = f"""
@@ -191,20 +320,44 @@ def create_study_guide_md(topic_name: str,
         Structure the guide logically using **Markdown formatting** (headings, lists, bold text, etc.). Ensure the entire output is valid Markdown.
         """
         # <<< MODIFICATION END >>>
+        if text_parts:
+            prompt += """
+        Files provided as extracted text start with a "===== Document: <filename> =====" line. PDF pages are marked "----- <filename>, Page N -----" with their original page numbers; text file rows start with their row number.
+        """
+        if any(meta['pages'] for meta in file_metadata_for_prompt):
+            prompt += """
+        Some context files are page excerpts of longer documents, as noted in the file list above. When citing them, use the ORIGINAL page numbers from the file list (e.g. the third page of an excerpt containing pages 12-17 is page 14), not the page position within the excerpt.
+        """
 
         print("\nConstructed Prompt:\n" + "="*20 + f"\n{prompt}\n" + "="*20) # Print the prompt for debugging
 
         print("\nGenerating Markdown study guide (this may take some time)...")
 
 
+        # Clean topic name for filename regardless of API success, to save error messages too
+        safe_topic_name = re.sub(r'[^\w\-_\. ]', '_', topic_name) # Replace invalid chars
+        output_filename = f"Study_Guide_{safe_topic_name}.md"
+        output_filepath = os.path.join(output_dir, output_filename)
+
+
         # --- 8. Call Gemini API ---
-        model = genai.GenerativeModel(model_name=model_name)
-        # Increase timeout if needed for complex generation
-        request_options = genai.types.RequestOptions(timeout=600) # 10 minutes
+        streamed_chunks = None
+        request_started = time.perf_counter()
         try:
-            response = model.generate_content(contents=[prompt] + gemini_files, # Pass the prompt and the uploaded file objects
-                                              request_options=request_options
-                                              )
+            with timing.span('generate', pipeline='guide', topic=topic_name, model=model_name,
+                             files=len(gemini_files), text_files=len(text_parts), stream=stream) as generate_span:
+                response = client.generate_content(model_name,
+                                                   contents=[prompt] + gemini_files + text_parts, # Pass the prompt, the uploaded file objects and any inline text
+                                                   timeout=600, # 10 minutes; increase if needed for complex generation
+                                                   stream=stream
+                                                   )
+                if stream:
+                    streamed_chunks = _stream_response_to_file(response, output_filepath, request_started,
+                                                               progress_callback, cancel_event)
+                    if streamed_chunks is None:
+                        generate_span.set(ok=False, cancelled=True)
+                        print(f"Study guide generation for '{topic_name}' was cancelled; {output_filepath} was left unchanged")
+                        return None
         except Exception as api_err:
             print(f"Error calling Gemini API: {api_err}")
             # Attempt to get feedback even on error
@@ -214,37 +367,45 @@ def create_study_guide_md(topic_name: str,
             return None # Exit after API error
 
         # --- 9. Process Response and Save Markdown ---
-        study_guide_markdown = "" # Initialize
-        try:
-            if not response.parts:
-                 print("Warning: Received empty response parts from API. Check prompt feedback.")
-                 study_guide_markdown = f"Error: Received no content parts from the API for topic '{topic_name}'."
+        with timing.span('cleanup', pipeline='guide', topic=topic_name) as cleanup_span:
+            study_guide_markdown = "" # Initialize
+            generation_ok = False # Only real guides (not error messages) are cached
+            try:
+                if streamed_chunks:
+                    # The streamed text has already been moved into place
+                    study_guide_markdown = "".join(streamed_chunks)
+                    generation_ok = True
+                    print("Study guide Markdown streamed successfully.")
+                elif not response.parts:
+                     print("Warning: Received empty response parts from API. Check prompt feedback.")
+                     study_guide_markdown = f"Error: Received no content parts from the API for topic '{topic_name}'."
+                     # Try to print feedback if available
+                     if hasattr(response, 'prompt_feedback'): print(f"Prompt Feedback: {response.prompt_feedback}")
+                else:
+                    # Assuming the response text is in the first part if parts exist
+                    study_guide_markdown = response.text
+                    generation_ok = True
+                    print("Study guide Markdown generated successfully.")
+
+            except Exception as resp_err:
+                 print(f"Error processing API response: {resp_err}")
+                 study_guide_markdown = f"Error processing API response for topic '{topic_name}'. Details: {resp_err}"
                  # Try to print feedback if available
                  if hasattr(response, 'prompt_feedback'): print(f"Prompt Feedback: {response.prompt_feedback}")
-            else:
-                # Assuming the response text is in the first part if parts exist
-                study_guide_markdown = response.text
-                print("Study guide Markdown generated successfully.")
 
-        except Exception as resp_err:
-             print(f"Error processing API response: {resp_err}")
-             study_guide_markdown = f"Error processing API response for topic '{topic_name}'. Details: {resp_err}"
-             # Try to print feedback if available
-             if hasattr(response, 'prompt_feedback'): print(f"Prompt Feedback: {response.prompt_feedback}")
-
-
-        # Clean topic name for filename regardless of API success, to save error messages too
-        safe_topic_name = re.sub(r'[^\w\-_\. ]', '_', topic_name) # Replace invalid chars
-        output_filename = f"Study_Guide_{safe_topic_name}.md"
-        output_filepath = os.path.join(output_dir, output_filename)
 
-        try:
-            with open(output_filepath, 'w', encoding='utf-8') as f:
-                f.write(study_guide_markdown) # Write content or error message
-            print(f"Successfully saved output Markdown to: {output_filepath}")
-        except IOError as e:
-            print(f"Error: Failed to save output Markdown to file '{output_filepath}'. Error: {e}")
-            output_filepath = None # Indicate failure to save
+            try:
+                if not streamed_chunks:
+                    with open(output_filepath, 'w', encoding='utf-8') as f:
+                        f.write(study_guide_markdown) # Write content or error message
+                print(f"Successfully saved output Markdown to: {output_filepath}")
+                if generation_ok and cache_key is not None:
+                    cache.put(cache_key, topic_name, output_filepath)
+                cleanup_span.set(ok=generation_ok, bytes=len(study_guide_markdown.encode('utf-8')))
+            except IOError as e:
+                print(f"Error: Failed to save output Markdown to file '{output_filepath}'. Error: {e}")
+                output_filepath = None # Indicate failure to save
+                cleanup_span.set(ok=False)
 
         # Check finish reason if response object exists
         if 'response' in locals() and hasattr(response, 'candidates') and response.candidates:
@@ -274,18 +435,190 @@ def create_study_guide_md(topic_name: str,
 
     finally:
         # --- 10. Clean Up ---
-        if conn:
-            conn.close()
-            print("Database connection closed.")
-
         if uploaded_files_info:
             print("\nCleaning up uploaded files on Google Cloud...")
             for file_info in uploaded_files_info:
                 try:
                     print(f"  Deleting uploaded file: {file_info['name']} (from path: {file_info['path']})")
-                    genai.delete_file(file_info['name']) # Use the internal API name for deletion
+                    with timing.span('remote_delete', pipeline='guide', topic=topic_name, file=file_info['path']):
+                        client.delete_file(file_info['name']) # Use the internal API name for deletion
                 except Exception as delete_err:
                     # Log warning but continue cleanup
                     print(f"    Warning: Error deleting file {file_info['name']}: {delete_err}")
         print("-" * 30)
 
+
+def _stream_response_to_file(response,
+                             output_filepath: str,
+                             started: float,
+                             progress_callback: Callable[[int, int, float], None] | None = None,
+                             cancel_event: threading.Event | None = None) -> list[str] | None:
+    """
+    Consumes a streaming Gemini response, appending every chunk's text to
+    a temporary file in output_filepath's directory as soon as it arrives.
+    The temporary file replaces output_filepath only once the stream has
+    finished, so a cancelled or failed stream never overwrites an existing
+    guide with partial text. Elapsed times are measured from started (a
+    time.perf_counter() value taken when the request was sent).
+
+    Returns:
+        list[str] | None: The received text chunks, or None if cancel_event
+                          was set before the stream finished.
+    """
+    chunks = []
+    bytes_received = 0
+    fd, partial_filepath = tempfile.mkstemp(prefix=os.path.basename(output_filepath) + '.',
+                                            suffix='.part', dir=os.path.dirname(output_filepath) or '.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for chunk in response:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if not chunk.parts: # e.g. a chunk carrying only a finish reason or safety feedback
+                    continue
+                text = chunk.text
+                f.write(text)
+                f.flush()
+                chunks.append(text)
+                bytes_received += len(text.encode('utf-8'))
+                elapsed = time.perf_counter() - started
+                if len(chunks) == 1:
+                    print(f"First study guide content received after {elapsed:.1f}s.")
+                if progress_callback is not None:
+                    progress_callback(len(chunks), bytes_received, elapsed)
+        if chunks:
+            os.replace(partial_filepath, output_filepath)
+        return chunks
+    finally:
+        if os.path.exists(partial_filepath): # Cancelled or failed: discard the partial text
+            os.remove(partial_filepath)
+
+
+def generate_guide_for_topic(topic_name: str,
+                             db_filepath: str = 'database.db',
+                             output_dir: str = 'study_guides',
+                             force_regenerate: bool = False,
+                             page_neighbourhood: int | None = None,
+                             stream: bool = False,
+                             progress_callback: Callable[[int, int, float], None] | None = None,
+                             cancel_event: threading.Event | None = None,
+                             send_text: bool = False) -> str:
+    """
+    Exports the topic's questions to a private temporary directory and
+    generates its study guide. Every call gets its own question file, so
+    several topics can be processed at the same time. page_neighbourhood,
+    stream, progress_callback, cancel_event and send_text are passed on to
+    create_study_guide_md.
+
+    Returns:
+        str: The path of the generated (or cached) Markdown guide.
+
+    Raises:
+        ValueError: If the questions could not be exported.
+        RuntimeError: If the guide could not be generated or was cancelled.
+    """
+    with tempfile.TemporaryDirectory(prefix='study_guide_') as tmp_dir:
+        question_filepath = os.path.join(tmp_dir, QUESTIONS_FILENAME)
+        if not export_questions_for_topic_to_txt(topic_name=topic_name,
+                                                 output_filepath=question_filepath,
+                                                 db_filepath=db_filepath):
+            raise ValueError(f"Failed to export questions for topic '{topic_name}'.")
+        guide_path = create_study_guide_md(topic_name=topic_name,
+                                           question_txt_filepath=question_filepath,
+                                           db_filepath=db_filepath,
+                                           output_dir=output_dir,
+                                           force_regenerate=force_regenerate,
+                                           page_neighbourhood=page_neighbourhood,
+                                           stream=stream,
+                                           progress_callback=progress_callback,
+                                           cancel_event=cancel_event,
+                                           send_text=send_text)
+    if not guide_path:
+        if cancel_event is not None and cancel_event.is_set():
+            raise RuntimeError("Study guide generation was cancelled.")
+        raise RuntimeError("Study guide generation function returned None.")
+    return guide_path
+
+
+def generate_study_guides_batch(topic_names: list[str] | None = None,
+                                db_filepath: str = 'database.db',
+                                output_dir: str = 'study_guides',
+                                max_workers: int = DEFAULT_GUIDE_WORKERS,
+                                force_regenerate: bool = False,
+                                page_neighbourhood: int | None = None,
+                                stream: bool = False,
+                                cancel_event: threading.Event | None = None,
+                                send_text: bool = False) -> dict | None:
+    """
+    Generates study guides for many topics, up to max_workers at a time.
+
+    Args:
+        topic_names: Topics to generate guides for. Defaults to every topic
+                     returned by get_topics_with_mistakes.
+        db_filepath: Path to the SQLite database file.
+        output_dir: Directory where the generated Markdown files are saved.
+        max_workers: Maximum number of guides generated concurrently.
+        force_regenerate: Skip the guide cache for every topic.
+        page_neighbourhood: Upload page excerpts instead of whole PDFs
+                            (see create_study_guide_md).
+        stream: Stream each guide into its output file as it is generated.
+        cancel_event: Once set, guides not yet started are skipped and
+                      streaming guides stop after their current chunk.
+        send_text: Send extracted text instead of uploading text-only files.
+
+    Returns:
+        A report dict with 'results' (one dict per topic with 'topic',
+        'guide_path', 'seconds' and 'error'), 'succeeded', 'failed',
+        'wall_seconds', 'mean_seconds' and 'max_seconds', or None if the
+        database schema could not be migrated or the topic list could not
+        be loaded.
+    """
+    # Migrate once on this thread before the workers start (they all share the file)
+    if os.path.exists(db_filepath) and not initialize_database_schema(db_filepath):
+        return None
+    if topic_names is None:
+        topic_names = get_topics_with_mistakes(db_filepath)
+        if topic_names is None:
+            print("Error: Could not load topics with mistakes.")
+            return None
+    topic_names = list(dict.fromkeys(topic_names)) # Drop duplicates, keep order
+
+    def run_job(topic_name):
+        started = time.perf_counter()
+        try:
+            if cancel_event is not None and cancel_event.is_set():
+                raise RuntimeError("Study guide generation was cancelled.")
+            guide_path = generate_guide_for_topic(topic_name, db_filepath, output_dir,
+                                                  force_regenerate, page_neighbourhood,
+                                                  stream=stream, cancel_event=cancel_event,
+                                                  send_text=send_text)
+            error = None
+        except Exception as e:
+            guide_path, error = None, str(e)
+        return {'topic': topic_name, 'guide_path': guide_path,
+                'seconds': round(time.perf_counter() - started, 2), 'error': error}
+
+    print(f"Generating {len(topic_names)} study guide(s) with up to {max_workers} parallel worker(s)...")
+    batch_started = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(run_job, topic_name) for topic_name in topic_names]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = f"saved to {result['guide_path']}" if not result['error'] else f"FAILED: {result['error']}"
+            print(f"[{len(results)}/{len(topic_names)}] '{result['topic']}' {status} ({result['seconds']}s)")
+
+    durations = [r['seconds'] for r in results]
+    report = {
+        'results': sorted(results, key=lambda r: topic_names.index(r['topic'])),
+        'succeeded': sum(1 for r in results if not r['error']),
+        'failed': sum(1 for r in results if r['error']),
+        'wall_seconds': round(time.perf_counter() - batch_started, 2),
+        'mean_seconds': round(sum(durations) / len(durations), 2) if durations else 0.0,
+        'max_seconds': max(durations) if durations else 0.0,
+    }
+    print(f"Batch finished in {report['wall_seconds']}s: {report['succeeded']} succeeded, {report['failed']} failed "
+          f"(mean {report['mean_seconds']}s, max {report['max_seconds']}s per guide).")
+    print(f"API client: {format_client_stats(default_client.stats())}")
+    return report
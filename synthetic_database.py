@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+synthetic_database.py
+
+Builds a large synthetic database with the real schema for benchmarking.
+Rows are inserted directly with executemany, so the schema's triggers and
+indexes are exercised exactly as in a real ingest.
+
+Events are skewed like real study data: a few topics and sources collect
+most mistakes (Zipf-distributed popularity) and recent days are busier
+than old ones.
+"""
+
+import argparse
+import datetime
+import itertools
+import math
+import os
+import random
+import time
+
+from create_database import initialize_database_schema
+from db_connection import get_connection, close_connection
+
+INSERT_BATCH_SIZE = 50000
+
+
+def _text(rng, length):
+    """Returns filler text of roughly the given length."""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)
+
+_WORDS = ("derivative", "integral", "matrix", "vector", "gradient", "limit", "series",
+          "probability", "variance", "regression", "sign", "error", "the", "of", "and",
+          "compute", "solve", "missing", "factor", "chain", "rule", "boundary", "step")
+
+
+def _zipf_cum_weights(rng, count, exponent):
+    """
+    Cumulative weights for picking one of count items, where the item of
+    popularity rank r has weight 1 / r**exponent (0 gives uniform). Ranks are
+    shuffled so the popular items are not simply the lowest ids.
+    """
+    weights = [1 / rank ** exponent for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def create_synthetic_database(db_filepath: str,
+                              mistakes: int = 1_000_000,
+                              good_answers: int = 250_000,
+                              subjects: int = 5,
+                              topics: int = 200,
+                              sources: int = 500,
+                              subtopics_per_topic: int = 3,
+                              topic_locations: int = 20_000,
+                              subtopic_locations: int = 20_000,
+                              days: int = 365,
+                              text_length: int = 200,
+                              topic_skew: float = 1.0,
+                              source_skew: float = 0.8,
+                              recency_bias: float = 2.0,
+                              seed: int = 0) -> None:
+    """
+    Creates (or replaces) db_filepath and fills it with synthetic subjects,
+    topics, subtopics, sources, topic/subtopic source locations, mistakes and
+    good answers. Text columns hold roughly text_length characters of filler
+    so that row sizes resemble real data. Mistakes and good answers name a
+    subtopic of their topic half of the time.
+
+    Args:
+        topic_skew (float): Zipf exponent of topic popularity among events
+            (0 = uniform, 1 = the top topic gets ~1/H(topics) of all events).
+        source_skew (float): Zipf exponent of source popularity among events.
+        recency_bias (float): The newest of the `days` days is e**recency_bias
+            times as busy as the oldest (0 = uniform dates).
+        seed (int): The same arguments and seed always give the same data
+            (apart from dates, which end today).
+    """
+    if os.path.exists(db_filepath):
+        close_connection(db_filepath)
+        os.remove(db_filepath)
+    initialize_database_schema(db_filepath)
+    conn = get_connection(db_filepath)
+    cursor = conn.cursor()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    cursor.executemany("INSERT INTO Subjects (subject_name, subject_description) VALUES (?, ?)",
+                       [(f"Subject {i}", _text(rng, 60)) for i in range(subjects)])
+    cursor.executemany("INSERT INTO Topics (subject_id, topic_name, topic_description) VALUES (?, ?, ?)",
+                       [(i % subjects + 1, f"Topic {i}", _text(rng, 80)) for i in range(topics)])
+    cursor.executemany("INSERT INTO Sources (filename, filepath) VALUES (?, ?)",
+                       [(f"doc_{i}.pdf", f"data/doc_{i}.pdf") for i in range(sources)])
+    cursor.executemany("INSERT INTO Subtopics (topic_id, subtopic_name, subtopic_description) VALUES (?, ?, ?)",
+                       [(t + 1, f"Subtopic {t}.{j}", _text(rng, 60))
+                        for t in range(topics) for j in range(subtopics_per_topic)])
+    subtopic_count = topics * subtopics_per_topic
+    cursor.executemany("""
+        INSERT OR IGNORE INTO Topic_Source_Locations (topic_id, source_id, page_number, location_description)
+        VALUES (?, ?, ?, ?)
+    """, [(rng.randint(1, topics), rng.randint(1, sources), rng.randint(1, 40), _text(rng, 40))
+          for _ in range(topic_locations)])
+    if subtopic_count:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO Subtopic_Source_Locations (subtopic_id, source_id, page_number, location_detail, keywords)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(rng.randint(1, subtopic_count), rng.randint(1, sources), rng.randint(1, 40), _text(rng, 40), _text(rng, 30))
+              for _ in range(subtopic_locations)])
+
+    def subtopic_of(topic_id):
+        """A random subtopic of topic_id half of the time, otherwise None."""
+        if not subtopics_per_topic or rng.random() < 0.5:
+            return None
+        return (topic_id - 1) * subtopics_per_topic + rng.randint(1, subtopics_per_topic)
+
+    # --- Skewed popularity and date spread ---
+    topic_ids = range(1, topics + 1)
+    source_ids = range(1, sources + 1)
+    topic_weights = _zipf_cum_weights(rng, topics, topic_skew)
+    source_weights = _zipf_cum_weights(rng, sources, source_skew)
+    first_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+    dates = [(first_day + datetime.timedelta(days=d)).isoformat() for d in range(days)]
+    date_weights = list(itertools.accumulate(
+        math.exp(recency_bias * d / max(1, days - 1)) for d in range(days)))
+
+    def event_rows(count, with_details):
+        # Topics, sources and dates are drawn a batch at a time; rng.choices
+        # with cumulative weights is much faster than one weighted draw per row
+        for offset in range(0, count, INSERT_BATCH_SIZE):
+            size = min(INSERT_BATCH_SIZE, count - offset)
+            batch = zip(rng.choices(topic_ids, cum_weights=topic_weights, k=size),
+                        rng.choices(source_ids, cum_weights=source_weights, k=size),
+                        rng.choices(dates, cum_weights=date_weights, k=size))
+            for topic_id, source_id, date in batch:
+                row = [source_id, topic_id, subtopic_of(topic_id),
+                       _text(rng, text_length), _text(rng, text_length)]
+                if with_details:
+                    row.append(rng.choice(("Calculation", "Conceptual", "Syntax")))
+                row += [rng.randint(1, 40), f"Q{rng.randint(1, 20)}"]
+                if with_details:
+                    row.append(_text(rng, text_length))
+                row.append(date)
+                yield row
+
+    def insert_batched(sql, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                batch.clear()
+        if batch:
+            cursor.executemany(sql, batch)
+
+    insert_batched("""
+        INSERT INTO Mistakes
+        (source_id, topic_id, subtopic_id, mistake_description, problem_formulation,
+         mistake_type, page_number, location_detail, mistake_details, date_recorded)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, event_rows(mistakes, with_details=True))
+    insert_batched("""
+        INSERT INTO Good_Answers
+        (source_id, topic_id, subtopic_id, answer_description, problem_formulation,
+         page_number, location_detail, date_recorded)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, event_rows(good_answers, with_details=False))
+
+    conn.commit()
+    print(f"Created synthetic database '{db_filepath}' with {mistakes} mistakes and "
+          f"{good_answers} good answers in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Create a synthetic benchmark database.")
+    p.add_argument("--db", "-d", default="synthetic.db", help="Output database path (replaced if it exists)")
+    p.add_argument("--mistakes", type=int, default=1_000_000)
+    p.add_argument("--good-answers", type=int, default=250_000)
+    p.add_argument("--subjects", type=int, default=5)
+    p.add_argument("--topics", type=int, default=200)
+    p.add_argument("--sources", type=int, default=500)
+    p.add_argument("--subtopics-per-topic", type=int, default=3)
+    p.add_argument("--topic-locations", type=int, default=20_000)
+    p.add_argument("--subtopic-locations", type=int, default=20_000)
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--text-length", type=int, default=200)
+    p.add_argument("--topic-skew", type=float, default=1.0, help="Zipf exponent of topic popularity (0 = uniform)")
+    p.add_argument("--source-skew", type=float, default=0.8, help="Zipf exponent of source popularity (0 = uniform)")
+    p.add_argument("--recency-bias", type=float, default=2.0, help="How much busier recent days are (0 = uniform)")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+    create_synthetic_database(args.db, mistakes=args.mistakes, good_answers=args.good_answers,
+                              subjects=args.subjects, topics=args.topics, sources=args.sources,
+                              subtopics_per_topic=args.subtopics_per_topic,
+                              topic_locations=args.topic_locations,
+                              subtopic_locations=args.subtopic_locations,
+                              days=args.days, text_length=args.text_length,
+                              topic_skew=args.topic_skew, source_skew=args.source_skew,
+                              recency_bias=args.recency_bias, seed=args.seed)
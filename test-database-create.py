@@ -9,6 +9,7 @@ import sys
 # Ensure we import your initializer
 sys.path.insert(0, os.path.dirname(__file__))
 from create_database import initialize_database_schema
+from db_connection import get_connection, close_connection
 
 DB_FILE = 'test_database.db'
 
@@ -20,7 +21,7 @@ if os.path.exists(DB_FILE):
 initialize_database_schema(DB_FILE)
 
 # 2. Connect for inserts
-conn = sqlite3.connect(DB_FILE)
+conn = get_connection(DB_FILE)
 cursor = conn.cursor()
 
 # 3. Create a subject and topics
@@ -64,6 +65,6 @@ for i in range(10):
     ))
 
 conn.commit()
-conn.close()
+close_connection(DB_FILE)
 
 print(f"Created test database with 10 mistakes: {DB_FILE}")
\ No newline at end of file
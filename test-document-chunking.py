@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Checks page windows, page remapping and merging of window responses for
+# chunked processing of long documents. Needs no API key or network.
+# Run: python test-document-chunking.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from document_chunking import page_windows, remap_window_response, merge_responses
+
+def window_response(topic_name, pages, mistakes):
+    return {"content": [{"subject_name": "Calculus", "subject_description": None, "topics": [{
+                "topic_name": topic_name, "topic_description": f"{topic_name} notes",
+                "source_locations": [{"filename": "excerpt.pdf", "filepath": ".page_slices/excerpt.pdf",
+                                      "page": page, "location_description": "Heading"} for page in pages],
+                "subtopics": []}]}],
+            "mistakes": [{"source_filename": "excerpt.pdf", "source_filepath": ".page_slices/excerpt.pdf",
+                          "page": page, "location_detail": detail, "description": "Sign error",
+                          "relevant_topic": topic_name, "relevant_subtopic": None}
+                         for page, detail in mistakes],
+            "good_answers": []}
+
+
+# 1. Windows own every page exactly once and start with the overlap as context
+windows = page_windows(25, chunk_pages=10, overlap=1)
+check("25 pages give three windows", len(windows) == 3)
+check("later windows start with a context page",
+      windows[1][0][0] == 10 and 10 not in windows[1][1] and windows[2][0] == list(range(20, 26)))
+owned = [page for _, pages in windows for page in sorted(pages)]
+check("every page is owned exactly once", owned == list(range(1, 26)))
+check("no overlap before the first window", page_windows(5, 10, 2) == [([1, 2, 3, 4, 5], {1, 2, 3, 4, 5})])
+
+# 2. Relative pages become absolute; entries on context pages are dropped
+pages, owned_pages = windows[1] # pages 10-20, owns 11-20
+remapped = remap_window_response(window_response("Limits", [1, 2, 40], [(1, "Q1"), (3, "Q2"), (None, "Q9")]),
+                                 pages, owned_pages, relative=True)
+locations = remapped["content"][0]["topics"][0]["source_locations"]
+check("excerpt positions map to original pages", [l["page"] for l in locations] == [11, None])
+check("mistakes on the context page are dropped", [m["page"] for m in remapped["mistakes"]] == [12, None])
+absolute = remap_window_response(window_response("Limits", [15], [(15, "Q1")]), pages, owned_pages, relative=False)
+check("original page numbers are kept in text mode", absolute["mistakes"][0]["page"] == 15)
+
+# 3. Merging deduplicates topics and events and points everything at the original file
+first = window_response("Chain Rule", [3], [(3, "Q1")])
+second = window_response("chain rule", [3, 14], [(3, "Q1"), (14, "Q4")])
+second["mistakes"].append(dict(second["mistakes"][0], page=15, relevant_topic="CHAIN RULE"))
+merged = merge_responses([first, second], "exam.pdf", "data/exam.pdf")
+topics = merged["content"][0]["topics"]
+check("one subject and one topic after merging", len(merged["content"]) == 1 and len(topics) == 1)
+check("the first spelling of a topic name wins", topics[0]["topic_name"] == "Chain Rule")
+check("duplicate locations are dropped", [l["page"] for l in topics[0]["source_locations"]] == [3, 14])
+check("duplicate mistakes are dropped", [m["page"] for m in merged["mistakes"]] == [3, 14, 15])
+check("mistakes are relinked to the merged topic name",
+      {m["relevant_topic"] for m in merged["mistakes"]} == {"Chain Rule"})
+check("sources point at the original document",
+      all(m["source_filepath"] == "data/exam.pdf" for m in merged["mistakes"])
+      and all(l["filename"] == "exam.pdf" for l in topics[0]["source_locations"]))
+
+finish("All document chunking checks passed.")
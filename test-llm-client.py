@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Checks LLMClient's retries, backoff and rate limiting against a local fake
+# backend that injects 429/5xx errors. Needs no API key or network.
+# Run: python test-llm-client.py
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from llm_client import LLMClient, TokenBucket, is_retryable_error
+from model_backends import ModelBackend
+
+
+class FakeAPIError(Exception):
+    """Stands in for google.api_core exceptions, which expose the HTTP status as .code."""
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeClock:
+    """Manual clock; sleeping advances it instead of waiting."""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FlakyBackend(ModelBackend):
+    """Backend that fails with queued errors first, then succeeds."""
+    name = 'flaky'
+    requires_api_key = False
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.generate_calls = 0
+
+    def _maybe_fail(self):
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def upload_file(self, path, display_name=None):
+        self._maybe_fail()
+        return type('File', (), {'name': 'files/1', 'uri': 'uri://' + path})()
+
+    def delete_file(self, name):
+        self._maybe_fail()
+
+    def generate_content(self, model_name, contents, timeout=None, stream=False):
+        self.generate_calls += 1
+        self._maybe_fail()
+        return type('Response', (), {'text': 'ok', 'usage_metadata': None})()
+
+
+def make_client(errors=(), rpm=1000, tpm=10_000_000, max_retries=3):
+    clock = FakeClock()
+    fake = FlakyBackend(errors)
+    client = LLMClient(backend=fake, requests_per_minute=rpm, tokens_per_minute=tpm,
+                       max_retries=max_retries, base_delay=1.0, max_delay=8.0,
+                       clock=clock, sleep=clock.sleep, rng=random.Random(0))
+    return client, fake, clock
+
+
+# 1. Retryable errors are retried with jittered exponential backoff
+client, fake, clock = make_client([FakeAPIError(429), FakeAPIError(503), FakeAPIError(500)])
+response = client.generate_content('model', ['prompt'])
+stats = client.stats()
+check("429/503/500 are retried until the call succeeds", response.text == 'ok' and fake.generate_calls == 4)
+check("counters record 3 retries and no failure", stats['retried'] == 3 and stats['failed'] == 0 and stats['calls'] == 4)
+check("backoff delays stay within the doubling ceilings 1s, 2s, 4s",
+      len(clock.sleeps) == 3 and all(0 <= d <= 2 ** i for i, d in enumerate(clock.sleeps)))
+
+# 2. Retries are bounded
+client, fake, clock = make_client([FakeAPIError(503)] * 10, max_retries=2)
+try:
+    client.generate_content('model', ['prompt'])
+    raised = False
+except FakeAPIError:
+    raised = True
+check("gives up after max_retries and re-raises", raised and fake.generate_calls == 3)
+check("the give-up is counted as a failure", client.stats()['failed'] == 1 and client.stats()['retried'] == 2)
+
+# 3. Non-retryable errors fail immediately
+client, fake, clock = make_client([FakeAPIError(400)])
+try:
+    client.generate_content('model', ['prompt'])
+    raised = False
+except FakeAPIError:
+    raised = True
+check("HTTP 400 is not retried", raised and fake.generate_calls == 1 and not clock.sleeps)
+check("connection errors and timeouts are retryable",
+      is_retryable_error(ConnectionError()) and is_retryable_error(TimeoutError()) and not is_retryable_error(ValueError()))
+
+# 4. Uploads and deletes are retried too
+client, fake, clock = make_client([FakeAPIError(502)])
+uploaded = client.upload_file('lecture.pdf', display_name='lecture.pdf')
+check("upload_file retries a 502", uploaded.uri == 'uri://lecture.pdf' and client.stats()['retried'] == 1)
+
+# 5. Requests per minute are throttled
+client, fake, clock = make_client(rpm=6)
+for _ in range(12):
+    client.generate_content('model', ['prompt'])
+check("12 requests at 6 RPM take about a minute", 59 <= clock.now <= 61)
+check("throttled calls are counted", client.stats()['throttled'] == 6)
+
+# 6. Tokens per minute are throttled
+client, fake, clock = make_client(tpm=1000)
+prompt = 'x' * 2000 # ~500 tokens
+for _ in range(4):
+    client.generate_content('model', [prompt])
+check("4 x 500 tokens at 1000 TPM wait about a minute", 59 <= clock.now <= 61)
+
+# 7. Token bucket basics
+clock = FakeClock()
+bucket = TokenBucket(10, period=10.0, clock=clock, sleep=clock.sleep)
+bucket.acquire(10)
+waited = bucket.acquire(5)
+check("an empty bucket refills at capacity/period", abs(waited - 5.0) < 1e-9)
+bucket.debit(10)
+check("debit can take the balance negative", bucket.tokens < 0)
+
+finish("All LLM client checks passed.")
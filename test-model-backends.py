@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Checks the offline FakeBackend: schema-valid ingest JSON, Markdown guides,
+# streaming, failure injection and backend selection. Needs no API key or network.
+# Run: python test-model-backends.py
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from create_database import populate_database
+from db_connection import get_connection, close_connection
+from model_backends import FakeBackend, FakeBackendError, GeminiBackend, create_backend
+
+backend = FakeBackend(latency=0, upload_latency=0)
+with tempfile.TemporaryDirectory() as tmp_dir:
+    pdf_path = os.path.join(tmp_dir, 'lecture1.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(b'%PDF-1.4 fake')
+
+    # 1. Ingest responses are valid input for populate_database
+    document = backend.upload_file(pdf_path)
+    response = backend.generate_content('model', ['Analyze this document.', document])
+    data = json.loads(response.text)
+    db_path = os.path.join(tmp_dir, 'fake.db')
+    check("fake ingest JSON populates the database", populate_database(data, db_path))
+    conn = get_connection(db_path)
+    mistakes = conn.execute("SELECT COUNT(*) FROM Mistakes WHERE topic_id IS NOT NULL").fetchone()[0]
+    sources = conn.execute("SELECT filepath FROM Sources").fetchall()
+    check("every fake mistake is linked to a topic", mistakes == len(data['mistakes']) > 0)
+    check("sources point at the uploaded file", sources == [(pdf_path,)])
+    close_connection(db_path)
+
+    again = backend.generate_content('model', ['Analyze this document.', backend.upload_file(pdf_path)])
+    check("the same document always gives the same data", again.text == response.text)
+
+    # 2. Study guides are Markdown citing the uploaded files
+    guide = backend.generate_content('model', ['Generate a study guide in Markdown.', document]).text
+    check("study guide prompts get Markdown", guide.startswith('# Study Guide') and '[lecture1.pdf' in guide)
+
+    # 3. Streaming yields the same text in chunks
+    stream = backend.generate_content('model', ['Generate a study guide in Markdown.', document], stream=True)
+    chunks = [chunk.text for chunk in stream]
+    check("streamed chunks join to the full guide", len(chunks) > 1 and ''.join(chunks) == guide == stream.text)
+
+    backend.delete_file(document.name)
+    check("calls are counted", backend.calls['upload'] == 2 and backend.calls['delete'] == 1)
+
+# 4. Failure injection
+flaky = FakeBackend(latency=0, failure_rate=0.25, seed=1)
+errors = []
+for _ in range(2000):
+    try:
+        flaky.generate_content('model', ['Analyze this document.'])
+    except FakeBackendError as e:
+        errors.append(e.code)
+check("about a quarter of calls fail", 400 <= len(errors) <= 600)
+check("injected failures are 429/500/503", set(errors) <= {429, 500, 503})
+
+# 5. Backend selection
+os.environ['CLASSMATE_BACKEND'] = 'fake'
+check("CLASSMATE_BACKEND=fake selects the fake", isinstance(create_backend(), FakeBackend))
+check("gemini is selectable without importing the SDK", isinstance(create_backend('gemini'), GeminiBackend))
+try:
+    create_backend('unknown')
+    check("unknown backends are rejected", False)
+except ValueError:
+    check("unknown backends are rejected", True)
+
+finish("All model backend checks passed.")
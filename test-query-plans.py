@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Checks that the hot lookups use an index instead of a full table scan.
+# Run: python test-query-plans.py [database.db]  (defaults to a fresh test DB)
+
+import os
+import sys
+
+# Ensure we import your initializer
+sys.path.insert(0, os.path.dirname(__file__))
+from create_database import initialize_database_schema
+from db_connection import get_connection, close_connection
+
+DB_FILE = 'test_query_plans.db'
+
+# (description, query, parameters)
+HOT_QUERIES = [
+    ("Topic id by name (_get_topic_id_by_name, export, study guide)",
+     "SELECT topic_id FROM Topics WHERE topic_name = ?", ("TopicA",)),
+    ("Source by filename (check_file_exists_in_db)",
+     "SELECT COUNT(*) FROM Sources WHERE filename = ?", ("test1.pdf",)),
+    ("Mistakes by topic (export_questions_for_topic_to_txt)",
+     "SELECT M.problem_formulation FROM Mistakes M WHERE M.topic_id = ?", (1,)),
+    ("Mistakes by date",
+     "SELECT mistake_id FROM Mistakes WHERE date_recorded = ?", ("2025-05-04",)),
+    ("Mistake locations by topic (localisation --topic)",
+     "SELECT M.mistake_id FROM Mistakes M JOIN Sources S ON M.source_id = S.source_id "
+     "JOIN Topics T ON M.topic_id = T.topic_id JOIN Subjects U ON T.subject_id = U.subject_id "
+     "WHERE T.topic_name = ? ORDER BY M.date_recorded, S.filename, M.mistake_id LIMIT ?", ("TopicA", 50)),
+    ("Good answers by topic",
+     "SELECT answer_description FROM Good_Answers WHERE topic_id = ?", (1,)),
+    ("Sources related to a topic (create_study_guide_md)",
+     "SELECT s.filepath, s.filename FROM Topic_Sources ts JOIN Sources s ON s.source_id = ts.source_id WHERE ts.topic_id = ?", (1,)),
+]
+
+
+def explain(cursor, query, params):
+    """Returns the EXPLAIN QUERY PLAN detail lines for a query."""
+    cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+if len(sys.argv) > 1:
+    db_path = sys.argv[1]
+else:
+    db_path = DB_FILE
+    # Remove old test DB
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+# 1. Init schema (creates tables and applies migrations)
+if not initialize_database_schema(db_path):
+    sys.exit(1)
+
+# 2. Check every hot query plan
+conn = get_connection(db_path)
+cursor = conn.cursor()
+failures = 0
+for description, query, params in HOT_QUERIES:
+    plan = explain(cursor, query, params)
+    uses_index = any(line.startswith("SEARCH ") and ("INDEX" in line or "PRIMARY KEY" in line) for line in plan)
+    full_scan = any(line.startswith("SCAN ") for line in plan)
+    ok = uses_index and not full_scan
+    failures += 0 if ok else 1
+    print(f"[{'OK' if ok else 'FAIL'}] {description}")
+    for line in plan:
+        print(f"       {line}")
+
+close_connection(db_path)
+if db_path == DB_FILE:
+    os.remove(db_path)
+
+if failures:
+    print(f"{failures} hot query plan(s) do not use an index.")
+    sys.exit(1)
+print("All hot queries use an index.")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Checks recovery of truncated and slightly malformed ingest responses and
+# the follow-up prompt for the missing sections. Needs no API key or network.
+# Run: python test-response-salvage.py
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import add_to_database
+from model_backends import FakeBackend
+from response_salvage import salvage_response, missing_sections, build_followup_prompt, record_salvage, salvage_stats
+
+full = FakeBackend(latency=0).fake_response_data(None)
+text = json.dumps(full, indent=2)
+
+# 1. A valid response is recovered completely
+data, report = salvage_response("```json\n" + text + "\n```")
+check("a valid response is recovered as is", data == full and not missing_sections(report))
+
+# 2. Truncated inside good_answers: earlier sections complete, answers partial
+cut = text[:text.index('"good_answers"') + 40]
+data, report = salvage_response(cut)
+check("sections before the cut are complete",
+      data['content'] == full['content'] and data['mistakes'] == full['mistakes'])
+check("the cut section is reported incomplete", missing_sections(report) == ['good_answers'])
+
+# 3. Truncated inside the second topic of a subject: the first topic is kept
+second_topic = full['content'][0]['topics'][1]['topic_name']
+cut = text[:text.index(f'"topic_name": "{second_topic}"') + 10]
+data, report = salvage_response(cut)
+topics = data['content'][0]['topics']
+check("complete topics of a cut-off subject are kept",
+      data['content'][0]['subject_name'] == full['content'][0]['subject_name'] and topics == full['content'][0]['topics'][:1])
+check("sections after the cut are missing", missing_sections(report) == ['content', 'mistakes', 'good_answers'])
+
+# 4. Trailing commas are repaired; unparseable complete elements are skipped
+last_field = '"details": "The intermediate result was not carried over correctly."'
+broken = text.replace(last_field, last_field + ',', 1)
+check("the broken response is not valid JSON", broken != text)
+data, report = salvage_response(broken)
+check("trailing commas are repaired", data['mistakes'] == full['mistakes'] and not missing_sections(report))
+data, report = salvage_response('{"mistakes": [{"description": oops}, {"description": "ok"}], "content": [], "good_answers": []}')
+check("an unparseable element is skipped", data['mistakes'] == [{"description": "ok"}] and report['skipped'] == 1)
+check("nothing recoverable gives None", salvage_response("Sorry, I cannot help with that.")[0] is None)
+
+# 5. The follow-up asks only for what is missing
+data, report = salvage_response(text[:text.index('"good_answers"') + 40])
+prompt = build_followup_prompt("Analyze the document.", data, report)
+check("follow-up names only the missing section",
+      "'good_answers'" in prompt and "'mistakes'" not in prompt and prompt.endswith("Analyze the document."))
+
+# 6. Salvage metrics
+record_salvage(5, followup=True, followup_ok=True, completed=True)
+record_salvage(0)
+stats = salvage_stats()
+check("salvage rate counts salvaged responses", stats['malformed'] == 2 and stats['salvage_rate'] == 0.5)
+
+# 7. A follow-up is complete only if every missing section came back in full
+class FollowupClient:
+    def __init__(self, reply):
+        self.reply = reply
+    def generate_content(self, model, contents, response_schema=None):
+        return type('Response', (), {'text': self.reply})()
+
+cut = text[:text.index('"good_answers"') + 40]
+answers = json.dumps({'good_answers': full['good_answers']}, indent=2)
+with tempfile.TemporaryDirectory() as tmp_dir:
+    add_to_database.response_json_dir = tmp_dir # Raw follow-up text is saved here
+    for description, reply, expected in (
+            ("a complete follow-up completes the response", answers, True),
+            ("a follow-up without the section is incomplete", json.dumps({'mistakes': []}), False),
+            ("a follow-up cut off part-way is incomplete",
+             answers[:answers.index(json.dumps(full['good_answers'][1]['description']))], False)):
+        data, complete = add_to_database._salvage_malformed_response(cut, 'doc.pdf', "Analyze the document.",
+                                                                     ["Analyze the document.", "document"],
+                                                                     FollowupClient(reply))
+        descriptions = [answer['description'] for answer in data['good_answers']]
+        check(description, complete == expected
+              and (not expected or descriptions == [answer['description'] for answer in full['good_answers']]))
+
+finish("All response salvage checks passed.")
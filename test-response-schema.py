@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Checks the ingest response schema derived from the SQL_CREATE_* tables and
+# the local validator run before records reach the database.
+# Run: python test-response-schema.py
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import create_database
+from create_database import RESPONSE_SCHEMA, populate_database, create_database_from_json
+from db_connection import get_connection, close_connection
+from model_backends import FakeBackend
+from response_schema import build_response_schema, parse_table_columns, section_schema, validate_response
+
+# 1. The schema follows the tables
+table, columns = parse_table_columns(create_database.SQL_CREATE_MISTAKES)
+check("columns are read from CREATE TABLE", table == 'Mistakes' and columns['mistake_description'] == ('TEXT', True)
+      and columns['page_number'] == ('INTEGER', False))
+mistake = RESPONSE_SCHEMA['properties']['mistakes']['items']
+check("NOT NULL columns are required fields",
+      set(mistake['required']) == {'source_filename', 'source_filepath', 'relevant_topic', 'description'})
+check("nullable foreign keys make their field optional", mistake['properties']['relevant_subtopic'].get('nullable'))
+check("INTEGER columns are integer fields", mistake['properties']['page'] == {'type': 'INTEGER', 'nullable': True})
+try:
+    build_response_schema([create_database.SQL_CREATE_SUBJECTS, create_database.SQL_CREATE_TOPICS])
+    check("a missing table is reported", False)
+except ValueError:
+    check("a missing table is reported", True)
+
+narrow = section_schema(RESPONSE_SCHEMA, ['good_answers'])
+check("a follow-up schema asks only for the missing sections",
+      list(narrow['properties']) == ['good_answers'] and narrow['required'] == ['good_answers']
+      and narrow['properties']['good_answers'] == RESPONSE_SCHEMA['properties']['good_answers'])
+
+# 2. The validator keeps good records, fixes optional fields and rejects bad ones
+data = FakeBackend(latency=0).fake_response_data(None)
+errors = []
+check("fake responses are valid", validate_response(data, RESPONSE_SCHEMA, errors) == data and not errors)
+bad = json.loads(json.dumps(data))
+bad['mistakes'][0]['page'] = "12"
+bad['mistakes'][1]['page'] = "page twelve"
+bad['mistakes'].append({'description': 'No topic', 'source_filename': 'a.pdf', 'source_filepath': 'a.pdf'})
+bad['content'][0]['topics'][0]['source_locations'][0]['filename'] = None
+bad['content'][0]['topics'].append({'topic_description': 'nameless'})
+errors = []
+clean = validate_response(bad, RESPONSE_SCHEMA, errors)
+check("numeric strings become integers", clean['mistakes'][0]['page'] == 12)
+check("invalid optional fields are set to null", clean['mistakes'][1]['page'] is None)
+check("records missing a required field are rejected", len(clean['mistakes']) == len(data['mistakes']))
+check("nested records are rejected on their own",
+      len(clean['content'][0]['topics']) == len(data['content'][0]['topics'])
+      and clean['content'][0]['topics'][0]['source_locations'] == data['content'][0]['topics'][0]['source_locations'][1:])
+check("every problem is reported", len(errors) == 4)
+
+# 3. Rejected records never reach the database, in memory or streamed from a file
+with tempfile.TemporaryDirectory() as tmp_dir:
+    db_path = os.path.join(tmp_dir, 'schema.db')
+    check("a response with bad records still loads", populate_database(bad, db_path))
+    conn = get_connection(db_path)
+    check("only valid mistakes are stored",
+          conn.execute("SELECT COUNT(*) FROM Mistakes").fetchone()[0] == len(data['mistakes']))
+    close_connection(db_path)
+    os.remove(db_path)
+
+    json_path = os.path.join(tmp_dir, 'response.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(bad, f)
+    check("a JSON file with bad records still loads", create_database_from_json(json_path, db_path))
+    conn = get_connection(db_path)
+    check("streamed records are validated too",
+          conn.execute("SELECT COUNT(*) FROM Mistakes").fetchone()[0] == len(data['mistakes']))
+    close_connection(db_path)
+
+finish("All response schema checks passed.")
@@ -0,0 +1,167 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from db_connection import get_connection
+from response_cache import hash_file
+
+# pypdf is optional: without it only text files are extracted locally and
+# PDFs are always uploaded
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+PDF_TEXT_AVAILABLE = PdfReader is not None
+
+# --- Configuration ---
+TEXT_FILE_ROWS_PER_PAGE = 200 # Rows of a text file stored together as one "page"
+MIN_CHARS_PER_PAGE = 200 # Average extracted characters per page for a PDF to count as text-only
+DEFAULT_EXTRACTION_WORKERS = None # Process pool size; None uses os.cpu_count()
+TEXT_EXTENSIONS = ('.txt', '.md')
+
+
+def extract_pages(filepath: str) -> list[str] | None:
+    """
+    Extracts the text of a document page by page, without the database.
+    PDFs are read with pypdf (one entry per page, '' for pages without a
+    text layer). Text files are split into blocks of TEXT_FILE_ROWS_PER_PAGE
+    rows, each row prefixed with its 1-based row number ("12: ..."), so the
+    model can cite rows.
+
+    Module-level and database-free so it can run in a worker process.
+
+    Returns:
+        list[str] | None: The page texts, or None if the file type is not
+            supported (or pypdf is missing) or the file cannot be parsed.
+    """
+    lower = filepath.lower()
+    try:
+        if lower.endswith(TEXT_EXTENSIONS):
+            with open(filepath, encoding='utf-8', errors='replace') as f:
+                rows = [f"{number}: {line.rstrip()}" for number, line in enumerate(f, start=1)]
+            return ['\n'.join(rows[i:i + TEXT_FILE_ROWS_PER_PAGE])
+                    for i in range(0, len(rows), TEXT_FILE_ROWS_PER_PAGE)] or ['']
+        if lower.endswith('.pdf') and PdfReader is not None:
+            return [page.extract_text() or '' for page in PdfReader(filepath).pages]
+    except Exception as e:
+        print(f"Warning: Could not extract text from '{filepath}': {e}")
+    return None
+
+
+def _load_cached(conn: sqlite3.Connection, content_hash: str) -> list[str] | None:
+    row = conn.execute("SELECT page_count FROM Page_Text_Documents WHERE content_hash = ?", (content_hash,)).fetchone()
+    if row is None:
+        return None
+    pages = [''] * row[0]
+    for page_number, page_text in conn.execute(
+            "SELECT page_number, page_text FROM Page_Texts WHERE content_hash = ?", (content_hash,)):
+        pages[page_number - 1] = page_text
+    return pages
+
+
+def _store(conn: sqlite3.Connection, content_hash: str, pages: list[str]) -> None:
+    conn.execute("INSERT OR REPLACE INTO Page_Text_Documents (content_hash, page_count, text_chars) VALUES (?, ?, ?)",
+                 (content_hash, len(pages), sum(len(p) for p in pages)))
+    conn.executemany("INSERT OR REPLACE INTO Page_Texts (content_hash, page_number, page_text) VALUES (?, ?, ?)",
+                     [(content_hash, number, text) for number, text in enumerate(pages, start=1) if text])
+
+
+def extract_documents(db_filepath: str, filepaths: list[str],
+                      max_workers: int | None = DEFAULT_EXTRACTION_WORKERS) -> dict[str, list[str] | None]:
+    """
+    Returns the page texts of every file, extracting only files whose
+    content hash is not yet in the Page_Texts cache. Extraction is CPU-bound
+    and runs across a process pool when more than one file needs it; the
+    results are written to the database from the calling thread. The
+    database must already have the page text tables (schema migration 6,
+    see create_database.initialize_database_schema).
+
+    Args:
+        db_filepath: Database holding the page text cache.
+        filepaths: Documents to extract (PDF, .txt or .md).
+        max_workers: Process pool size (None = number of CPUs).
+
+    Returns:
+        dict[str, list[str] | None]: filepath -> page texts (1-based page
+            N is index N-1), or None for files that cannot be extracted.
+    """
+    conn = get_connection(db_filepath)
+    results = {}
+    missing = {} # content hash -> filepaths needing extraction
+    for path in filepaths:
+        try:
+            content_hash = hash_file(path)
+        except OSError as e:
+            print(f"Warning: Cannot read '{path}' for text extraction: {e}")
+            results[path] = None
+            continue
+        cached = _load_cached(conn, content_hash)
+        if cached is not None:
+            results[path] = cached
+        else:
+            missing.setdefault(content_hash, []).append(path)
+
+    if missing:
+        hashes = list(missing)
+        sources = [missing[h][0] for h in hashes]
+        print(f"Extracting text from {len(sources)} document(s) "
+              f"({len(filepaths) - sum(len(p) for p in missing.values())} cached)...")
+        if len(sources) > 1 and max_workers != 1:
+            with ProcessPoolExecutor(max_workers=min(len(sources), max_workers or os.cpu_count() or 1)) as pool:
+                extracted = list(pool.map(extract_pages, sources))
+        else:
+            extracted = [extract_pages(path) for path in sources]
+        for content_hash, pages in zip(hashes, extracted):
+            if pages is not None:
+                _store(conn, content_hash, pages)
+            for path in missing[content_hash]:
+                results[path] = pages
+        conn.commit()
+    return results
+
+
+def get_page_texts(db_filepath: str, filepath: str) -> list[str] | None:
+    """Page texts of one document (see extract_documents)."""
+    return extract_documents(db_filepath, [filepath]).get(filepath)
+
+
+def is_text_only(pages: list[str] | None, min_chars_per_page: int = MIN_CHARS_PER_PAGE) -> bool:
+    """
+    True if the extracted text can stand in for the file: every page has
+    text and pages average at least min_chars_per_page characters. Scanned
+    PDFs (no text layer) and figure-heavy slides fail this and still need
+    to be uploaded.
+    """
+    if not pages or not all(p.strip() for p in pages):
+        return False
+    return sum(len(p) for p in pages) / len(pages) >= min_chars_per_page
+
+
+def can_send_as_text(filepath: str, pages: list[str] | None) -> bool:
+    """True if a document can be sent as its extracted text instead of being uploaded."""
+    if pages is None:
+        return False
+    if filepath.lower().endswith(TEXT_EXTENSIONS):
+        return True
+    return is_text_only(pages)
+
+
+def format_document_text(filename: str, pages: list[str], page_numbers=None) -> str:
+    """
+    Formats page texts as a single prompt part, with a marker before each
+    PDF page so the model can cite original page numbers (text file rows
+    already carry their row numbers).
+
+    Args:
+        filename: Name shown in the header (what the model should cite).
+        pages: All page texts of the document.
+        page_numbers: Optional 1-based pages to include (default: all).
+    """
+    numbers = sorted(page_numbers) if page_numbers is not None else range(1, len(pages) + 1)
+    rows_only = filename.lower().endswith(TEXT_EXTENSIONS)
+    parts = [f"===== Document: {filename} ====="]
+    for number in numbers:
+        if 1 <= number <= len(pages):
+            parts.append(pages[number - 1] if rows_only else f"----- {filename}, Page {number} -----\n{pages[number - 1]}")
+    return '\n'.join(parts)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+timing.py
+
+Structured timing spans for the ingest and study guide pipelines.
+
+    with timing.span('upload', pipeline='ingest', file=path):
+        ...
+
+Each finished span is written as one JSON line (stage, start time, seconds,
+ok/error, thread and the given attributes) to the configured sink. Timing is
+off unless a sink is set with configure_timing(), the CLASSMATE_TIMING_LOG
+environment variable or config.timing_log; while it is off, span() returns a
+shared no-op object and nothing is measured or written.
+
+Report p50/p95 per stage from a log:
+    python timing.py report [timings.jsonl] [--json]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+try:
+    import config
+except ImportError:
+    config = None
+
+# --- Configuration ---
+TIMING_ENV_VAR = 'CLASSMATE_TIMING_LOG' # Path of the JSONL sink; overrides config.timing_log
+DEFAULT_TIMING_LOG = 'timings.jsonl' # Report input when no path is given
+
+_sink = None # Open file (or other writable) receiving span lines; None = disabled
+_sink_owned = False # True if _sink was opened here from a path
+_sink_lock = threading.Lock()
+
+
+class _Span:
+    """A running span; written to the sink when its with-block exits."""
+
+    __slots__ = ('stage', 'attributes', '_start', '_wall_start')
+
+    def __init__(self, stage, attributes):
+        self.stage = stage
+        self.attributes = attributes
+
+    def set(self, **attributes) -> None:
+        """Adds attributes known only after the span started (e.g. sizes)."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._wall_start = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ok = self.attributes.pop('ok', True)
+        record = {'stage': self.stage,
+                  'start': round(self._wall_start, 6),
+                  'seconds': round(time.perf_counter() - self._start, 6),
+                  'ok': exc_type is None and bool(ok),
+                  'thread': threading.current_thread().name}
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        record.update(self.attributes)
+        _write(record)
+        return False
+
+
+class _NullSpan:
+    """Shared stand-in returned while timing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str, **attributes):
+    """
+    Context manager timing one pipeline stage.
+
+    Args:
+        stage (str): Stage name, e.g. 'upload', 'generate', 'parse', 'load',
+            'cleanup' or 'remote_delete'.
+        **attributes: JSON-serialisable details such as pipeline, file or
+            topic. Pass ok=False (or call .set(ok=False)) to mark a stage that
+            failed without raising.
+
+    Returns:
+        A span usable in a with statement (a no-op while timing is disabled).
+    """
+    if _sink is None:
+        return _NULL_SPAN
+    return _Span(stage, attributes)
+
+
+def timing_enabled() -> bool:
+    return _sink is not None
+
+
+def _write(record: dict) -> None:
+    line = json.dumps(record, default=str) + '\n'
+    with _sink_lock:
+        if _sink is not None:
+            _sink.write(line)
+            _sink.flush()
+
+
+def configure_timing(sink=None) -> None:
+    """
+    Sets where spans are written: a file path (appended to), an open
+    writable object, or None to disable timing. A previously opened file is
+    closed.
+    """
+    global _sink, _sink_owned
+    with _sink_lock:
+        if _sink is not None and _sink_owned:
+            _sink.close()
+        _sink_owned = isinstance(sink, (str, os.PathLike))
+        if _sink_owned:
+            directory = os.path.dirname(os.fspath(sink))
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            sink = open(sink, 'a', encoding='utf-8')
+        _sink = sink
+
+
+# --- Report ---
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize_spans(lines) -> dict:
+    """
+    Groups span records (JSON lines) by stage, prefixed with the pipeline
+    attribute when present (e.g. 'ingest.upload').
+
+    Returns:
+        dict: {stage: {'count', 'errors', 'p50', 'p95', 'max', 'total'}} in
+              seconds, in order of first appearance.
+    """
+    durations = {}
+    errors = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue # e.g. a line cut short by a crash
+        stage = str(record.get('stage'))
+        if record.get('pipeline'):
+            stage = f"{record['pipeline']}.{stage}"
+        durations.setdefault(stage, []).append(float(record.get('seconds', 0)))
+        errors[stage] = errors.get(stage, 0) + (0 if record.get('ok', True) else 1)
+
+    summary = {}
+    for stage, values in durations.items():
+        values.sort()
+        summary[stage] = {'count': len(values), 'errors': errors[stage],
+                          'p50': round(percentile(values, 50), 6),
+                          'p95': round(percentile(values, 95), 6),
+                          'max': round(values[-1], 6),
+                          'total': round(sum(values), 6)}
+    return summary
+
+
+def main():
+    p = argparse.ArgumentParser(description="Summarize pipeline timing spans.")
+    sub = p.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Print p50/p95 per stage")
+    report.add_argument("log", nargs="?", default=os.environ.get(TIMING_ENV_VAR) or DEFAULT_TIMING_LOG,
+                        help="JSONL span log")
+    report.add_argument("--json", "-j", action="store_true", help="Print the summary as JSON")
+    args = p.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"Error: Timing log '{args.log}' not found.", file=sys.stderr)
+        sys.exit(1)
+    with open(args.log, encoding='utf-8') as f:
+        summary = summarize_spans(f)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{'stage':<24}{'count':>7}{'errors':>8}{'p50 s':>10}{'p95 s':>10}{'max s':>10}{'total s':>10}")
+    for stage, s in summary.items():
+        print(f"{stage:<24}{s['count']:>7}{s['errors']:>8}{s['p50']:>10.3f}{s['p95']:>10.3f}"
+              f"{s['max']:>10.3f}{s['total']:>10.3f}")
+
+
+# Timing starts enabled when a sink is configured in the environment or config.py
+_configured_log = os.environ.get(TIMING_ENV_VAR) or getattr(config, 'timing_log', None)
+if _configured_log:
+    configure_timing(_configured_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import math
+import os
+import re
+import sqlite3
+import unicodedata
+from collections import defaultdict
+
+from db_connection import get_connection
+
+# pypdf is optional: without it, PDFs are matched by their filename only
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# --- Configuration ---
+NGRAM_SIZE = 3 # Character n-gram length used for fuzzy matching
+DEFAULT_TOP_K = 30 # Candidate topics sent with each document
+MIN_SCORE = 0.5 # Below this a topic is not considered related to the document
+WORD_SIMILARITY = 0.6 # N-gram Jaccard similarity at which two words match
+SAMPLE_CHARS = 20_000 # Document text read locally to pick candidates
+SAMPLE_PAGES = 5 # PDF pages read for the sample
+
+
+# Words ignored when matching (they say nothing about the topic)
+STOPWORDS = frozenset({'a', 'an', 'and', 'for', 'in', 'into', 'of', 'on', 'the', 'to', 'with',
+                       'intro', 'introduction', 'basics', 'basic', 'part', 'chapter'})
+
+
+def normalize_topic_name(name: str) -> str:
+    """
+    Canonical form used to compare topic names: accents removed, lower case,
+    punctuation turned into spaces and whitespace collapsed
+    ("Eigen-Values  (Intro)" -> "eigen values intro").
+    """
+    text = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def char_ngrams(normalized: str, n: int = NGRAM_SIZE) -> set[str]:
+    """Character n-grams of every word, padded so word starts and ends count."""
+    grams = set()
+    for word in normalized.split():
+        padded = f" {word} "
+        if len(padded) <= n:
+            grams.add(padded)
+        grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def document_sample(filepath: str, max_chars: int = SAMPLE_CHARS, pages: list[str] | None = None) -> str:
+    """
+    Text used to find a document's candidate topics without calling the
+    model: the filename plus the start of the document (text files directly,
+    PDFs through pypdf when installed). Unreadable files yield just the name.
+    Already extracted page texts (see text_extraction) can be passed as
+    pages to avoid reading the file again.
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    parts = [re.sub(r'[_\-.]+', ' ', name)]
+    try:
+        if pages is not None:
+            parts.extend(pages[:SAMPLE_PAGES])
+        elif filepath.lower().endswith(('.txt', '.md')):
+            with open(filepath, encoding='utf-8', errors='replace') as f:
+                parts.append(f.read(max_chars))
+        elif filepath.lower().endswith('.pdf') and PdfReader is not None:
+            reader = PdfReader(filepath)
+            size = 0
+            for page in reader.pages[:SAMPLE_PAGES]:
+                text = page.extract_text() or ''
+                parts.append(text)
+                size += len(text)
+                if size >= max_chars:
+                    break
+    except Exception as e:
+        print(f"Warning: Could not read '{filepath}' to pick candidate topics: {e}")
+    return '\n'.join(parts)[:max_chars]
+
+
+class TopicIndex:
+    """
+    In-memory index of the existing topics for picking the ones relevant to
+    a new document, so the ingest prompt lists a bounded number of topics
+    instead of all of them.
+
+    Topic names are normalized and split into words, and every word into
+    character n-grams. A document word matches a topic word when their
+    n-gram sets are similar enough (so "eigenvalue" matches "Eigenvalues"
+    and small spelling differences are tolerated). A topic scores by the
+    share of its name words found in the document, weighted by how rare each
+    word is among topic names, plus a bonus when the whole normalized name
+    appears verbatim.
+    """
+
+    def __init__(self, topics: list[tuple[int, str]], popularity: dict[int, int] | None = None):
+        """
+        Args:
+            topics: (topic_id, topic_name) pairs.
+            popularity: Optional topic_id -> weight used to break ties (e.g.
+                number of linked sources), so equally scored candidates
+                favour established topics.
+        """
+        self.topics = {} # topic_id -> (topic_name, normalized name)
+        self.popularity = popularity or {}
+        self._words = {} # topic_id -> significant words of the name
+        self._word_grams = {} # topic word -> its n-grams
+        self._gram_postings = defaultdict(set) # n-gram -> topic words containing it
+        document_frequency = defaultdict(int)
+        for topic_id, topic_name in topics:
+            if not topic_name:
+                continue
+            normalized = normalize_topic_name(topic_name)
+            words = {w for w in normalized.split() if w not in STOPWORDS} or set(normalized.split())
+            self.topics[topic_id] = (topic_name, normalized)
+            self._words[topic_id] = words
+            for word in words:
+                document_frequency[word] += 1
+                if word not in self._word_grams:
+                    self._word_grams[word] = char_ngrams(word)
+                    for gram in self._word_grams[word]:
+                        self._gram_postings[gram].add(word)
+        total = max(1, len(self.topics))
+        self._idf = {word: math.log(1 + total / count) for word, count in document_frequency.items()}
+
+    def __len__(self):
+        return len(self.topics)
+
+    @classmethod
+    def from_database(cls, db_filepath: str) -> 'TopicIndex':
+        """Builds the index from the Topics table (empty if the database has none)."""
+        try:
+            conn = get_connection(db_filepath)
+            topics = conn.execute("SELECT topic_id, topic_name FROM Topics").fetchall()
+            popularity = dict(conn.execute("SELECT topic_id, COUNT(*) FROM Topic_Sources GROUP BY topic_id").fetchall())
+        except sqlite3.Error as e:
+            print(f"Warning: Could not load topics for the topic index: {e}")
+            return cls([])
+        return cls(topics, popularity)
+
+    def _matched_words(self, text_words: set[str]) -> dict[str, float]:
+        """Topic words similar to any of text_words, with the best similarity."""
+        matched = {}
+        for text_word in text_words:
+            if text_word in self._word_grams:
+                matched[text_word] = 1.0
+                continue
+            grams = char_ngrams(text_word)
+            shared = defaultdict(int)
+            for gram in grams:
+                for topic_word in self._gram_postings.get(gram, ()):
+                    shared[topic_word] += 1
+            for topic_word, count in shared.items():
+                similarity = count / (len(grams) + len(self._word_grams[topic_word]) - count)
+                if similarity >= WORD_SIMILARITY and similarity > matched.get(topic_word, 0.0):
+                    matched[topic_word] = similarity
+        return matched
+
+    def candidates(self, text: str, k: int = DEFAULT_TOP_K, min_score: float = MIN_SCORE) -> list[tuple[int, str, float]]:
+        """
+        Ranks topics by relevance to text.
+
+        Returns:
+            list[tuple[int, str, float]]: Up to k (topic_id, topic_name, score)
+                tuples, best first, with score >= min_score. When the index
+                holds at most k topics, all of them are returned.
+        """
+        normalized_text = normalize_topic_name(text)
+        padded_text = f" {normalized_text} "
+        matched = self._matched_words(set(normalized_text.split()) - STOPWORDS)
+
+        ranked = []
+        for topic_id, (topic_name, normalized) in self.topics.items():
+            words = self._words[topic_id]
+            weight = sum(self._idf[w] for w in words) or 1.0
+            score = sum(self._idf[w] * matched.get(w, 0.0) for w in words) / weight
+            if normalized and f" {normalized} " in padded_text:
+                score += 0.5
+            ranked.append((topic_id, topic_name, round(score, 4)))
+        ranked.sort(key=lambda t: (-t[2], -self.popularity.get(t[0], 0), t[1]))
+        if len(ranked) <= k:
+            return ranked
+        return [t for t in ranked[:k] if t[2] >= min_score]